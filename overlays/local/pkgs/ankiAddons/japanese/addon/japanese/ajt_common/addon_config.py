@@ -56,6 +56,15 @@ class AddonConfigABC(abc.ABC):
     def default_config(self) -> dict:
         raise NotImplementedError()
 
+    @property
+    @abc.abstractmethod
+    def version(self) -> int:
+        """
+        Changes each time the config is written or replaced.
+        Anything that is derived from the config can be rebuilt when the version changes.
+        """
+        raise NotImplementedError()
+
     def __getitem__(self, key: str):
         if key in self.default_config:
             return self.config.get(key, self.default_config[key])
@@ -114,8 +123,10 @@ class AddonConfigManager(AddonConfigABC):
 
     _default_config: dict
     _config: dict
+    _version: int
 
     def __init__(self, default: bool = False) -> None:
+        self._version = 0
         self._set_underlying_dicts()
         if default:
             self._config = self._default_config
@@ -139,6 +150,14 @@ class AddonConfigManager(AddonConfigABC):
     def default_config(self) -> dict:
         return self._default_config
 
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def update(self, another: dict[str, Any], clear_old: bool = False) -> None:
+        super().update(another, clear_old)
+        self._version += 1
+
     def update_from_addon_manager(self, new_conf: dict) -> None:
         """
         This method may be passed to mw.addonManager.setConfigUpdatedAction
@@ -165,6 +184,7 @@ class AddonConfigManager(AddonConfigABC):
     def write_config(self):
         if self.is_default:
             raise RuntimeError("Can't write default config.")
+        self._version += 1
         return write_config(self.config)
 
 
@@ -192,5 +212,9 @@ class ConfigSubViewBase(AddonConfigABC):
     def default_config(self) -> dict:
         return self._manager.default_config[self._view_key]
 
+    @property
+    def version(self) -> int:
+        return self._manager.version
+
     def write_config(self) -> None:
         raise RuntimeError("Can't call this function from a sub-view.")
@@ -19,10 +19,12 @@ from .audio_manager.abstract import AnkiAudioSourceManagerABC
 from .audio_manager.audio_manager import AudioSourceManagerFactory
 from .audio_manager.basic_types import FileUrlData, NameUrl, NameUrlSet, TotalAudioStats
 from .audio_manager.download_results import DownloadedData, FileSaveResults, save_files
+from .audio_manager.file_cache import AUDIO_FILE_CACHE_DIR_NAME, AudioFileCache
 from .audio_manager.source_manager import AudioSourceManager, InitResult
 from .config_view import JapaneseConfig
 from .config_view import config_view as cfg
 from .database.sqlite3_buddy import Sqlite3Buddy
+from .helpers.file_ops import user_files_dir
 from .helpers.inflections import is_inflected
 from .helpers.mingle_readings import split_possible_furigana
 from .helpers.tokens import ParseableToken, tokenize
@@ -109,8 +111,10 @@ class AnkiAudioSourceManager(AudioSourceManager, AnkiAudioSourceManagerABC):
 
         # Try to split the source text in various ways, trying mecab if everything fails.
         if not hits[src_text]:
-            for part in dict.fromkeys(iter_tokens(src_text)):
-                if files := tuple(self._search_word_variants(part)):
+            parts = tuple(dict.fromkeys(iter_tokens(src_text)))
+            found = self._search_variants_of(parts)
+            for part in parts:
+                if files := found[part]:
                     hits[part].extend(files)
                 elif split_morphemes:
                     hits.update(self._parse_and_search_audio(part))
@@ -151,20 +155,31 @@ class AnkiAudioSourceManager(AudioSourceManager, AnkiAudioSourceManagerABC):
             ),
         ).run_in_background()
 
-    def _search_word_variants(self, src_text: str) -> Iterable[FileUrlData]:
+    def _search_word_variants(self, src_text: str) -> list[FileUrlData]:
         """
         Search word.
         If nothing is found, try searching in hiragana and katakana.
         """
-        yield from self.search_word(src_text)
-        yield from self.search_word(to_hiragana(src_text))
-        yield from self.search_word(to_katakana(src_text))
+        return self._search_variants_of((src_text,))[src_text]
+
+    def _search_variants_of(self, words: Iterable[str]) -> dict[str, list[FileUrlData]]:
+        """
+        Search each word, its hiragana and its katakana form, all with one query.
+        """
+        variants = {word: tuple(dict.fromkeys((word, to_hiragana(word), to_katakana(word)))) for word in words}
+        found = self.search_words(itertools.chain.from_iterable(variants.values()))
+        return {
+            word: [hit for variant in word_variants for hit in found[variant]]
+            for word, word_variants in variants.items()
+        }
 
     def _parse_and_search_audio(self, src_text: ParseableToken) -> dict[str, list[FileUrlData]]:
         hits: dict[str, list[FileUrlData]] = collections.defaultdict(list)
-        for parsed in mecab.translate(src_text):
+        parsed_tokens = tuple(mecab.translate(src_text))
+        found = self._search_variants_of(variant for parsed in parsed_tokens for variant in iter_mecab_variants(parsed))
+        for parsed in parsed_tokens:
             for variant in iter_mecab_variants(parsed):
-                if files := tuple(self._search_word_variants(variant)):
+                if files := found[variant]:
                     hits[parsed.headword].extend(files)
                     # If found results, break because all further results will be duplicates.
                     break
@@ -183,9 +198,18 @@ class AnkiAudioSourceManager(AudioSourceManager, AnkiAudioSourceManagerABC):
         return results
 
     def _download_tag(self, audio_file: FileUrlData) -> DownloadedData:
+        cache_consulted = self._uses_file_cache(audio_file)
+        if (data := self._get_cached_file(audio_file)) is not None:
+            return DownloadedData(
+                desired_filename=audio_file.desired_filename,
+                data=data,
+                from_cache=True,
+                cache_consulted=True,
+            )
         return DownloadedData(
             desired_filename=audio_file.desired_filename,
             data=self._get_file(audio_file),
+            cache_consulted=cache_consulted,
         )
 
     def remove_unused_audio_data(self) -> None:
@@ -203,6 +227,7 @@ class AnkiAudioSourceManager(AudioSourceManager, AnkiAudioSourceManagerABC):
         for to_remove in sources_in_db() - sources_in_config():
             print(f"Removing unused cache data for audio source: {to_remove}")
             self.remove_data(to_remove)
+        self.remove_unused_downloads()
 
 
 def describe_audio_stats(stats: TotalAudioStats) -> str:
@@ -244,10 +269,13 @@ class AnkiAudioSourceManagerFactory(AudioSourceManagerFactory):
         to avoid sqlite3 throwing an instance of sqlite3.ProgrammingError.
         """
         assert mw, "Anki should be running."
+        # The size limit may have been changed in the settings dialog.
+        audio_file_cache.set_max_size(file_cache_max_size(self._config))
         return AnkiAudioSourceManager(
             config=self._config,
             http_client=self._http_client,
             db=db,
+            file_cache=audio_file_cache,
         )
 
     def remove_sources_from_db(
@@ -357,6 +385,12 @@ class AnkiAudioSourceManagerFactory(AudioSourceManagerFactory):
 # Entry point
 ##########################################################################
 
+
+def file_cache_max_size(config: JapaneseConfig) -> int:
+    return config.audio_settings.file_cache_size_mb * 1024 * 1024
+
+
+audio_file_cache = AudioFileCache(user_files_dir() / AUDIO_FILE_CACHE_DIR_NAME, max_size=file_cache_max_size(cfg))
 aud_src_mgr = AnkiAudioSourceManagerFactory(cfg)
 # react to anki's state changes
 gui_hooks.profile_did_open.append(aud_src_mgr.init_sources_anki)
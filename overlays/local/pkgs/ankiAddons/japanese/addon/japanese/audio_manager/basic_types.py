@@ -59,6 +59,37 @@ class NameUrlSet(frozenset[NameUrl]):
     pass
 
 
+class DownloadValidators(typing.NamedTuple):
+    """
+    Identifies a downloaded audio source index, both on the server and on disk.
+    """
+
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    file_size: Optional[int] = None
+    sha256: Optional[str] = None
+
+    def conditional_headers(self) -> dict[str, str]:
+        """
+        Headers that ask the server to send the file only if it has changed since it was downloaded.
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def if_range(self) -> Optional[str]:
+        """
+        The value of the If-Range header, which asks the server to send the rest of the file only if it hasn't changed.
+        Weak ETags can't be used to resume downloads.
+        """
+        if self.etag and not self.etag.startswith("W/"):
+            return self.etag
+        return self.last_modified
+
+
 @dataclasses.dataclass(frozen=True)
 class AudioStats:
     source_name: str
@@ -8,11 +8,16 @@ from typing import Any, Callable, NamedTuple, Optional
 from aqt import mw
 
 from .basic_types import AudioManagerException, FileUrlData
+from .file_cache import is_remote_file
 
 
 class DownloadedData(NamedTuple):
     desired_filename: str
     data: bytes
+    # True if the file was taken from the audio file cache instead of being downloaded.
+    from_cache: bool = False
+    # True if the audio file cache was looked up. Files of local audio sources bypass it.
+    cache_consulted: bool = False
 
 
 class FileSaveResults(NamedTuple):
@@ -46,15 +51,28 @@ def format_report_successes_msg(successes: list[DownloadedData]) -> str:
     return buffer.getvalue()
 
 
-def format_report_results_msg(r: FileSaveResults) -> str:
+def format_report_cache_msg(r: FileSaveResults) -> str:
+    n_cached = sum(1 for file in r.successes if file.from_cache)
+    n_total = sum(1 for file in r.successes if file.cache_consulted) + sum(
+        1 for fail in r.fails if isinstance(fail.file, FileUrlData) and is_remote_file(fail.file.url)
+    )
+    if n_total == 0:
+        return ""
+    return f"<b>Audio cache:</b> {n_cached} of {n_total} files found on disk ({n_cached / n_total:.0%} hit rate)."
+
+
+def format_report_results_msg(r: FileSaveResults, with_cache_msg: bool = False) -> str:
     """
     Make text for a tooltip with audio download results.
+    The hit rate of the audio file cache is reported only if with_cache_msg is set.
     """
     buffer = io.StringIO()
     if r.successes:
         buffer.write(format_report_successes_msg(r.successes))
     if r.fails:
         buffer.write(format_report_errors_msg(r.fails))
+    if with_cache_msg and (r.successes or r.fails):
+        buffer.write(format_report_cache_msg(r))
     return buffer.getvalue()
 
 
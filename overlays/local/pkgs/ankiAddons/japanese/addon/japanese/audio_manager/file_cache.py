@@ -0,0 +1,233 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import hashlib
+import os
+import pathlib
+import sqlite3
+import threading
+from typing import Optional
+
+from ..mecab_controller.lru_cache import CacheStats
+
+AUDIO_FILE_CACHE_DIR_NAME = "audio_file_cache"
+AUDIO_FILE_CACHE_INDEX_NAME = "index.sqlite3"
+AUDIO_FILE_CACHE_SCHEMA = """
+--- Which file each remote audio file of an audio source was stored as.
+CREATE TABLE IF NOT EXISTS audio_file_keys(
+    source_name TEXT NOT NULL,
+    url         TEXT NOT NULL,
+    sha256      TEXT NOT NULL,
+    PRIMARY KEY (source_name, url)
+);
+--- Stored files, named after the sha256 of their content.
+CREATE TABLE IF NOT EXISTS audio_file_blobs(
+    sha256    TEXT    primary key NOT NULL,
+    size      INTEGER NOT NULL,
+    last_used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS index_audio_file_keys_sha256 ON audio_file_keys(sha256);
+CREATE INDEX IF NOT EXISTS index_audio_file_blobs_last_used ON audio_file_blobs(last_used);
+"""
+
+
+def is_remote_file(file_url: str) -> bool:
+    """Files of local audio sources are read from disk. Only remote files go through the cache."""
+    return not os.path.isfile(file_url)
+
+
+class AudioFileCache:
+    """
+    Keeps downloaded audio files on disk, so that they aren't downloaded again
+    when another note or profile needs them, and so that they can be added while offline.
+    Each file is looked up by the name of its audio source and its URL.
+    Files with equal content are stored once, named after their sha256.
+    When the stored files grow beyond max_size bytes, the least recently used ones are removed.
+    The cache is an optimization, so any error disables it instead of breaking the download.
+    """
+
+    _cache_dir: pathlib.Path
+    _max_size: int
+    _failed: bool
+    _con: Optional[sqlite3.Connection]
+    _lock: threading.Lock
+    _total_size: int
+    _clock: int
+    _hits: int
+    _misses: int
+    _evictions: int
+
+    def __init__(self, cache_dir: pathlib.Path, max_size: int) -> None:
+        self._cache_dir = cache_dir
+        self._max_size = max_size
+        self._failed = False
+        self._lock = threading.Lock()
+        self._con = None
+        self._total_size = 0
+        self._clock = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._con is None:
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            # The connection is shared by all threads and guarded by the lock.
+            con = sqlite3.connect(self._cache_dir / AUDIO_FILE_CACHE_INDEX_NAME, check_same_thread=False, timeout=1)
+            con.execute("PRAGMA journal_mode = WAL")
+            con.execute("PRAGMA synchronous = NORMAL")
+            con.executescript(AUDIO_FILE_CACHE_SCHEMA)
+            self._total_size, self._clock = con.execute(
+                "SELECT coalesce(sum(size), 0), coalesce(max(last_used), 0) FROM audio_file_blobs"
+            ).fetchone()
+            self._con = con
+        return self._con
+
+    def _disable(self, ex: Exception) -> None:
+        print(f"audio file cache is disabled: {ex}")
+        self._failed = True
+        self._max_size = 0
+        self._close()
+
+    def _blob_path(self, sha256: str) -> pathlib.Path:
+        return self._cache_dir / sha256[:2] / sha256
+
+    def is_enabled(self) -> bool:
+        return self._max_size > 0
+
+    def set_max_size(self, max_size: int) -> None:
+        """
+        Apply a new size limit. A limit of 0 disables the cache but keeps the stored files.
+        If the stored files take up more than the new limit, the least recently used ones are removed right away.
+        """
+        with self._lock:
+            if self._failed or max_size == self._max_size:
+                return
+            self._max_size = max_size
+            if not self.is_enabled():
+                return
+            try:
+                con = self._connect()
+                self._evict(con)
+                con.commit()
+            except (sqlite3.Error, OSError) as ex:
+                self._disable(ex)
+
+    def get(self, source_name: str, url: str) -> Optional[bytes]:
+        """
+        Return the stored file, or None if it hasn't been stored or the stored copy is damaged.
+        """
+        if not self.is_enabled():
+            return None
+        with self._lock:
+            try:
+                con = self._connect()
+                row = con.execute(
+                    "SELECT sha256 FROM audio_file_keys WHERE source_name = ? AND url = ?",
+                    (source_name, url),
+                ).fetchone()
+                data = self._read_blob(row[0]) if row else None
+                if data is None:
+                    self._misses += 1
+                    if row:
+                        self._remove_blobs(con, [row[0]])
+                        con.commit()
+                    return None
+                self._hits += 1
+                self._clock += 1
+                con.execute("UPDATE audio_file_blobs SET last_used = ? WHERE sha256 = ?", (self._clock, row[0]))
+                con.commit()
+                return data
+            except (sqlite3.Error, OSError) as ex:
+                self._disable(ex)
+                return None
+
+    def _read_blob(self, sha256: str) -> Optional[bytes]:
+        try:
+            data = self._blob_path(sha256).read_bytes()
+        except OSError:
+            return None
+        return data if hashlib.sha256(data).hexdigest() == sha256 else None
+
+    def put(self, source_name: str, url: str, data: bytes) -> None:
+        if not self.is_enabled() or len(data) > self._max_size:
+            return
+        sha256 = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            try:
+                con = self._connect()
+                path = self._blob_path(sha256)
+                stored = con.execute("SELECT size FROM audio_file_blobs WHERE sha256 = ?", (sha256,)).fetchone()
+                if stored is None or not path.is_file():
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    tmp_path = path.with_name(f"{path.name}.tmp")
+                    tmp_path.write_bytes(data)
+                    os.replace(tmp_path, path)
+                if stored is None:
+                    self._total_size += len(data)
+                self._clock += 1
+                con.execute(
+                    "INSERT OR REPLACE INTO audio_file_blobs (sha256, size, last_used) VALUES (?, ?, ?)",
+                    (sha256, len(data), self._clock),
+                )
+                con.execute(
+                    "INSERT OR REPLACE INTO audio_file_keys (source_name, url, sha256) VALUES (?, ?, ?)",
+                    (source_name, url, sha256),
+                )
+                self._evict(con)
+                con.commit()
+            except (sqlite3.Error, OSError) as ex:
+                self._disable(ex)
+
+    def _remove_blobs(self, con: sqlite3.Connection, sha256s: list[str]) -> None:
+        for sha256 in sha256s:
+            row = con.execute("SELECT size FROM audio_file_blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            con.execute("DELETE FROM audio_file_blobs WHERE sha256 = ?", (sha256,))
+            con.execute("DELETE FROM audio_file_keys WHERE sha256 = ?", (sha256,))
+            self._total_size -= row[0] if row else 0
+            try:
+                os.unlink(self._blob_path(sha256))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self, con: sqlite3.Connection) -> None:
+        """Remove the least recently used files until the cache takes up no more than 3/4 of its limit."""
+        if self._total_size <= self._max_size:
+            return
+        target = self._max_size * 3 // 4
+        size_left = self._total_size
+        to_remove = []
+        for sha256, size in con.execute("SELECT sha256, size FROM audio_file_blobs ORDER BY last_used").fetchall():
+            if size_left <= target:
+                break
+            to_remove.append(sha256)
+            size_left -= size
+        self._remove_blobs(con, to_remove)
+        self._evictions += len(to_remove)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            entries = 0
+            if self._con is not None:
+                entries = self._con.execute("SELECT count(*) FROM audio_file_blobs").fetchone()[0]
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=entries,
+                size_bytes=self._total_size,
+            )
+
+    def total_size(self) -> int:
+        return self._total_size
+
+    def _close(self) -> None:
+        if self._con is not None:
+            try:
+                self._con.close()
+            except sqlite3.Error:
+                pass
+            self._con = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
@@ -0,0 +1,125 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import itertools
+import operator
+import queue
+import threading
+from collections.abc import Iterable, Iterator
+from typing import Any, Optional, Union
+
+from ..database.audio_buddy import INSERT_CHUNK_SIZE, iter_chunks
+from .audio_source import AudioSource
+from .basic_types import DownloadValidators
+
+# Number of chunks that the reader may get ahead of the writer.
+FEED_MAX_CHUNKS = 4
+# How often a blocked reader checks if the writer has stopped listening.
+FEED_PUT_TIMEOUT_S = 0.2
+
+Section = tuple[str, Iterable[tuple[str, Any]]]
+# A chunk of items of a section, an error raised by the reader, or None at the end of the index.
+FeedMessage = Union[tuple[str, list[tuple[str, Any]]], BaseException, None]
+
+
+class FeedClosed(Exception):
+    pass
+
+
+class SourceFeed:
+    """
+    Passes the sections of an audio source index from the thread that reads it
+    to the thread that writes it to the database.
+    Items are passed in chunks through a bounded queue, so the reader can't get far ahead of the writer.
+    """
+
+    source: AudioSource
+    # Validators of the previous download, replaced by the reader with the validators of the new one.
+    validators: Optional[DownloadValidators]
+    _queue: queue.Queue[FeedMessage]
+    _closed: threading.Event
+    _chunk_size: int
+
+    def __init__(
+        self,
+        source: AudioSource,
+        validators: Optional[DownloadValidators] = None,
+        max_chunks: int = FEED_MAX_CHUNKS,
+        chunk_size: int = INSERT_CHUNK_SIZE,
+    ) -> None:
+        self.source = source
+        self.validators = validators
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._closed = threading.Event()
+        self._chunk_size = chunk_size
+
+    def __enter__(self) -> "SourceFeed":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def _put(self, message: FeedMessage) -> None:
+        while not self._closed.is_set():
+            try:
+                self._queue.put(message, timeout=FEED_PUT_TIMEOUT_S)
+            except queue.Full:
+                continue
+            return
+        raise FeedClosed()
+
+    def produce(self, sections: Iterable[Section]) -> None:
+        """
+        Called by the reader. Pass all sections to the writer, or the error that stopped the reader.
+        """
+        try:
+            for key, items in sections:
+                # An empty chunk marks the start of a section, so that empty sections reach the writer too.
+                self._put((key, []))
+                for chunk in iter_chunks(items, self._chunk_size):
+                    self._put((key, chunk))
+        except FeedClosed:
+            return
+        except Exception as ex:
+            self.fail(ex)
+        else:
+            self._put_or_drop(None)
+
+    def fail(self, ex: BaseException) -> None:
+        """
+        Called by the reader. Pass the error to the writer. It is raised while the writer reads the sections.
+        """
+        self._put_or_drop(ex)
+
+    def _put_or_drop(self, message: FeedMessage) -> None:
+        try:
+            self._put(message)
+        except FeedClosed:
+            pass
+
+    def _messages(self) -> Iterator[tuple[str, list[tuple[str, Any]]]]:
+        while True:
+            message = self._queue.get()
+            if message is None:
+                return
+            if isinstance(message, BaseException):
+                raise message
+            yield message
+
+    def sections(self) -> Iterator[Section]:
+        """
+        Called by the writer. Yield the sections in the same form as JsonObjectStream.sections().
+        """
+        for key, group in itertools.groupby(self._messages(), key=operator.itemgetter(0)):
+            yield key, itertools.chain.from_iterable(chunk for _key, chunk in group)
+
+    def close(self) -> None:
+        """
+        Called by the writer when it stops reading. The reader stops at the next chunk.
+        """
+        self._closed.set()
+        # Free the chunks that won't be read.
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
@@ -1,33 +1,45 @@
 # Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import contextlib
 import dataclasses
+import hashlib
 import io
-import json
 import os
+import pathlib
+import queue
 import re
 import zipfile
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Any, Optional
 
 from ..config_view import JapaneseConfig
-from ..database.audio_buddy import BoundFile
+from ..database.audio_buddy import FoundFile
 from ..database.sqlite3_buddy import Sqlite3Buddy
-from ..helpers.audio_json_schema import FileInfo
 from ..helpers.basic_types import AudioManagerHttpClientABC
+from ..helpers.file_ops import rm_file
+from ..helpers.http_client import remove_part
+from ..helpers.json_stream import JsonObjectStream
 from ..mecab_controller.kana_conv import to_katakana
 from ..pitch_accents.common import split_pitch_numbers
 from ..pitch_accents.consts import NO_ACCENT
 from .audio_source import AudioSource
 from .basic_types import (
     AudioManagerException,
+    DownloadValidators,
     FileUrlData,
     NameUrl,
     NameUrlSet,
     TotalAudioStats,
 )
+from .file_cache import AudioFileCache, is_remote_file
+from .source_feed import SourceFeed
 
 RE_FILENAME_PROHIBITED = re.compile(r'[\\\n\t\r#%&\[\]{}<>^*?/$!\'":@+`|=]+', flags=re.MULTILINE | re.IGNORECASE)
 RE_UNDER = re.compile(r"_+", flags=re.MULTILINE | re.IGNORECASE)
 MAX_LEN_BYTES = 120
+# Number of audio sources that are downloaded and parsed at once.
+MAX_INIT_WORKERS = 4
 
 
 def cut_to_anki_size(text: str, max_len_bytes: int) -> str:
@@ -70,9 +82,12 @@ class InitResult:
         return cls([], [], did_run=False)
 
 
-def read_zip(zip_in: zipfile.ZipFile, audio_source: AudioSource) -> bytes:
+def open_zip_json(zip_in: zipfile.ZipFile, audio_source: AudioSource) -> IO[bytes]:
+    """
+    Open the json file inside the zip file. It is decompressed while it is being read.
+    """
     try:
-        return zip_in.read(next(name for name in zip_in.namelist() if name.endswith(".json")))
+        return zip_in.open(next(name for name in zip_in.namelist() if name.endswith(".json")))
     except (StopIteration, zipfile.BadZipFile) as ex:
         raise AudioManagerException(
             audio_source,
@@ -85,16 +100,19 @@ class AudioSourceManager:
     _config: JapaneseConfig
     _http_client: AudioManagerHttpClientABC
     _db: Sqlite3Buddy
+    _file_cache: Optional[AudioFileCache]
 
     def __init__(
         self,
         config: JapaneseConfig,
         http_client: AudioManagerHttpClientABC,
         db: Sqlite3Buddy,
+        file_cache: Optional[AudioFileCache] = None,
     ) -> None:
         self._config = config
         self._http_client = http_client
         self._db = db
+        self._file_cache = file_cache
 
     def iter_enabled_audio_sources(self) -> Iterable[AudioSource]:
         """
@@ -126,27 +144,50 @@ class AudioSourceManager:
         )
 
     def search_word(self, word: str) -> Iterable[FileUrlData]:
-        for source in self.iter_enabled_audio_sources():
-            for file in self._db.search_files_in_source(source.name, word):
-                yield self._resolve_file(source, file)
+        return self.search_words((word,))[word]
+
+    def search_words(self, words: Iterable[str]) -> dict[str, list[FileUrlData]]:
+        """
+        Search all words with one query.
+        Return the files of each word, ordered by the priority of their audio sources.
+        """
+        sources = {source.name: source for source in self.iter_enabled_audio_sources()}
+        hits: dict[str, list[FileUrlData]] = {word: [] for word in words}
+        # Looking up the media dir takes a few queries, so it's done once per source.
+        media_dirs: dict[str, str] = {}
+        for found in self._db.search_files_in_sources(tuple(sources), tuple(hits)):
+            source = sources[found.file.source_name]
+            if source.name not in media_dirs:
+                media_dirs[source.name] = source.media_dir
+            hits[found.file.headword].append(self._resolve_file(source, media_dirs[source.name], found))
+        return hits
 
     def read_pronunciation_data(self, source: AudioSource) -> None:
-        if source.is_cached():
-            # Check if the URLs mismatch,
-            # e.g. when the user changed the URL without changing the name.
-            if source.url == source.original_url:
-                return
-            else:
-                self._db.remove_data(source.name)
-        if source.is_local:
-            self._read_local_json(source)
-        else:
-            self._download_remote_json(source)
+        if not self._needs_reading(source):
+            return
+        path, validators = self._fetch_index(source, self._db.get_download_validators(source.url))
+        with contextlib.closing(self._iter_sections(source, open(path, "rb"))) as sections:
+            self._db.insert_sections(source.name, sections)
+        self._after_import(source, validators)
+
+    def _after_import(self, source: AudioSource, validators: Optional[DownloadValidators]) -> None:
         source.update_original_url()
-
-    def _resolve_file(self, source: AudioSource, file: BoundFile) -> FileUrlData:
+        if validators:
+            self._db.set_download_validators(source.url, validators)
+
+    def _needs_reading(self, source: AudioSource) -> bool:
+        if not source.is_cached():
+            return True
+        # Check if the URLs mismatch,
+        # e.g. when the user changed the URL without changing the name.
+        if source.url == source.original_url:
+            return False
+        self._db.remove_data(source.name)
+        return True
+
+    def _resolve_file(self, source: AudioSource, media_dir: str, found: FoundFile) -> FileUrlData:
         components: list[str] = []
-        file_info: FileInfo = self._db.get_file_info(source.name, file.file_name)
+        file, file_info = found
 
         # Append either pitch pattern or kana reading, preferring pitch pattern.
         if file_info["pitch_pattern"]:
@@ -165,7 +206,7 @@ class AudioSourceManager:
         ))
         desired_filename = f"{normalize_filename(desired_filename)}{file.ext()}"
         return FileUrlData(
-            url=source.join_media_path(source.media_dir, file.file_name),
+            url=source.join_media_path(media_dir, file.file_name),
             desired_filename=desired_filename,
             word=file.headword,
             source_name=source.name,
@@ -173,34 +214,60 @@ class AudioSourceManager:
             pitch_number=(file_info["pitch_number"] or NO_ACCENT),
         )
 
-    def _read_local_json(self, source: AudioSource) -> None:
-        if source.url.endswith(".zip"):
-            # Read from a zip file that is expected to contain a json file with audio source data.
-            with zipfile.ZipFile(source.url) as zip_in:
-                print(f"Reading local zip audio source: {source.url}")
-                self._db.insert_data(source.name, json.loads(read_zip(zip_in, source)))
-        else:
-            # Read an uncompressed json file.
-            with open(source.url, encoding="utf8") as f:
-                print(f"Reading local json audio source: {source.url}")
-                self._db.insert_data(source.name, json.load(f))
+    def _download_path(self, url: str) -> pathlib.Path:
+        return self._db.audio_downloads_dir() / hashlib.sha1(url.encode("utf-8")).hexdigest()
 
-    def _download_remote_json(self, source: AudioSource) -> None:
+    def _fetch_index(
+        self, source: AudioSource, validators: Optional[DownloadValidators]
+    ) -> tuple[pathlib.Path, Optional[DownloadValidators]]:
+        """
+        Find a local audio source, or download a remote one to disk.
+        Return the path to the file and the validators of the download.
+        """
+        if source.is_local:
+            print(f"Reading a local audio source: {source.url}")
+            return pathlib.Path(source.url), None
         print(f"Downloading a remote audio source: {source.url}")
-        bytes_data = self._http_client.download(source)
+        dest = self._download_path(source.url)
+        validators = self._http_client.download_to_file(source, dest, validators)
+        return dest, validators
 
-        try:
-            self._db.insert_data(source.name, json.loads(bytes_data))
-        except UnicodeDecodeError:
-            with io.BytesIO(bytes_data) as file, zipfile.ZipFile(file) as zip_in:
-                self._db.insert_data(source.name, json.loads(read_zip(zip_in, source)))
+    def _iter_sections(self, source: AudioSource, file: IO[bytes]) -> Iterator[tuple[str, Iterable[tuple[str, Any]]]]:
+        """
+        Parse the json data while it is being read, so that large audio sources don't have to fit in memory.
+        Zip files are expected to contain a json file with audio source data. It is decompressed while it is read.
+        """
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(file)
+            # Downloaded files have no extension.
+            is_zip = source.url.endswith(".zip") if source.is_local else zipfile.is_zipfile(file)
+            if is_zip:
+                file = open_zip_json(stack.enter_context(zipfile.ZipFile(file)), source)
+            else:
+                file.seek(0)
+            text_stream = stack.enter_context(io.TextIOWrapper(file, encoding="utf-8-sig"))
+            yield from JsonObjectStream(text_stream).sections()
 
     def _get_file(self, file: FileUrlData) -> bytes:
         if os.path.isfile(file.url):
             with open(file.url, "rb") as f:
                 return f.read()
         else:
-            return self._http_client.download(file)
+            data = self._http_client.download(file)
+            if self._file_cache:
+                self._file_cache.put(file.source_name, file.url, data)
+            return data
+
+    def _uses_file_cache(self, file: FileUrlData) -> bool:
+        return self._file_cache is not None and self._file_cache.is_enabled() and is_remote_file(file.url)
+
+    def _get_cached_file(self, file: FileUrlData) -> Optional[bytes]:
+        """
+        Return a remote file that has been downloaded before, without touching the network.
+        """
+        if not self._uses_file_cache(file):
+            return None
+        return self._file_cache.get(file.source_name, file.url)
 
     def remove_data(self, source_name: str) -> None:
         self._db.remove_data(source_name)
@@ -221,6 +288,18 @@ class AudioSourceManager:
                 print(f"Source isn't cached: {to_delete.name} ({to_delete.url})")
         return removed
 
+    def remove_unused_downloads(self) -> None:
+        """
+        Remove downloaded audio source indexes whose URLs are no longer in the config.
+        """
+        urls_in_config = frozenset(source.url for source in self._config.iter_audio_sources())
+        for url in frozenset(self._db.download_urls()) - urls_in_config:
+            print(f"Removing unused download of audio source: {url}")
+            dest = self._download_path(url)
+            rm_file(dest)
+            remove_part(dest)
+            self._db.remove_download_validators(url)
+
     def clear_audio_tables(self) -> None:
         self._db.clear_all_audio_data()
 
@@ -244,23 +323,96 @@ class AudioSourceManager:
         """
         return self.must_be_initialized() - self.already_initialized()
 
+    def _read_in_background(self, feeds: list[SourceFeed], ready: queue.Queue[SourceFeed]) -> None:
+        """
+        Download and parse audio sources that share a URL in a worker thread.
+        The file is downloaded once, since the download path depends only on the URL.
+        The sources are then parsed one after another.
+        The writer picks up each feed once it is about to be parsed.
+        """
+        try:
+            path, validators = self._fetch_index(feeds[0].source, feeds[0].validators)
+        except Exception as ex:
+            for feed in feeds:
+                feed.fail(ex)
+                ready.put(feed)
+            return
+        for feed in feeds:
+            feed.validators = validators
+            try:
+                file = open(path, "rb")
+            except Exception as ex:
+                feed.fail(ex)
+                continue
+            finally:
+                ready.put(feed)
+            with contextlib.closing(self._iter_sections(feed.source, file)) as sections:
+                feed.produce(sections)
+
+    def _write_source(self, feed: SourceFeed) -> None:
+        with feed:
+            self._db.insert_sections(feed.source.name, feed.sections())
+        self._after_import(feed.source, feed.validators)
+
     def get_sources(self) -> InitResult:
         """
         This method is normally run in a different thread.
         A separate db connection is used.
+        Audio sources are downloaded and parsed in a pool of worker threads.
+        Only this thread uses the db connection. It writes the sources one by one, in the order they become ready.
         """
-        sources, errors = [], []
-        for source in self.iter_enabled_audio_sources():
+        result = InitResult([], [])
+        enabled = list(self.iter_enabled_audio_sources())
+        feeds: list[SourceFeed] = []
+        for source in enabled:
             try:
-                self.read_pronunciation_data(source)
-            except AudioManagerException as ex:
-                print(f"Ignoring audio source {source.name}: {ex.describe_short()}.")
-                errors.append(ex)
-                continue
+                if self._needs_reading(source):
+                    feeds.append(SourceFeed(source, self._db.get_download_validators(source.url)))
+                    continue
             except Exception as ex:
-                print(ex)
-                errors.append(AudioManagerException(source, str(ex), exception=ex))
+                self._add_error(result, source, ex)
             else:
-                sources.append(source)
-                print(f"Initialized audio source: {source.name}")
-        return InitResult(sources, errors)
+                self._add_source(result, source)
+        if feeds:
+            self._read_sources(result, feeds)
+        # Keep the order of the config.
+        order = {source.name: idx for idx, source in enumerate(enabled)}
+        result.sources.sort(key=lambda source: order[source.name])
+        return result
+
+    def _read_sources(self, result: InitResult, feeds: list[SourceFeed]) -> None:
+        ready: queue.Queue[SourceFeed] = queue.Queue()
+        # Sources with the same URL must not be downloaded to the same path at once.
+        by_url: dict[str, list[SourceFeed]] = {}
+        for feed in feeds:
+            by_url.setdefault(feed.source.url, []).append(feed)
+        with ThreadPoolExecutor(max_workers=min(MAX_INIT_WORKERS, len(by_url))) as pool:
+            try:
+                for same_url in by_url.values():
+                    pool.submit(self._read_in_background, same_url, ready)
+                for _ in feeds:
+                    feed = ready.get()
+                    try:
+                        self._write_source(feed)
+                    except Exception as ex:
+                        self._add_error(result, feed.source, ex)
+                    else:
+                        self._add_source(result, feed.source)
+            finally:
+                # Stop the workers if the writer has stopped early.
+                for feed in feeds:
+                    feed.close()
+
+    @staticmethod
+    def _add_source(result: InitResult, source: AudioSource) -> None:
+        result.sources.append(source)
+        print(f"Initialized audio source: {source.name}")
+
+    @staticmethod
+    def _add_error(result: InitResult, source: AudioSource, ex: Exception) -> None:
+        if isinstance(ex, AudioManagerException):
+            print(f"Ignoring audio source {source.name}: {ex.describe_short()}.")
+            result.errors.append(ex)
+        else:
+            print(ex)
+            result.errors.append(AudioManagerException(source, str(ex), exception=ex))
@@ -5,7 +5,7 @@ import enum
 import functools
 import re
 from collections.abc import Iterable, MutableSequence, Sequence
-from typing import NamedTuple, final
+from typing import NamedTuple, Optional, final
 
 from aqt import mw
 
@@ -32,8 +32,21 @@ def as_lower_str_list(values: Sequence[str]) -> Sequence[str]:
     return [value.lower() for value in values]
 
 
+def to_katakana_set(words: Iterable[str]) -> frozenset[str]:
+    return frozenset(map(to_katakana, words))
+
+
+class CompiledWordList(NamedTuple):
+    """A list of words from the config, ready to be checked against. Rebuilt when the config version changes."""
+
+    version: int
+    katakana_words: frozenset[str]
+    skip_numbers: bool = False
+
+
 class WordBlockListManager(ConfigSubViewBase):
     _NUMBERS = re.compile(r"[一二三四五六七八九十０１２３４５６７８９0123456789]+")
+    _blocklist: Optional[CompiledWordList] = None
 
     @property
     def _should_skip_numbers(self) -> bool:
@@ -44,11 +57,22 @@ class WordBlockListManager(ConfigSubViewBase):
         """Returns a user-defined list of blocklisted words."""
         return split_cfg_words(self["blocklisted_words"])
 
+    def _compiled_blocklist(self) -> CompiledWordList:
+        blocklist = self._blocklist
+        if blocklist is None or blocklist.version != self.version:
+            blocklist = self._blocklist = CompiledWordList(
+                version=self.version,
+                katakana_words=to_katakana_set(self.blocklisted_words),
+                skip_numbers=self._should_skip_numbers,
+            )
+        return blocklist
+
     def is_blocklisted(self, word: str) -> bool:
         """Returns True if the user specified that the word should not be looked up."""
-        if to_katakana(word) in map(to_katakana, self.blocklisted_words):
+        blocklist = self._compiled_blocklist()
+        if to_katakana(word) in blocklist.katakana_words:
             return True
-        if self._should_skip_numbers and re.fullmatch(self._NUMBERS, word):
+        if blocklist.skip_numbers and self._NUMBERS.fullmatch(word):
             return True
         return False
 
@@ -66,6 +90,7 @@ class PitchAndFuriganaCommon(WordBlockListManager):
 @final
 class FuriganaConfigView(PitchAndFuriganaCommon):
     _view_key: str = "furigana"
+    _mecab_only: Optional[CompiledWordList] = None
 
     @property
     def prefer_literal_pronunciation(self) -> bool:
@@ -76,8 +101,17 @@ class FuriganaConfigView(PitchAndFuriganaCommon):
         """Words that shouldn't be looked up in the accent dictionary."""
         return split_cfg_words(self["mecab_only"])
 
+    def _compiled_mecab_only(self) -> CompiledWordList:
+        mecab_only = self._mecab_only
+        if mecab_only is None or mecab_only.version != self.version:
+            mecab_only = self._mecab_only = CompiledWordList(
+                version=self.version,
+                katakana_words=to_katakana_set(self.mecab_only),
+            )
+        return mecab_only
+
     def can_lookup_in_db(self, word: str) -> bool:
-        return self.maximum_results > 1 and (word not in self.mecab_only)
+        return self.maximum_results > 1 and (to_katakana(word) not in self._compiled_mecab_only().katakana_words)
 
     @property
     def maximum_pitch_accents(self) -> int:
@@ -232,6 +266,10 @@ class AudioSettingsConfigView(ConfigSubViewBase, AudioSettingsConfigViewABC):
     def tag_separator(self) -> str:
         return self["tag_separator"]
 
+    @property
+    def file_cache_size_mb(self) -> int:
+        return int(self["file_cache_size_mb"])
+
 
 @enum.unique
 class ForvoAudioFormat(enum.Enum):
@@ -429,6 +467,18 @@ class JapaneseConfig(AddonConfigManager):
     def cache_lookups(self) -> int:
         return int(self["cache_lookups"])
 
+    @property
+    def cache_lookups_mb(self) -> int:
+        return int(self["cache_lookups_mb"])
+
+    @property
+    def mecab_disk_cache_size_mb(self) -> int:
+        return int(self["mecab_disk_cache_size_mb"])
+
+    @property
+    def pitch_memory_index(self) -> bool:
+        return bool(self["pitch_memory_index"])
+
     @property
     def insert_scripts_into_templates(self) -> bool:
         return bool(self["insert_scripts_into_templates"])
@@ -1,12 +1,14 @@
 # Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
 import abc
+import itertools
 import os
+import sqlite3
 import typing
 from collections.abc import Iterable, Sequence
-from typing import Optional
+from typing import Any, Optional
 
-from ..audio_manager.basic_types import AudioStats, NameUrl
+from ..audio_manager.basic_types import AudioStats, DownloadValidators, NameUrl
 from ..helpers.audio_json_schema import FileInfo, SourceIndex
 from .basic_types import (
     InvalidSourceIndex,
@@ -17,6 +19,11 @@ from .basic_types import (
 
 NoneType = type(None)  # fix for the official binary bundle
 MIN_SOURCE_VERSION = 2
+# Stay below the default limit of sqlite on the number of query parameters.
+MAX_SEARCH_HEADWORDS = 500
+# Rows are inserted in chunks of this size, so that a large source is never held in memory at once.
+INSERT_CHUNK_SIZE = 10_000
+T = typing.TypeVar("T")
 
 
 class BoundFile(typing.NamedTuple):
@@ -32,20 +39,34 @@ class BoundFile(typing.NamedTuple):
         return os.path.splitext(self.file_name)[-1]
 
 
+class FoundFile(typing.NamedTuple):
+    """
+    Represents a search result joined with the info about the file.
+    """
+
+    file: BoundFile
+    info: FileInfo
+
+
 def build_or_clause(repeated_field_name: str, count: int) -> str:
     return " OR ".join(f"{repeated_field_name} = ?" for _idx in range(count))
 
 
-def raise_if_invalid_json(data: SourceIndex):
-    """
-    Validate index schema.
-    Raise if format is not supported.
-    """
+def iter_chunks(items: Iterable[T], size: int) -> Iterable[list[T]]:
+    it = iter(items)
+    while chunk := list(itertools.islice(it, size)):
+        yield chunk
+
+
+def raise_if_missing_keys(keys: Iterable[str]) -> None:
     for field_name in SourceIndex.__annotations__:
-        if field_name not in data:
+        if field_name not in keys:
             raise InvalidSourceIndex(f"audio source file is missing a required key: '{field_name}'")
+
+
+def raise_if_invalid_meta(meta: dict[str, Any]) -> None:
     try:
-        version = int(data["meta"]["version"])
+        version = int(meta["version"])
     except (KeyError, ValueError):
         raise InvalidSourceIndex(f"Audio source index version not found.")
 
@@ -53,6 +74,15 @@ def raise_if_invalid_json(data: SourceIndex):
         raise InvalidSourceIndex(f"Outdated index schema: {version}. Minimum supported version: {MIN_SOURCE_VERSION}")
 
 
+def raise_if_invalid_json(data: SourceIndex):
+    """
+    Validate index schema.
+    Raise if format is not supported.
+    """
+    raise_if_missing_keys(data.keys())
+    raise_if_invalid_meta(data["meta"])
+
+
 AUDIO_TABLES_SCHEMA: typing.Final[str] = """
 --- Note: `source_name` is the name given to the audio source by the user,
 --- and it can be arbitrary (e.g. NHK-2016).
@@ -83,6 +113,17 @@ CREATE TABLE IF NOT EXISTS files(
     pitch_number  TEXT
 );
 
+--- Remote audio source indexes that have been downloaded to disk, by URL.
+--- Rows are kept when the cached audio data is removed,
+--- so that the downloaded file can be imported again if the server says it hasn't changed.
+CREATE TABLE IF NOT EXISTS downloads(
+    url           TEXT primary key NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    file_size     INTEGER,
+    sha256        TEXT
+);
+
 CREATE INDEX IF NOT EXISTS index_names ON meta(source_name);
 CREATE INDEX IF NOT EXISTS index_file_names ON headwords(source_name, headword);
 CREATE INDEX IF NOT EXISTS index_file_info ON files(source_name, file_name);
@@ -157,6 +198,43 @@ class AudioSqlite3Buddy(Sqlite3BuddyABC, abc.ABC):
                 for result_tup in results
             )
 
+    def search_files_in_sources(self, source_names: Sequence[str], headwords: Sequence[str]) -> Iterable[FoundFile]:
+        """
+        Find the files of all headwords in all sources, with the info about each file.
+        The files of each headword are ordered by the position of their source in source_names,
+        then in the order in which they were inserted.
+        """
+        if not source_names or not headwords:
+            return
+        sources = ", ".join("(?, ?)" for _idx in range(len(source_names)))
+        source_params = tuple(itertools.chain.from_iterable((name, idx) for idx, name in enumerate(source_names)))
+        for chunk in iter_chunks(headwords, MAX_SEARCH_HEADWORDS):
+            # CROSS JOIN makes sqlite loop over the sources first, so that the index on (source_name, headword) is used.
+            query = f"""
+            WITH sources(source_name, priority) AS (VALUES {sources})
+            SELECT h.headword, h.file_name, h.source_name, f.kana_reading, f.pitch_pattern, f.pitch_number
+            FROM sources s
+            CROSS JOIN headwords h ON h.source_name = s.source_name
+            INNER JOIN files f ON f.source_name = h.source_name AND f.file_name = h.file_name
+            WHERE h.headword IN ({", ".join("?" for _word in chunk)})
+            ORDER BY s.priority, h.rowid;
+            """
+            with cursor_buddy(self.con) as cur:
+                results = cur.execute(query, (*source_params, *chunk)).fetchall()
+            for result in results:
+                yield FoundFile(
+                    file=BoundFile(
+                        headword=result["headword"],
+                        file_name=result["file_name"],
+                        source_name=result["source_name"],
+                    ),
+                    info={
+                        "kana_reading": result["kana_reading"],
+                        "pitch_pattern": result["pitch_pattern"],
+                        "pitch_number": result["pitch_number"],
+                    },
+                )
+
     def get_file_info(self, source_name: str, file_name: str) -> FileInfo:
         query = """
         SELECT kana_reading, pitch_pattern, pitch_number FROM files
@@ -302,6 +380,31 @@ class AudioSqlite3Buddy(Sqlite3BuddyABC, abc.ABC):
             cur.execute(query, (new_url, source_name))
             self.con.commit()
 
+    def get_download_validators(self, url: str) -> Optional[DownloadValidators]:
+        with cursor_buddy(self.con) as cur:
+            query = """ SELECT etag, last_modified, file_size, sha256 FROM downloads WHERE url = ? LIMIT 1; """
+            result = cur.execute(query, (url,)).fetchone()
+            return DownloadValidators(*result) if result else None
+
+    def set_download_validators(self, url: str, validators: DownloadValidators) -> None:
+        with cursor_buddy(self.con) as cur:
+            query = """
+            INSERT OR REPLACE INTO downloads
+            (url, etag, last_modified, file_size, sha256)
+            VALUES(?, ?, ?, ?, ?);
+            """
+            cur.execute(query, (url, *validators))
+            self.con.commit()
+
+    def download_urls(self) -> list[str]:
+        with cursor_buddy(self.con) as cur:
+            return [row[0] for row in cur.execute(""" SELECT url FROM downloads; """).fetchall()]
+
+    def remove_download_validators(self, url: str) -> None:
+        with cursor_buddy(self.con) as cur:
+            cur.execute(""" DELETE FROM downloads WHERE url = ?; """, (url,))
+            self.con.commit()
+
     def is_source_cached(self, source_name: str) -> bool:
         """True if audio source with this name has been cached already."""
         with cursor_buddy(self.con) as cur:
@@ -336,62 +439,87 @@ class AudioSqlite3Buddy(Sqlite3BuddyABC, abc.ABC):
 
     def insert_data(self, source_name: str, data: SourceIndex):
         raise_if_invalid_json(data)
-        with cursor_buddy(self.con) as cur:
-            query = """
-            INSERT INTO meta
-            (source_name, dictionary_name, year, version, original_url, media_dir, media_dir_abs)
-            VALUES(?, ?, ?, ?, ?, ?, ?);
-            """
-            # Insert meta.
-            try:
-                cur.execute(
-                    query,
-                    (
-                        source_name,
-                        data["meta"]["name"],
-                        data["meta"]["year"],
-                        data["meta"]["version"],
-                        None,  # original URL can be null
-                        data["meta"]["media_dir"],
-                        data["meta"].get("media_dir_abs"),  # Possibly unset
-                    ),
-                )
-            except KeyError as ex:
-                raise InvalidSourceIndex(f"Missing field '{ex}'")
-            # Insert headwords and file names
-            query = """
-            INSERT INTO headwords
-            ( source_name, headword, file_name )
-            VALUES( :source_name, :headword, :file_name );
-            """
-            cur.executemany(
+        self.insert_sections(
+            source_name, ((key, value.items()) for key, value in data.items() if isinstance(value, dict))
+        )
+
+    def insert_sections(self, source_name: str, sections: Iterable[tuple[str, Iterable[tuple[str, Any]]]]) -> None:
+        """
+        Insert an audio source index, given as the items of its top-level objects ("meta", "headwords", "files").
+        The items are consumed in chunks, so they can be read from a stream as they are inserted.
+        Nothing is committed unless the whole index is valid.
+        """
+        seen_keys: set[str] = set()
+        try:
+            with cursor_buddy(self.con) as cur:
+                for key, items in sections:
+                    seen_keys.add(key)
+                    if key == "meta":
+                        self._insert_meta(cur, source_name, dict(items))
+                    elif key == "headwords":
+                        self._insert_headwords(cur, source_name, items)
+                    elif key == "files":
+                        self._insert_files(cur, source_name, items)
+            raise_if_missing_keys(seen_keys)
+        except BaseException:
+            self.con.rollback()
+            raise
+        self.con.commit()
+
+    @staticmethod
+    def _insert_meta(cur: sqlite3.Cursor, source_name: str, meta: dict[str, Any]) -> None:
+        raise_if_invalid_meta(meta)
+        query = """
+        INSERT INTO meta
+        (source_name, dictionary_name, year, version, original_url, media_dir, media_dir_abs)
+        VALUES(?, ?, ?, ?, ?, ?, ?);
+        """
+        try:
+            cur.execute(
                 query,
                 (
-                    dict(source_name=source_name, headword=headword, file_name=file_name)
-                    for headword, file_list in data["headwords"].items()
-                    for file_name in file_list
+                    source_name,
+                    meta["name"],
+                    meta["year"],
+                    meta["version"],
+                    None,  # original URL can be null
+                    meta["media_dir"],
+                    meta.get("media_dir_abs"),  # Possibly unset
                 ),
             )
-            # Insert readings and accent info.
-            query = """
-            INSERT INTO files
-            ( source_name, file_name, kana_reading, pitch_pattern, pitch_number )
-            VALUES( :source_name, :file_name, :kana_reading, :pitch_pattern, :pitch_number );
-            """
-            try:
-                cur.executemany(
-                    query,
-                    (
-                        dict(
-                            source_name=source_name,
-                            file_name=file_name,
-                            kana_reading=file_info["kana_reading"],
-                            pitch_pattern=file_info.get("pitch_pattern"),
-                            pitch_number=file_info.get("pitch_number"),
-                        )
-                        for file_name, file_info in data["files"].items()
-                    ),
-                )
-            except KeyError as ex:
-                raise InvalidSourceIndex(f"Missing field '{ex}'")
-            self.con.commit()
+        except KeyError as ex:
+            raise InvalidSourceIndex(f"Missing field '{ex}'")
+
+    @staticmethod
+    def _insert_headwords(cur: sqlite3.Cursor, source_name: str, items: Iterable[tuple[str, Any]]) -> None:
+        query = """
+        INSERT INTO headwords
+        ( source_name, headword, file_name )
+        VALUES( ?, ?, ? );
+        """
+        rows = ((source_name, headword, file_name) for headword, file_list in items for file_name in file_list)
+        for chunk in iter_chunks(rows, INSERT_CHUNK_SIZE):
+            cur.executemany(query, chunk)
+
+    @staticmethod
+    def _insert_files(cur: sqlite3.Cursor, source_name: str, items: Iterable[tuple[str, Any]]) -> None:
+        query = """
+        INSERT INTO files
+        ( source_name, file_name, kana_reading, pitch_pattern, pitch_number )
+        VALUES( ?, ?, ?, ?, ? );
+        """
+        rows = (
+            (
+                source_name,
+                file_name,
+                file_info["kana_reading"],
+                file_info.get("pitch_pattern"),
+                file_info.get("pitch_number"),
+            )
+            for file_name, file_info in items
+        )
+        try:
+            for chunk in iter_chunks(rows, INSERT_CHUNK_SIZE):
+                cur.executemany(query, chunk)
+        except KeyError as ex:
+            raise InvalidSourceIndex(f"Missing field '{ex}'")
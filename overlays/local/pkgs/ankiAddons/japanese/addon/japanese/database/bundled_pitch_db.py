@@ -0,0 +1,166 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import functools
+import hashlib
+import os
+import pathlib
+import sqlite3
+import threading
+import typing
+from collections.abc import Sequence
+from typing import Optional
+
+from ..helpers.file_ops import rm_file
+from ..pitch_accents.common import (
+    AccDictProvider,
+    ProgressCallback,
+    iter_formatted_tuples,
+)
+from ..pitch_accents.consts import FORMATTED_ACCENTS_TSV, RES_DIR_PATH
+from .basic_types import cursor_buddy
+from .connection_pool import sqlite3_uri
+from .pitch_buddy import (
+    PITCH_TABLES_SCHEMA_NAME,
+    PITCH_TABLES_SCHEMA_VERSION,
+    PitchSqlite3Buddy,
+)
+from .version_buddy import VersionSqlite3Buddy
+
+BUNDLED_PITCH_DB_NAME: typing.Final[str] = "pitch_accents_bundled.sqlite3"
+# Built before packaging the add-on (see scripts/build_pitch_db.sh).
+PREBUILT_PITCH_DB: typing.Final[pathlib.Path] = RES_DIR_PATH / BUNDLED_PITCH_DB_NAME
+BUNDLED_SOURCE_SCHEMA: typing.Final[str] = """
+CREATE TABLE IF NOT EXISTS bundled_source(
+    sha1 TEXT NOT NULL
+);
+"""
+
+
+@functools.cache
+def _file_sha1(path: pathlib.Path, _size: int, _mtime_ns: int) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_sha1(path: pathlib.Path) -> str:
+    """The file is hashed once per process, unless it changes."""
+    stat = os.stat(path)
+    return _file_sha1(path, stat.st_size, stat.st_mtime_ns)
+
+
+class BundledPitchDbWriter(VersionSqlite3Buddy, PitchSqlite3Buddy):
+    """
+    Writes the bundled pitch accents to a standalone file.
+    The file is later attached read-only to the add-on's database.
+    """
+
+    def __init__(self, con: sqlite3.Connection) -> None:
+        self.con = con
+
+    def write(self, tsv_path: pathlib.Path, progress: Optional[ProgressCallback] = None) -> None:
+        self.prepare_version_table()
+        self.prepare_pitch_accents_table(is_new_file=True)
+        with self.bulk_load_pitch_accents():
+            self.bulk_insert_pitch_accent_data(iter_formatted_tuples(tsv_path, progress), AccDictProvider.bundled)
+        with cursor_buddy(self.con) as cur:
+            cur.executescript(BUNDLED_SOURCE_SCHEMA)
+            cur.execute("INSERT INTO bundled_source (sha1) VALUES (?);", (file_sha1(tsv_path),))
+            # Gather statistics for the query planner.
+            cur.execute("ANALYZE;")
+            self.con.commit()
+
+
+def build_bundled_pitch_db(
+    tsv_path: pathlib.Path,
+    out_path: pathlib.Path,
+    progress: Optional[ProgressCallback] = None,
+) -> None:
+    """
+    Write the bundled pitch accents to out_path.
+    The file is written under a temporary name first, so that a half-written file is never attached.
+    """
+    tmp_path = out_path.with_name(out_path.name + ".part")
+    rm_file(tmp_path)
+    con = sqlite3.connect(tmp_path)
+    try:
+        # The file is thrown away if writing fails, so there's no need for a journal.
+        con.execute("PRAGMA journal_mode = OFF;")
+        BundledPitchDbWriter(con).write(tsv_path, progress)
+    finally:
+        con.close()
+    os.replace(tmp_path, out_path)
+    print(f"Wrote bundled pitch accents to {out_path}")
+
+
+def is_bundled_pitch_db_valid(db_path: pathlib.Path, tsv_path: pathlib.Path) -> bool:
+    """
+    Check that the file was built from the current pitch accents file by the current version of the add-on.
+    """
+    if not db_path.is_file():
+        return False
+    try:
+        con = sqlite3.connect(sqlite3_uri(db_path, mode="ro", immutable="1"), uri=True)
+    except sqlite3.Error:
+        return False
+    try:
+        (version,) = con.execute(
+            "SELECT number FROM version WHERE schema_name = ?;", (PITCH_TABLES_SCHEMA_NAME,)
+        ).fetchone()
+        (sha1,) = con.execute("SELECT sha1 FROM bundled_source LIMIT 1;").fetchone()
+    except (sqlite3.Error, TypeError):
+        return False
+    finally:
+        con.close()
+    return version == PITCH_TABLES_SCHEMA_VERSION and sha1 == file_sha1(tsv_path)
+
+
+class BundledPitchDbFinder:
+    """
+    Remembers which of the candidate files can be attached,
+    so that each file is checked only once per process.
+    """
+
+    _found: dict[tuple[pathlib.Path, ...], Optional[pathlib.Path]]
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        self._found = {}
+        self._lock = threading.Lock()
+
+    def find(
+        self,
+        candidates: Sequence[pathlib.Path],
+        tsv_path: pathlib.Path = FORMATTED_ACCENTS_TSV,
+    ) -> Optional[pathlib.Path]:
+        key = tuple(candidates)
+        with self._lock:
+            try:
+                return self._found[key]
+            except KeyError:
+                found = self._found[key] = next(
+                    (path for path in candidates if is_bundled_pitch_db_valid(path, tsv_path)),
+                    None,
+                )
+                return found
+
+    def forget(self) -> None:
+        """Check the files again next time, e.g. after one of them has been rebuilt."""
+        with self._lock:
+            self._found.clear()
+
+
+bundled_pitch_db_finder = BundledPitchDbFinder()
+
+
+def main() -> None:
+    """
+    Build the read-only pitch accents database that is shipped with the add-on.
+    """
+    build_bundled_pitch_db(FORMATTED_ACCENTS_TSV, PREBUILT_PITCH_DB)
+
+
+if __name__ == "__main__":
+    main()
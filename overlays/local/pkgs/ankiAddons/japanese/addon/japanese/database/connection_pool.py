@@ -0,0 +1,139 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import pathlib
+import sqlite3
+import threading
+import urllib.parse
+import urllib.request
+from collections.abc import Callable, Sequence
+from typing import Any
+
+MAX_IDLE_PER_THREAD = 2
+CONNECTION_PRAGMAS: Sequence[str] = (
+    # Readers see the last committed state and are never blocked by a writer (and vice versa).
+    "PRAGMA journal_mode = WAL",
+    # In WAL mode, commits stay durable across crashes of the application without an fsync per transaction.
+    "PRAGMA synchronous = NORMAL",
+    # Read the file through memory-mapped I/O instead of read() calls (256 MiB).
+    "PRAGMA mmap_size = 268435456",
+    # Negative values are in KiB (32 MiB).
+    "PRAGMA cache_size = -32768",
+    # Temporary b-trees for DISTINCT, ORDER BY, etc. are kept in memory.
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+def configure_connection(con: sqlite3.Connection) -> None:
+    for pragma in CONNECTION_PRAGMAS:
+        try:
+            con.execute(pragma)
+        except sqlite3.OperationalError as ex:
+            # E.g. the journal mode can't be changed while another connection is writing.
+            # It will be changed by a later connection, since the setting is stored in the file.
+            print(f"Couldn't run '{pragma}': {ex}")
+
+
+def sqlite3_uri(db_path: pathlib.Path, **params: str) -> str:
+    """
+    Make a URI filename, e.g. to open a database read-only.
+    https://www.sqlite.org/uri.html
+    """
+    uri = "file:" + urllib.request.pathname2url(str(db_path))
+    if params:
+        uri += "?" + urllib.parse.urlencode(params)
+    return uri
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    A connection that remembers how it was set up (e.g. which databases are attached to it),
+    so that the next session doesn't have to do it again.
+    """
+
+    state: dict[str, Any]
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.state = {}
+
+
+class Sqlite3ConnectionPool:
+    """
+    Keeps connections open between sessions, so that each session doesn't have to connect
+    and prepare the tables again.
+    A connection is only reused by the thread that created it.
+    Tables are prepared once per database file per process.
+    """
+
+    _idle: dict[tuple[int, pathlib.Path], list[PooledConnection]]
+    _prepared: set[pathlib.Path]
+    _lock: threading.Lock
+    _prepare_lock: threading.Lock
+
+    def __init__(self) -> None:
+        self._idle = {}
+        self._prepared = set()
+        self._lock = threading.Lock()
+        self._prepare_lock = threading.Lock()
+
+    def acquire(self, db_path: pathlib.Path) -> PooledConnection:
+        """
+        Borrow an idle connection of this thread or create a new one.
+        A connection is never shared by two sessions at once, so nested sessions get different connections.
+        """
+        if not db_path.is_file():
+            # The file was deleted or is yet to be created. Connections to the old file can't be reused.
+            self.forget(db_path)
+        with self._lock:
+            try:
+                return self._idle[(threading.get_ident(), db_path)].pop()
+            except (KeyError, IndexError):
+                pass
+        # Idle connections are closed on profile close, possibly by another thread.
+        # URI filenames are enabled so that other databases can be attached in read-only mode.
+        con = sqlite3.connect(sqlite3_uri(db_path), uri=True, check_same_thread=False, factory=PooledConnection)
+        con.row_factory = sqlite3.Row
+        configure_connection(con)
+        return con
+
+    def release(self, db_path: pathlib.Path, con: PooledConnection) -> None:
+        """Return a connection that is no longer used by a session."""
+        with self._lock:
+            idle = self._idle.setdefault((threading.get_ident(), db_path), [])
+            if len(idle) < MAX_IDLE_PER_THREAD and db_path in self._prepared:
+                idle.append(con)
+                return
+        con.close()
+
+    def prepare_once(self, db_path: pathlib.Path, prepare: Callable[[], None]) -> None:
+        """Run prepare() unless the tables in this file have already been prepared."""
+        if db_path in self._prepared:
+            return
+        with self._prepare_lock:
+            if db_path not in self._prepared:
+                prepare()
+                self._prepared.add(db_path)
+
+    def forget(self, db_path: pathlib.Path) -> None:
+        """Close idle connections to the file and prepare its tables again next time."""
+        with self._lock:
+            self._prepared.discard(db_path)
+            to_close = [con for (_tid, path), idle in self._idle.items() if path == db_path for con in idle]
+            self._idle = {key: idle for key, idle in self._idle.items() if key[1] != db_path}
+        for con in to_close:
+            con.close()
+
+    def close_idle(self) -> None:
+        """Close all connections that aren't used by any session at the moment."""
+        with self._lock:
+            to_close = [con for idle in self._idle.values() for con in idle]
+            self._idle.clear()
+        for con in to_close:
+            con.close()
+
+    def idle_count(self) -> int:
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+
+connection_pool = Sqlite3ConnectionPool()
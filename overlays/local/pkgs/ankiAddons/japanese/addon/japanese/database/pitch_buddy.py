@@ -1,14 +1,56 @@
 # Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
 import abc
+import contextlib
+import itertools
+import pathlib
 import sqlite3
+import threading
 import typing
 from collections.abc import Sequence
 from typing import Optional
 
-from ..pitch_accents.common import AccDictRawTSVEntry
+from ..mecab_controller.unify_readings import literal_pronunciation
+from ..pitch_accents.common import AccDictProvider, AccDictRawTSVEntry
 from .basic_types import Sqlite3BuddyABC, Sqlite3BuddyVersionError, cursor_buddy
+from .connection_pool import sqlite3_uri
 
+# Searches sort rows by these columns, so that the most frequent pronunciations come first.
+# The covering indexes below list the same columns in the same order after the searched column.
+PITCH_SORT_COLUMNS: typing.Final[Sequence[str]] = (
+    "frequency DESC",
+    "pitch_number",
+    "katakana_reading",
+    "headword",
+    "raw_headword",
+    "html_notation",
+)
+PITCH_TABLE_INDEXES: typing.Final[dict[str, str]] = {
+    # Searches are answered from the index alone, and rows are read already sorted.
+    "index_pitch_accents_headword_sorted": (
+        """
+    CREATE INDEX IF NOT EXISTS index_pitch_accents_headword_sorted
+    ON pitch_accents_formatted(
+        headword, frequency DESC, pitch_number, katakana_reading, raw_headword, html_notation, source, reading_key
+    );
+    """
+    ),
+    "index_pitch_accents_reading_sorted": (
+        """
+    CREATE INDEX IF NOT EXISTS index_pitch_accents_reading_sorted
+    ON pitch_accents_formatted(
+        katakana_reading, frequency DESC, pitch_number, headword, raw_headword, html_notation, source, reading_key
+    );
+    """
+    ),
+    # Filtering by source is used when retrieving results and when reloading the user's override table.
+    "index_pitch_accents_source": (
+        """
+    CREATE INDEX IF NOT EXISTS index_pitch_accents_source
+    ON pitch_accents_formatted(source);
+    """
+    ),
+}
 PITCH_TABLES_SCHEMA: typing.Final[str] = """
 CREATE TABLE IF NOT EXISTS pitch_accents_formatted(
     headword         TEXT    NOT NULL,
@@ -17,21 +59,107 @@ CREATE TABLE IF NOT EXISTS pitch_accents_formatted(
     html_notation    TEXT    NOT NULL,
     pitch_number     TEXT    NOT NULL,
     frequency        INTEGER NOT NULL,
-    source           TEXT    NOT NULL
+    source           TEXT    NOT NULL,
+    reading_key      TEXT    NOT NULL -- literal pronunciation of the reading, to compare readings.
 );
+"""
+PITCH_TABLES_SCHEMA_VERSION: typing.Final[int] = 5
+PITCH_TABLES_SCHEMA_NAME: typing.Final[str] = "pitch"
+# The bundled pitch accents are kept in a separate read-only file attached under this name.
+BUNDLED_PITCH_SCHEMA: typing.Final[str] = "bundled"
+# Lookups read from this view, which combines the user's rows with the bundled rows.
+PITCH_VIEW_NAME: typing.Final[str] = "pitch_accents_all"
+USER_PITCH_WORDS_STATE: typing.Final[str] = "user_pitch_words"
+# Rows whose headword is equal to the word, then rows whose reading is equal to it.
+# Each part is read from a covering index in sorted order, and sqlite merges the parts without sorting them again.
+# A row whose headword and reading are both equal to the word is only returned by the first part.
+# If a reading key is given, rows with other readings are skipped, except rows of the preferred provider,
+# which are needed to tell whether the provider has data for the word.
+SEARCH_PITCH_ACCENTS_QUERY: typing.Final[str] = f"""
+SELECT headword, raw_headword, katakana_reading, html_notation, pitch_number, frequency, source, reading_key
+FROM {PITCH_VIEW_NAME}
+WHERE headword = :word
+AND ( :reading_key = '' OR reading_key = :reading_key OR source = :provider )
+UNION ALL
+SELECT headword, raw_headword, katakana_reading, html_notation, pitch_number, frequency, source, reading_key
+FROM {PITCH_VIEW_NAME}
+WHERE katakana_reading = :word AND headword != :word
+AND ( :reading_key = '' OR reading_key = :reading_key OR source = :provider )
+ORDER BY {', '.join(PITCH_SORT_COLUMNS)} ;
+"""
+# Headwords of rows whose headword or reading starts with a prefix, i.e. lies in the range [start, stop).
+# Both ranges are read from the covering indexes.
+SEARCH_PITCH_ACCENT_HEADWORDS_QUERY: typing.Final[str] = f"""
+SELECT headword FROM (
+    SELECT headword, frequency FROM {PITCH_VIEW_NAME}
+    WHERE headword >= :start AND headword < :stop
+    UNION ALL
+    SELECT headword, frequency FROM {PITCH_VIEW_NAME}
+    WHERE katakana_reading >= :start AND katakana_reading < :stop
+)
+GROUP BY headword
+ORDER BY max(frequency) DESC, headword ASC
+LIMIT :limit ;
+"""
+# How often (in sqlite virtual machine instructions) a running search checks whether it has been cancelled.
+CANCEL_CHECK_INTERVAL: typing.Final[int] = 1000
 
-CREATE INDEX IF NOT EXISTS index_pitch_accents_headword
-ON pitch_accents_formatted(headword);
 
-CREATE INDEX IF NOT EXISTS index_pitch_accents_reading
-ON pitch_accents_formatted(katakana_reading);
+class PitchRowsGeneration:
+    """
+    Counts writes to the pitch accents table of the add-on's database made by this process.
+    Connections use it to tell whether what they remember about the table is still true.
+    """
+
+    _value: int = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def current(cls) -> int:
+        return cls._value
+
+    @classmethod
+    def bump(cls) -> None:
+        with cls._lock:
+            cls._value += 1
 
--- Filtering by source is used when retrieving results and when reloading the user's override table.
-CREATE INDEX IF NOT EXISTS index_pitch_accents_source
-ON pitch_accents_formatted(source);
-"""
-PITCH_TABLES_SCHEMA_VERSION: typing.Final[int] = 2
-PITCH_TABLES_SCHEMA_NAME: typing.Final[str] = "pitch"
+
+def to_reading_key(reading: str) -> str:
+    """
+    Key to compare readings by.
+    Readings that are written differently but sound the same, e.g. ガッコウ and ガッコー, have the same key.
+    """
+    return literal_pronunciation(reading)
+
+
+def prefix_range(prefix: str) -> tuple[str, str]:
+    """
+    Return the range of strings that start with the prefix.
+    Text is compared as UTF-8 bytes (the BINARY collation), which is the same as comparing code points.
+    """
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def pick_pitch_accent_rows(
+    rows: Sequence[sqlite3.Row],
+    prefer_provider_name: str,
+    select_keys: Sequence[str],
+    reading_key: str = "",
+) -> list[sqlite3.Row]:
+    """
+    The user overrides the default (bundled) rows with their own data.
+    Keep the rows of the preferred provider if there are any. Otherwise, keep all rows.
+    If a reading key is given, keep only the rows with this key.
+    Of the rows that are the same in the selected columns, keep the first one (the most frequent).
+    """
+    if any(row["source"] == prefer_provider_name for row in rows):
+        rows = [row for row in rows if row["source"] == prefer_provider_name]
+    if reading_key:
+        rows = [row for row in rows if row["reading_key"] == reading_key]
+    picked: dict[tuple, sqlite3.Row] = {}
+    for row in rows:
+        picked.setdefault(tuple(row[key] for key in select_keys), row)
+    return list(picked.values())
 
 
 class PitchSqlite3Buddy(Sqlite3BuddyABC, abc.ABC):
@@ -41,13 +169,17 @@ class PitchSqlite3Buddy(Sqlite3BuddyABC, abc.ABC):
         If the db schema changes in the future, update the existing db.
         """
         with cursor_buddy(self.con) as cur:
-            # Run the script to create tables and indexes if they don't exist.
+            # Run the script to create tables if they don't exist.
             cur.executescript(PITCH_TABLES_SCHEMA)
             self.con.commit()
         if not is_new_file:
             # The database file was created before.
             # Migrate the database if necessary.
             self._migrate_pitch_db()
+        with cursor_buddy(self.con) as cur:
+            # Indexes are created after migrating, since they may refer to columns added by a migration.
+            cur.executescript("".join(PITCH_TABLE_INDEXES.values()))
+            self.con.commit()
         self.set_db_version(PITCH_TABLES_SCHEMA_NAME, PITCH_TABLES_SCHEMA_VERSION)
 
     def _migrate_pitch_db(self) -> None:
@@ -69,15 +201,102 @@ class PitchSqlite3Buddy(Sqlite3BuddyABC, abc.ABC):
             self.con.executescript(query)
             version += 1
             print(f"Migrated pitch accent table to version {version}")
+        if version == 2:
+            # Bundled rows have moved to a separate read-only file.
+            self.con.execute("DELETE FROM pitch_accents_formatted WHERE source = ?;", (AccDictProvider.bundled,))
+            version += 1
+            print(f"Migrated pitch accent table to version {version}")
+        if version == 3:
+            # Single-column indexes were replaced by covering indexes, which are created after migrating.
+            self.con.executescript("""
+            DROP INDEX IF EXISTS index_pitch_accents_headword;
+            DROP INDEX IF EXISTS index_pitch_accents_reading;
+            """)
+            version += 1
+            print(f"Migrated pitch accent table to version {version}")
+        if version == 4:
+            # Covering indexes now include the reading key.
+            self.con.create_function("to_reading_key", 1, to_reading_key, deterministic=True)
+            self.con.executescript("""
+            DROP INDEX IF EXISTS index_pitch_accents_headword_sorted;
+            DROP INDEX IF EXISTS index_pitch_accents_reading_sorted;
+            ALTER TABLE pitch_accents_formatted
+            ADD COLUMN reading_key TEXT NOT NULL DEFAULT '';
+            UPDATE pitch_accents_formatted
+            SET reading_key = to_reading_key(katakana_reading);
+            """)
+            version += 1
+            print(f"Migrated pitch accent table to version {version}")
         if version != PITCH_TABLES_SCHEMA_VERSION:
             raise Sqlite3BuddyVersionError(
                 f"After migration, version should be {PITCH_TABLES_SCHEMA_VERSION}, but got {version}"
             )
         self.con.commit()
+        PitchRowsGeneration.bump()
+
+    def attach_bundled_pitch_accents(self, bundled_db_path: Optional[pathlib.Path]) -> None:
+        """
+        Attach the read-only file with the bundled pitch accents (if it is ready)
+        and (re)create the view that lookups read from.
+        The connection remembers the attached file, so this is a no-op if nothing has changed.
+        """
+        state = self.con.state
+        if PITCH_VIEW_NAME in state and state[PITCH_VIEW_NAME] == bundled_db_path:
+            return
+        with cursor_buddy(self.con) as cur:
+            cur.execute(f"DROP VIEW IF EXISTS temp.{PITCH_VIEW_NAME};")
+            if state.get(PITCH_VIEW_NAME):
+                cur.execute(f"DETACH DATABASE {BUNDLED_PITCH_SCHEMA};")
+            if bundled_db_path:
+                # The file is never modified after it has been built, so sqlite doesn't need to lock it.
+                cur.execute(
+                    f"ATTACH DATABASE ? AS {BUNDLED_PITCH_SCHEMA};",
+                    (sqlite3_uri(bundled_db_path, mode="ro", immutable="1"),),
+                )
+                cur.execute(f"""
+                CREATE TEMP VIEW {PITCH_VIEW_NAME} AS
+                SELECT * FROM main.pitch_accents_formatted
+                UNION ALL
+                SELECT * FROM {BUNDLED_PITCH_SCHEMA}.pitch_accents_formatted;
+                """)
+            else:
+                cur.execute(f"""
+                CREATE TEMP VIEW {PITCH_VIEW_NAME} AS
+                SELECT * FROM main.pitch_accents_formatted;
+                """)
+        state[PITCH_VIEW_NAME] = bundled_db_path
+
+    def attached_bundled_pitch_db(self) -> Optional[pathlib.Path]:
+        return self.con.state.get(PITCH_VIEW_NAME)
+
+    def has_bundled_pitch_accents(self) -> bool:
+        return bool(self.attached_bundled_pitch_db())
+
+    def get_user_pitch_words(self) -> frozenset[str]:
+        """
+        Headwords and readings of the rows stored in the add-on's database, i.e. of the user's rows.
+        The words are remembered by the connection until the table changes.
+        """
+        generation = PitchRowsGeneration.current()
+        try:
+            remembered_generation, words = self.con.state[USER_PITCH_WORDS_STATE]
+        except KeyError:
+            pass
+        else:
+            if remembered_generation == generation:
+                return words
+        with cursor_buddy(self.con) as cur:
+            words = frozenset(
+                word
+                for row in cur.execute("SELECT headword, katakana_reading FROM main.pitch_accents_formatted;")
+                for word in row
+            )
+        self.con.state[USER_PITCH_WORDS_STATE] = (generation, words)
+        return words
 
     def get_pitch_accents_headword_count(self) -> int:
-        query = """
-        SELECT COUNT(DISTINCT headword) FROM pitch_accents_formatted;
+        query = f"""
+        SELECT COUNT(DISTINCT headword) FROM {PITCH_VIEW_NAME};
         """
         with cursor_buddy(self.con) as cur:
             result = cur.execute(query).fetchone()
@@ -87,15 +306,70 @@ class PitchSqlite3Buddy(Sqlite3BuddyABC, abc.ABC):
     def insert_pitch_accent_data(self, rows: typing.Iterable[AccDictRawTSVEntry], provider_name: str) -> None:
         query = """
         INSERT INTO pitch_accents_formatted
-        ( headword, raw_headword, katakana_reading, html_notation, pitch_number, frequency, source )
-        VALUES(:headword, :raw_headword, :katakana_reading, :html_notation, :pitch_number, :frequency, :source);
+        ( headword, raw_headword, katakana_reading, html_notation, pitch_number, frequency, source, reading_key )
+        VALUES(
+            :headword, :raw_headword, :katakana_reading, :html_notation, :pitch_number, :frequency, :source, :reading_key
+        );
         """
         with cursor_buddy(self.con) as cur:
             cur.executemany(
                 query,
-                ((row | {"frequency": int(row["frequency"]), "source": provider_name}) for row in rows),
+                (
+                    row | {
+                        "frequency": int(row["frequency"]),
+                        "source": provider_name,
+                        "reading_key": to_reading_key(row["katakana_reading"]),
+                    }
+                    for row in rows
+                ),
             )
             self.con.commit()
+            PitchRowsGeneration.bump()
+
+    def bulk_insert_pitch_accent_data(self, rows: typing.Iterable[Sequence[str]], provider_name: str) -> None:
+        """
+        Insert rows in the order of columns in the pitch accents file:
+        headword, raw_headword, katakana_reading, html_notation, pitch_number, frequency.
+        Must be called inside bulk_load_pitch_accents(), which commits the data.
+        """
+        query = """
+        INSERT INTO pitch_accents_formatted
+        ( headword, raw_headword, katakana_reading, html_notation, pitch_number, frequency, source, reading_key )
+        VALUES(?, ?, ?, ?, ?, ?, ?, ?);
+        """
+        with cursor_buddy(self.con) as cur:
+            cur.executemany(
+                query,
+                ((*row[:5], int(row[5]), provider_name, to_reading_key(row[2])) for row in rows),
+            )
+
+    @contextlib.contextmanager
+    def bulk_load_pitch_accents(self):
+        """
+        Prepare the pitch accents table to receive a lot of rows at once.
+        Indexes are dropped while the rows are inserted, then built in one go.
+        All rows are inserted in one transaction, without waiting for the disk to sync.
+        If loading fails, the inserted rows are rolled back.
+        """
+        self.con.commit()
+        (synchronous,) = self.con.execute("PRAGMA synchronous").fetchone()
+        with cursor_buddy(self.con) as cur:
+            for index_name in PITCH_TABLE_INDEXES:
+                cur.execute(f"DROP INDEX IF EXISTS {index_name};")
+            cur.execute("PRAGMA synchronous = OFF;")
+            try:
+                yield
+            except BaseException:
+                self.con.rollback()
+                raise
+            else:
+                self.con.commit()
+            finally:
+                for create_index in PITCH_TABLE_INDEXES.values():
+                    cur.execute(create_index)
+                self.con.commit()
+                cur.execute(f"PRAGMA synchronous = {int(synchronous)};")
+                PitchRowsGeneration.bump()
 
     PITCH_RETRIEVE_KEYS = ("raw_headword", "katakana_reading", "html_notation", "pitch_number")
 
@@ -104,39 +378,131 @@ class PitchSqlite3Buddy(Sqlite3BuddyABC, abc.ABC):
         word: Optional[str],
         prefer_provider_name: str,
         select_keys: Sequence[str] = PITCH_RETRIEVE_KEYS,
+        reading_key: str = "",
     ) -> list[sqlite3.Row]:
-        # The user overrides the default (bundled) rows with their own data.
-        # Return relevant rows from the user's data if they can be found.
-        # Otherwise, return all results for the target word.
-        query = f"""
-        SELECT DISTINCT {', '.join(select_keys)} FROM (
-            WITH all_results AS (
-                SELECT * FROM pitch_accents_formatted
-                WHERE ( headword = ? OR katakana_reading = ? )
-            ),
-            preferred_results AS (
-                SELECT * FROM all_results
-                WHERE source = ?
-            )
-            SELECT * FROM preferred_results
-            UNION ALL
-            SELECT * FROM all_results WHERE NOT EXISTS (SELECT 1 FROM preferred_results)
-        )
-        ORDER BY frequency DESC, pitch_number ASC, katakana_reading ASC ;
+        """
+        Return rows whose headword or reading is equal to the word, the most frequent first.
+        If a reading key is given, return only the rows whose reading has this key.
+        Rows contain all columns of the table, but only the selected columns tell rows apart.
         """
         with cursor_buddy(self.con) as cur:
-            result = cur.execute(query, (word, word, prefer_provider_name)).fetchall()
+            rows = cur.execute(
+                SEARCH_PITCH_ACCENTS_QUERY,
+                {"word": word, "reading_key": reading_key, "provider": prefer_provider_name},
+            ).fetchall()
             # example row
-            # [
-            # ('僕', 'ボク', '<low_rise>ボ</low_rise><high>ク</high>', '0', 42378, 'bundled'),
-            # ('僕', 'ボク', '<high_drop>ボ</high_drop><low>ク</low>', '1', 42378, 'bundled'),
-            # ...
-            # ]
-            return result
+            # ('ボク', '僕', 'ボク', '<low_rise>ボ</low_rise><high>ク</high>', '0', 42378, 'bundled', 'ボク')
+            return pick_pitch_accent_rows(rows, prefer_provider_name, select_keys, reading_key)
+
+    def search_pitch_accent_headwords(
+        self,
+        prefix: str,
+        limit: int,
+        is_cancelled: Optional[typing.Callable[[], bool]] = None,
+    ) -> list[str]:
+        """
+        Return headwords whose headword or reading starts with the prefix, the most frequent first.
+        If is_cancelled() returns True while the query runs, sqlite stops it and sqlite3.OperationalError is raised.
+        """
+        if not prefix:
+            return []
+        start, stop = prefix_range(prefix)
+        if is_cancelled is not None:
+            self.con.set_progress_handler(is_cancelled, CANCEL_CHECK_INTERVAL)
+        try:
+            with cursor_buddy(self.con) as cur:
+                return [
+                    row[0]
+                    for row in cur.execute(
+                        SEARCH_PITCH_ACCENT_HEADWORDS_QUERY,
+                        {"start": start, "stop": stop, "limit": limit},
+                    )
+                ]
+        finally:
+            if is_cancelled is not None:
+                # The connection goes back to the pool afterwards.
+                self.con.set_progress_handler(None, 0)
+
+    PITCH_ROW_KEYS = ("headword", "raw_headword", "katakana_reading", "html_notation", "pitch_number", "frequency")
+
+    def get_pitch_accent_rows(self, provider_name: str) -> list[sqlite3.Row]:
+        """
+        Return rows stored by the provider, with their rowids.
+        Used to compare the stored rows with the rows in a file before reloading it.
+        """
+        query = f"""
+        SELECT rowid, {', '.join(self.PITCH_ROW_KEYS)} FROM pitch_accents_formatted
+        WHERE source = ? ;
+        """
+        with cursor_buddy(self.con) as cur:
+            return cur.execute(query, (provider_name,)).fetchall()
+
+    def update_pitch_accent_rows(
+        self,
+        delete_rowids: typing.Iterable[int],
+        insert_rows: typing.Iterable[Sequence[typing.Union[str, int]]],
+        provider_name: str,
+    ) -> None:
+        """
+        Delete and insert rows in one transaction, so that lookups never see a half-updated table.
+        Inserted rows are in the order of PITCH_ROW_KEYS.
+        """
+        with cursor_buddy(self.con) as cur:
+            cur.executemany(
+                "DELETE FROM pitch_accents_formatted WHERE rowid = ? ;",
+                ((rowid,) for rowid in delete_rowids),
+            )
+            cur.executemany(
+                """
+                INSERT INTO pitch_accents_formatted
+                ( headword, raw_headword, katakana_reading, html_notation, pitch_number, frequency, source, reading_key )
+                VALUES(?, ?, ?, ?, ?, ?, ?, ?);
+                """,
+                ((*row, provider_name, to_reading_key(row[2])) for row in insert_rows),
+            )
+            self.con.commit()
+            PitchRowsGeneration.bump()
+
+    # Keep the number of query parameters well below SQLITE_MAX_VARIABLE_NUMBER of older sqlite versions (999).
+    SEARCH_MANY_CHUNK_SIZE = 500
+
+    def search_pitch_accents_many(
+        self,
+        words: typing.Iterable[str],
+        prefer_provider_name: str,
+        select_keys: Sequence[str] = PITCH_RETRIEVE_KEYS,
+    ) -> dict[str, list[sqlite3.Row]]:
+        """
+        Same as search_pitch_accents() for each word, but words are searched in one query (per chunk).
+        Rows also contain the searched word in the "lookup_word" column.
+        Words that aren't found map to empty lists.
+        """
+        words = list(dict.fromkeys(word for word in words if word))
+        results: dict[str, list[sqlite3.Row]] = {word: [] for word in words}
+        for idx in range(0, len(words), self.SEARCH_MANY_CHUNK_SIZE):
+            chunk = words[idx : idx + self.SEARCH_MANY_CHUNK_SIZE]
+            query = f"""
+            WITH lookup_words(word) AS (
+                VALUES {', '.join('(?)' for _word in chunk)}
+            ),
+            matched_results AS (
+                SELECT * FROM {PITCH_VIEW_NAME}
+                WHERE headword IN lookup_words OR katakana_reading IN lookup_words
+            )
+            SELECT lookup_words.word AS lookup_word, matched_results.*
+            FROM lookup_words JOIN matched_results
+            ON ( matched_results.headword = lookup_words.word OR matched_results.katakana_reading = lookup_words.word )
+            ORDER BY lookup_word, {', '.join(PITCH_SORT_COLUMNS)} ;
+            """
+            with cursor_buddy(self.con) as cur:
+                for word, rows in itertools.groupby(cur.execute(query, chunk), key=lambda row: row["lookup_word"]):
+                    results[word] = pick_pitch_accent_rows(list(rows), prefer_provider_name, select_keys)
+        return results
 
     def clear_pitch_accents_table(self) -> None:
         """
-        Remove all pitch accent entries.
+        Remove all pitch accent entries stored in the add-on's database.
+        The bundled entries are in a read-only file and aren't affected.
         """
         query = """
         DELETE FROM pitch_accents_formatted;
@@ -144,6 +510,7 @@ class PitchSqlite3Buddy(Sqlite3BuddyABC, abc.ABC):
         with cursor_buddy(self.con) as cur:
             cur.execute(query)
             self.con.commit()
+            PitchRowsGeneration.bump()
 
     def clear_pitch_accents(self, provider_name: str) -> None:
         query = """
@@ -153,6 +520,7 @@ class PitchSqlite3Buddy(Sqlite3BuddyABC, abc.ABC):
         with cursor_buddy(self.con) as cur:
             cur.execute(query, (provider_name,))
             self.con.commit()
+            PitchRowsGeneration.bump()
 
     def delete_pitch_accents_table(self) -> None:
         query = """
@@ -161,3 +529,4 @@ class PitchSqlite3Buddy(Sqlite3BuddyABC, abc.ABC):
         with cursor_buddy(self.con) as cur:
             cur.execute(query)
             self.con.commit()
+            PitchRowsGeneration.bump()
@@ -4,26 +4,34 @@ import pathlib
 import sqlite3
 from typing import Optional
 
-from aqt import mw
+from aqt import gui_hooks, mw
 
 from ..helpers.file_ops import user_files_dir
 from .audio_buddy import AudioSqlite3Buddy
 from .basic_types import Sqlite3BuddyError
+from .bundled_pitch_db import (
+    BUNDLED_PITCH_DB_NAME,
+    PREBUILT_PITCH_DB,
+    bundled_pitch_db_finder,
+)
+from .connection_pool import PooledConnection, connection_pool
 from .pitch_buddy import PitchSqlite3Buddy
 from .sqlite_schema import CURRENT_DB
 from .version_buddy import VersionSqlite3Buddy
 
 CURRENT_DB.remove_deprecated_files()
+AUDIO_DOWNLOADS_DIR_NAME = "audio_source_downloads"
 
 
 class Sqlite3Buddy(VersionSqlite3Buddy, AudioSqlite3Buddy, PitchSqlite3Buddy):
     """
-    Tables for audio:  ('meta', 'headwords', 'files')
+    Tables for audio:  ('meta', 'headwords', 'files', 'downloads')
     Table for pitch accents: 'pitch_accents_formatted'
+    The bundled pitch accents are attached from a read-only file and combined with the user's in 'pitch_accents_all'.
     """
 
     _db_path: pathlib.Path = pathlib.Path(user_files_dir()) / CURRENT_DB.name
-    _con: Optional[sqlite3.Connection]
+    _con: Optional[PooledConnection]
 
     def __init__(self, db_path: Optional[pathlib.Path] = None) -> None:
         if mw is None:
@@ -34,7 +42,7 @@ class Sqlite3Buddy(VersionSqlite3Buddy, AudioSqlite3Buddy, PitchSqlite3Buddy):
         self._con = None
 
     @property
-    def con(self) -> sqlite3.Connection:
+    def con(self) -> PooledConnection:
         assert self._con
         return self._con
 
@@ -45,9 +53,36 @@ class Sqlite3Buddy(VersionSqlite3Buddy, AudioSqlite3Buddy, PitchSqlite3Buddy):
         if self.can_execute():
             raise Sqlite3BuddyError("connection is already created.")
         is_new_file = not self._db_path.is_file()
-        self._con: sqlite3.Connection = sqlite3.connect(self._db_path)
-        self._con.row_factory = sqlite3.Row
-        self._prepare_tables(is_new_file)
+        self._con = connection_pool.acquire(self._db_path)
+        try:
+            connection_pool.prepare_once(self._db_path, lambda: self._prepare_tables(is_new_file))
+            self.attach_bundled_pitch_accents(bundled_pitch_db_finder.find(self.bundled_pitch_db_candidates()))
+        except Exception:
+            self._con.close()
+            self._con = None
+            raise
+
+    def audio_downloads_dir(self) -> pathlib.Path:
+        """
+        Where remote audio source indexes are downloaded to. They are kept to be validated against the server later.
+        """
+        return self._db_path.parent / AUDIO_DOWNLOADS_DIR_NAME
+
+    def bundled_pitch_db_candidates(self) -> tuple[pathlib.Path, ...]:
+        """
+        Files that may contain the bundled pitch accents, in order of preference.
+        The last one is where the file is built if none of them is up to date.
+        """
+        built_locally = self._db_path.parent / BUNDLED_PITCH_DB_NAME
+        if mw is None:
+            # if running tests
+            return (built_locally,)
+        return PREBUILT_PITCH_DB, built_locally
+
+    def reattach_bundled_pitch_accents(self) -> None:
+        """Look for the bundled pitch accents file again, e.g. after it has been rebuilt."""
+        bundled_pitch_db_finder.forget()
+        self.attach_bundled_pitch_accents(bundled_pitch_db_finder.find(self.bundled_pitch_db_candidates()))
 
     def _prepare_tables(self, is_new_file: bool):
         self.prepare_version_table()
@@ -58,7 +93,8 @@ class Sqlite3Buddy(VersionSqlite3Buddy, AudioSqlite3Buddy, PitchSqlite3Buddy):
         if not self.can_execute():
             raise Sqlite3BuddyError("there is no connection to close.")
         self.con.commit()
-        self.con.close()
+        # The connection is kept open and reused by the next session in this thread.
+        connection_pool.release(self._db_path, self.con)
         self._con = None
 
     def __enter__(self):
@@ -81,3 +117,6 @@ class Sqlite3Buddy(VersionSqlite3Buddy, AudioSqlite3Buddy, PitchSqlite3Buddy):
         # If there was any exception, a rollback takes place. Otherwise, it commits.
         self.con.__exit__(exc_type, exc_val, exc_tb)
         self.end_session()
+
+
+gui_hooks.profile_will_close.append(connection_pool.close_idle)
@@ -43,9 +43,16 @@ CURRENT_DB = DbFileSchema(
     ext="sqlite3",
 )
 
+MECAB_CACHE_DB = DbFileSchema(
+    prefix="mecab_cache",
+    ver="v1",
+    ext="sqlite3",
+)
+
 
 def main():
     CURRENT_DB.remove_deprecated_files()
+    MECAB_CACHE_DB.remove_deprecated_files()
 
 
 if __name__ == "__main__":
@@ -17,7 +17,7 @@ from ..mecab_controller.unify_readings import literal_pronunciation as pr
 from ..mecab_controller.unify_readings import unify_repr
 from ..pitch_accents.accent_lookup import AccentLookup
 from ..pitch_accents.basic_types import AccDbParsedToken, PitchAccentEntry
-from ..pitch_accents.common import FormattedEntry
+from ..pitch_accents.common import AccentDict, FormattedEntry
 from .color_code_wrapper import ColorCodeWrapper
 from .furigana_list import FuriganaList
 
@@ -56,20 +56,29 @@ class FuriganaGen:
         output_format: ColorCodePitchFormat = ColorCodePitchFormat(0),
     ) -> str:
         substrings = FuriganaList()
-        for token in tokenize(src_text):
+        tokens = tuple(tokenize(src_text))
+        # Look up all parseable tokens in the accent db first.
+        parseable_tokens = [token for token in dict.fromkeys(tokens) if isinstance(token, ParseableToken)]
+        acc_db_results = dict(zip(parseable_tokens, self.try_lookup_full_text_many(parseable_tokens)))
+        # Tokens that weren't found are sent to mecab in one batch.
+        unknown_tokens = [token for token, acc_db_result in acc_db_results.items() if not acc_db_result]
+        mecab_results = dict(zip(unknown_tokens, self._mecab.translate_many(unknown_tokens)))
+        # Then the accents of all words found by mecab are looked up at once.
+        accented_results = self.append_accents_grouped(mecab_results) if split_morphemes else {}
+        for token in tokens:
             assert token, "token can't be empty"
             if not isinstance(token, ParseableToken):
                 assert isinstance(token, Token), "tokenize() must only yield tokens."
                 # Skip tokens that can't be parsed (non-japanese text).
                 # Skip full-kana tokens (no furigana is needed).
                 substrings.append_token(token)
-            elif acc_db_result := tuple(self.try_lookup_full_text(token)):
+            elif acc_db_result := acc_db_results[token]:
                 # If full text search succeeded, continue.
                 substrings.extend(acc_db_result)
             elif split_morphemes is True:
                 # Split with mecab, format furigana for each word.
-                substrings.extend(self.append_accents(out) for out in self._mecab.translate(token))
-            elif out := self.mecab_single_word(token):
+                substrings.extend(accented_results[token])
+            elif out := self.mecab_single_word(token, mecab_results[token]):
                 # If the user doesn't want to split morphemes, still try to find the reading using mecab
                 # but abort if mecab outputs more than one word.
                 substrings.append_token(self.append_accents(out))
@@ -84,8 +93,10 @@ class FuriganaGen:
             )
         ).strip()
 
-    def mecab_single_word(self, token: Token) -> Optional[MecabParsedToken]:
-        if (out := self._mecab.translate(token)) and out[0].word == token:
+    def mecab_single_word(
+        self, token: Token, parsed: Optional[Sequence[MecabParsedToken]] = None
+    ) -> Optional[MecabParsedToken]:
+        if (out := (parsed if parsed is not None else self._mecab.translate(token))) and out[0].word == token:
             return out[0]
         return None
 
@@ -183,23 +194,33 @@ class FuriganaGen:
         Avoids calling mecab when the text contains one word in dictionary form
         or multiple words in dictionary form separated by punctuation.
         """
-        word: str
-        entries: Sequence[FormattedEntry]
-
         if not self._fcfg.can_lookup_in_db(text):
             # pitch accents will be added after parsing with mecab.
             return
+        yield from self._to_acc_db_tokens(self._lookup.get_pronunciations(text, recurse=False))
 
-        if results := self._lookup.get_pronunciations(text, recurse=False):
-            for word, entries in results.items():
-                yield AccDbParsedToken(
-                    headword=word,
-                    word=word,
-                    part_of_speech=PartOfSpeech.unknown,
-                    inflection_type=Inflection.dictionary_form,
-                    katakana_reading=None,
-                    headword_accents=self.unique_headword_accents(entries),
-                )
+    def try_lookup_full_text_many(self, texts: Sequence[str]) -> list[tuple[AccDbParsedToken, ...]]:
+        """
+        Same as try_lookup_full_text() for each text, but the texts are searched in the accent db at once.
+        """
+        # pitch accents of the texts that can't be looked up will be added after parsing with mecab.
+        can_lookup = [text for text in texts if self._fcfg.can_lookup_in_db(text)]
+        results = dict(zip(can_lookup, self._lookup.get_pronunciations_many(can_lookup, recurse=False)))
+        return [tuple(self._to_acc_db_tokens(results[text])) if text in results else () for text in texts]
+
+    def _to_acc_db_tokens(self, results: AccentDict) -> Iterable[AccDbParsedToken]:
+        word: str
+        entries: Sequence[FormattedEntry]
+
+        for word, entries in results.items():
+            yield AccDbParsedToken(
+                headword=word,
+                word=word,
+                part_of_speech=PartOfSpeech.unknown,
+                inflection_type=Inflection.dictionary_form,
+                katakana_reading=None,
+                headword_accents=self.unique_headword_accents(entries),
+            )
 
     def append_accents(self, token: MecabParsedToken) -> AccDbParsedToken:
         """
@@ -210,6 +231,28 @@ class FuriganaGen:
             headword_accents=self.unique_headword_accents(self.iter_accents(token.headword)),
         )
 
+    def append_accents_many(self, tokens: Sequence[MecabParsedToken]) -> list[AccDbParsedToken]:
+        """
+        Same as append_accents() for each token, but the headwords are searched in the accent db at once.
+        """
+        results = self._lookup.get_pronunciations_many((token.headword for token in tokens), recurse=False)
+        return [
+            AccDbParsedToken(
+                **dataclasses.asdict(token),
+                headword_accents=self.unique_headword_accents(accents.get(token.headword, ())),
+            )
+            for token, accents in zip(tokens, results)
+        ]
+
+    def append_accents_grouped(
+        self, parsed: dict[Token, Sequence[MecabParsedToken]]
+    ) -> dict[Token, list[AccDbParsedToken]]:
+        """
+        Append accents to the words of several tokens parsed by mecab.
+        """
+        accented = iter(self.append_accents_many([out for outputs in parsed.values() for out in outputs]))
+        return {token: [next(accented) for _out in outputs] for token, outputs in parsed.items()}
+
     def _is_reading_preferable(self, reading: str) -> bool:
         return (LONG_VOWEL_MARK in reading) is self._fcfg.prefer_literal_pronunciation
 
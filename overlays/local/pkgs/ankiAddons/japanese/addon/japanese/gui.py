@@ -45,7 +45,7 @@ from .helpers.profiles import (
 )
 from .note_type.note_type import prepare_note_types
 from .pitch_accents.consts import USER_DATA_CSV_PATH
-from .reading import acc_dict
+from .reading import acc_dict, lookup
 from .widgets.anki_style import fix_default_anki_style
 from .widgets.audio_sources import AudioSourcesTable, tooltip_cache_remove_complete
 from .widgets.audio_sources_stats import AudioStatsDialog
@@ -683,7 +683,7 @@ class SettingsDialog(AnkiSaveAndRestoreGeomDialog, MgrPropMixIn):
         cfg.write_config()
         self._accents_override.save_to_disk()
         # Reload
-        acc_dict.reload_user_accents_from_disk()
+        acc_dict.reload_user_accents_from_disk(on_done=lookup.invalidate)
         aud_src_mgr.init_sources_anki(on_finish=show_audio_init_result_tooltip)
         # if new profiles were added, add imports to the note types.
         prepare_note_types()
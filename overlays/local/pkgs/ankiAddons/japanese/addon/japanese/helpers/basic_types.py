@@ -5,3 +5,7 @@ class AudioManagerHttpClientABC(abc.ABC):
     @abc.abstractmethod
     def download(self, file):
         raise NotImplementedError()
+
+    @abc.abstractmethod
+    def download_to_file(self, source, dest, validators=None):
+        raise NotImplementedError()
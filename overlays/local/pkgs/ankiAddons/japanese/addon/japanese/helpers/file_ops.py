@@ -8,10 +8,6 @@ import subprocess
 from collections.abc import Iterable
 from typing import Union
 
-from anki.utils import no_bundled_libs
-
-from ..ajt_common.utils import find_executable
-
 THIS_ADDON_MODULE = __name__.split(".")[0]
 
 
@@ -52,8 +48,8 @@ def find_config_json() -> pathlib.Path:
 @functools.cache
 def user_files_dir() -> pathlib.Path:
     """Return path to the user files directory."""
-    if pathlib.Path(os.getenv("ANKI_JAPANESE_DIR")).is_dir():
-        return pathlib.Path(os.getenv("ANKI_JAPANESE_DIR"))
+    if (env_dir := os.getenv("ANKI_JAPANESE_DIR")) and pathlib.Path(env_dir).is_dir():
+        return pathlib.Path(env_dir)
     else:
         for parent_dir in walk_parents(__file__):
             if (dir_path := parent_dir.joinpath("user_files")).is_dir():
@@ -65,8 +61,12 @@ def open_file(path: str) -> None:
     """
     Select file in lf, the preferred terminal file manager, or open it with xdg-open.
     """
+    # Imported here, so that the rest of the module can be used without Anki, e.g. when building the add-on.
+    from anki.utils import no_bundled_libs
     from aqt.qt import QDesktopServices, QUrl
 
+    from ..ajt_common.utils import find_executable
+
     if (terminal := os.getenv("TERMINAL")) and (lf := (os.getenv("FILE") or find_executable("lf"))):
         subprocess.Popen(
             [terminal, "-e", lf, path],
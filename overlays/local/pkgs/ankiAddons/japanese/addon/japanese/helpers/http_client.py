@@ -1,8 +1,12 @@
 # Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import hashlib
 import io
+import json
 import os
-from typing import Any, Optional, Union
+import pathlib
+import re
+from typing import IO, Any, Optional, Union
 
 import anki.httpclient
 import requests
@@ -14,9 +18,16 @@ from ..audio_manager.abstract import AudioSettingsConfigViewABC
 from ..audio_manager.basic_types import (
     AudioManagerException,
     AudioSourceConfig,
+    DownloadValidators,
     FileUrlData,
 )
 from .basic_types import AudioManagerHttpClientABC
+from .file_ops import rm_file
+
+RE_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+# Partial downloads are kept next to the destination file with these suffixes.
+PART_SUFFIX = ".part"
+PART_VALIDATORS_SUFFIX = ".part.json"
 
 
 def get_headers() -> dict[str, str]:
@@ -122,18 +133,22 @@ class AjtHttpClient:
             verify=self.verify,
         )
 
-    def get_with_timeout(self, url: str, timeout: Optional[int] = None) -> requests.Response:
+    def get_with_timeout(
+        self, url: str, timeout: Optional[int] = None, headers: Optional[dict[str, str]] = None
+    ) -> requests.Response:
         return self.session.get(
             url,
             stream=True,
-            headers=get_headers(),
+            headers={**get_headers(), **(headers or {})},
             timeout=clamp(min_val=2, val=timeout, max_val=99),
             verify=self.verify,
         )
 
-    def get_with_retry(self, url: str, timeout_seconds: int, retry_attempts: int) -> requests.Response:
+    def get_with_retry(
+        self, url: str, timeout_seconds: int, retry_attempts: int, headers: Optional[dict[str, str]] = None
+    ) -> requests.Response:
         set_retries_for_session(self.session, retry_attempts)
-        return self.get_with_timeout(url, timeout=timeout_seconds)
+        return self.get_with_timeout(url, timeout=timeout_seconds, headers=headers)
 
     def stream_content(self, resp: requests.Response) -> bytes:
         resp.raise_for_status()
@@ -144,6 +159,65 @@ class AjtHttpClient:
             buf.write(chunk)
         return buf.getvalue()
 
+    def stream_to_file(self, resp: requests.Response, file: IO[bytes], digest: "hashlib._Hash") -> None:
+        for chunk in resp.iter_content(chunk_size=anki.httpclient.HTTP_BUF_SIZE):
+            if self.progress_hook:
+                self.progress_hook(0, len(chunk))
+            file.write(chunk)
+            digest.update(chunk)
+
+
+def file_sha256(path: pathlib.Path, digest: Optional["hashlib._Hash"] = None) -> "hashlib._Hash":
+    digest = digest or hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(anki.httpclient.HTTP_BUF_SIZE):
+            digest.update(chunk)
+    return digest
+
+
+def read_part_validators(dest: pathlib.Path) -> Optional[DownloadValidators]:
+    """
+    Return the validators of the partially downloaded file, if there is one.
+    """
+    part = dest.with_name(dest.name + PART_SUFFIX)
+    try:
+        with open(dest.with_name(dest.name + PART_VALIDATORS_SUFFIX), encoding="utf-8") as f:
+            validators = DownloadValidators(**json.load(f))
+    except (OSError, ValueError, TypeError):
+        return None
+    return validators if part.is_file() else None
+
+
+def write_part_validators(dest: pathlib.Path, validators: DownloadValidators) -> None:
+    with open(dest.with_name(dest.name + PART_VALIDATORS_SUFFIX), "w", encoding="utf-8") as f:
+        json.dump(validators._asdict(), f)
+
+
+def remove_part(dest: pathlib.Path) -> None:
+    for suffix in (PART_SUFFIX, PART_VALIDATORS_SUFFIX):
+        rm_file(dest.with_name(dest.name + suffix))
+
+
+def content_range_start(response: requests.Response) -> Optional[int]:
+    m = RE_CONTENT_RANGE.fullmatch(response.headers.get("Content-Range", ""))
+    return int(m.group(1)) if m else None
+
+
+def expected_file_size(response: requests.Response, offset: int) -> Optional[int]:
+    """
+    Return the size of the complete file, or None if the server didn't tell.
+    """
+    if response.status_code == requests.codes.partial_content:
+        m = RE_CONTENT_RANGE.fullmatch(response.headers.get("Content-Range", ""))
+        return int(m.group(3)) if m else None
+    if response.headers.get("Content-Encoding", "identity") != "identity":
+        # Content-Length is the size of the encoded body.
+        return None
+    try:
+        return int(response.headers["Content-Length"]) + offset
+    except (KeyError, ValueError):
+        return None
+
 
 class AudioManagerHttpClient(AudioManagerHttpClientABC):
     def __init__(
@@ -182,3 +256,111 @@ class AudioManagerHttpClient(AudioManagerHttpClientABC):
                 response=response,
             )
         return self._client.stream_content(response)
+
+    def download_to_file(
+        self,
+        source: AudioSourceConfig,
+        dest: pathlib.Path,
+        validators: Optional[DownloadValidators] = None,
+    ) -> DownloadValidators:
+        """
+        Download an audio source index to a file. Return the validators of the downloaded file.
+        If dest was downloaded before and the server says it hasn't changed, it is kept.
+        A download that was interrupted is continued where it stopped.
+        The size and the digest of the file are checked before it is moved to dest.
+        """
+        if validators and validators.sha256 and dest.is_file():
+            headers = validators.conditional_headers()
+            offset = 0
+        elif (part_validators := read_part_validators(dest)) and (if_range := part_validators.if_range()):
+            offset = dest.with_name(dest.name + PART_SUFFIX).stat().st_size
+            headers = {"Range": f"bytes={offset}-", "If-Range": if_range}
+        else:
+            headers = {}
+            offset = 0
+        # Ranges are meaningless if the server compresses the response.
+        headers["Accept-Encoding"] = "identity"
+        timeout = self._audio_settings.dictionary_download_timeout
+        attempts = self._audio_settings.attempts
+
+        try:
+            response = self._client.get_with_retry(source.url, timeout, attempts, headers=headers)
+        except OSError as ex:
+            self._client.restart_session(attempts)
+            raise AudioManagerException(
+                source,
+                f"{source.url} download failed with exception {ex.__class__.__name__}",
+                exception=ex,
+            )
+        with response:
+            if response.status_code == requests.codes.not_modified and validators:
+                if validators.sha256 == file_sha256(dest).hexdigest():
+                    print(f"Audio source hasn't changed since it was downloaded: {source.url}")
+                    return validators
+                print(f"Downloaded audio source is damaged, downloading it again: {source.url}")
+                return self._restart_download(source, dest)
+            if response.status_code == requests.codes.requested_range_not_satisfiable:
+                return self._restart_download(source, dest)
+            if response.status_code not in (requests.codes.ok, requests.codes.partial_content):
+                self._client.restart_session(attempts)
+                raise AudioManagerException(
+                    source,
+                    f"{source.url} download failed with return code {response.status_code}",
+                    response=response,
+                )
+            if response.status_code == requests.codes.ok:
+                # The server sent the whole file.
+                offset = 0
+            elif content_range_start(response) != offset:
+                # The server sent a different part of the file.
+                return self._restart_download(source, dest)
+            return self._write_response(source, dest, response, offset)
+
+    def _restart_download(self, source: AudioSourceConfig, dest: pathlib.Path) -> DownloadValidators:
+        # Without validators or a partial file, no conditional or range request is made again.
+        rm_file(dest)
+        remove_part(dest)
+        return self.download_to_file(source, dest)
+
+    def _write_response(
+        self,
+        source: AudioSourceConfig,
+        dest: pathlib.Path,
+        response: requests.Response,
+        offset: int,
+    ) -> DownloadValidators:
+        part = dest.with_name(dest.name + PART_SUFFIX)
+        validators = DownloadValidators(
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            file_size=expected_file_size(response, offset),
+        )
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if offset:
+            print(f"Resuming the download of {source.url} from byte {offset}")
+            digest = file_sha256(part)
+        else:
+            digest = hashlib.sha256()
+            write_part_validators(dest, validators)
+        try:
+            with open(part, "ab" if offset else "wb") as f:
+                self._client.stream_to_file(response, f, digest)
+        except OSError as ex:
+            # The partial file is kept, and the download is resumed next time.
+            raise AudioManagerException(
+                source,
+                f"{source.url} download was interrupted with exception {ex.__class__.__name__}",
+                exception=ex,
+            )
+        file_size = part.stat().st_size
+        if validators.file_size is not None and file_size != validators.file_size:
+            if file_size > validators.file_size:
+                remove_part(dest)
+            raise AudioManagerException(
+                source,
+                f"{source.url} download is incomplete: got {file_size} bytes out of {validators.file_size}",
+                response=response,
+            )
+        os.replace(part, dest)
+        remove_part(dest)
+        return validators._replace(file_size=file_size, sha256=digest.hexdigest())
@@ -0,0 +1,129 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import json
+import re
+from collections.abc import Callable, Iterator
+from typing import Any, TextIO
+
+RE_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# A value is complete once one of these characters follows it, e.g. a number can't continue after them.
+RE_AFTER_VALUE = re.compile(r"[ \t\n\r]*[,:}\]]")
+RE_COLON = re.compile(r"[ \t\n\r]*:")
+RE_COMMA_OR_END = re.compile(r"[ \t\n\r]*([,}])")
+# Number of characters read from the stream at once.
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class JsonObjectStream:
+    """
+    Reads a large JSON object from a text stream without loading the whole document.
+    The top-level object and the objects directly inside it are read item by item.
+    Other values are decoded whole, so they are expected to be small.
+    Only the unread part of the current chunk is kept in memory.
+    """
+
+    _stream: TextIO
+    _chunk_size: int
+    _scan_once: Callable[[str, int], tuple[Any, int]]
+    _buf: str
+    _pos: int
+    _eof: bool
+
+    def __init__(self, stream: TextIO, chunk_size: int = READ_CHUNK_SIZE) -> None:
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._scan_once = json.JSONDecoder().scan_once
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def sections(self) -> Iterator[tuple[str, Iterator[tuple[str, Any]]]]:
+        """
+        Yield each key of the top-level object whose value is an object, with an iterator over the items of that object.
+        The items have to be read before moving on to the next key. Items that weren't read are skipped.
+        Keys with other values are skipped.
+        """
+        for key in self._iter_keys():
+            if self._peek() == "{":
+                items = self._iter_items()
+                yield key, items
+                for _item in items:
+                    pass
+            else:
+                self._read_value()
+        if self._peek():
+            raise self._error("Extra data")
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the unread part of the buffer. Return False at the end of the stream."""
+        if self._eof:
+            return False
+        chunk = self._stream.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Skip whitespace and return the next character, or an empty string at the end of the stream."""
+        while True:
+            self._pos = RE_JSON_WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf) or not self._fill():
+                return self._buf[self._pos : self._pos + 1]
+
+    def _expect(self, pattern: re.Pattern, what: str) -> str:
+        """Skip whitespace and the expected character. Return the character."""
+        while True:
+            if m := pattern.match(self._buf, self._pos):
+                self._pos = m.end()
+                return self._buf[self._pos - 1]
+            # Either the character is in the next chunk or the document is invalid.
+            if not self._fill():
+                raise self._error(f"Expecting {what}")
+
+    def _error(self, msg: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(msg, self._buf, self._pos)
+
+    def _read_value(self) -> Any:
+        while True:
+            buf = self._buf
+            pos = RE_JSON_WHITESPACE.match(buf, self._pos).end()
+            try:
+                value, end = self._scan_once(buf, pos)
+            except (StopIteration, json.JSONDecodeError):
+                # The value may continue in the next chunk.
+                if self._fill():
+                    continue
+                self._pos = pos
+                raise self._error("Expecting value")
+            # A number at the end of the buffer may continue in the next chunk too (e.g. "1" of "1.5e3").
+            if not RE_AFTER_VALUE.match(buf, end) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _iter_keys(self) -> Iterator[str]:
+        """
+        Yield the keys of an object.
+        The value of each key has to be read before the next key is requested.
+        """
+        if self._peek() != "{":
+            raise self._error("Expecting '{'")
+        self._pos += 1
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._read_value()
+            if not isinstance(key, str):
+                raise self._error("Expecting property name enclosed in double quotes")
+            self._expect(RE_COLON, "':' delimiter")
+            yield key
+            if self._expect(RE_COMMA_OR_END, "',' delimiter") == "}":
+                return
+
+    def _iter_items(self) -> Iterator[tuple[str, Any]]:
+        for key in self._iter_keys():
+            yield key, self._read_value()
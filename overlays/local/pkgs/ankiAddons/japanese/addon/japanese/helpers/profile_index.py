@@ -0,0 +1,82 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+from collections.abc import Sequence
+from typing import NamedTuple, Optional
+
+from anki.models import NotetypeDict
+
+from ..config_view import JapaneseConfig
+from .profiles import Profile
+
+
+def note_type_matches(note_type: NotetypeDict, profile: Profile) -> bool:
+    return profile.note_type.lower() in note_type["name"].lower()
+
+
+class NoteTypeProfiles(NamedTuple):
+    name: str
+    profiles: Sequence[Profile]
+    # Profiles by their source field.
+    by_source: dict[str, Sequence[Profile]]
+
+    @classmethod
+    def match(cls, note_type: NotetypeDict, profiles: Sequence[Profile]) -> "NoteTypeProfiles":
+        matching = tuple(profile for profile in profiles if note_type_matches(note_type, profile))
+        by_source: dict[str, list[Profile]] = {}
+        for profile in matching:
+            by_source.setdefault(profile.source, []).append(profile)
+        return cls(
+            name=note_type["name"],
+            profiles=matching,
+            by_source={source: tuple(found) for source, found in by_source.items()},
+        )
+
+
+class ProfileIndexSnapshot(NamedTuple):
+    version: int
+    profiles: Sequence[Profile]
+    # Note type id -> profiles that apply to the note type.
+    note_types: dict[int, NoteTypeProfiles]
+
+
+class ProfileIndex:
+    """
+    Finds the profiles that apply to a note type.
+    Profiles are parsed from the config once per config version,
+    and each note type is matched against them once, so later lookups are a dict lookup.
+    """
+
+    _cfg: JapaneseConfig
+    _snapshot: Optional[ProfileIndexSnapshot]
+
+    def __init__(self, cfg: JapaneseConfig) -> None:
+        self._cfg = cfg
+        self._snapshot = None
+
+    def _current(self) -> ProfileIndexSnapshot:
+        # The snapshot is replaced as a whole, so other threads keep using the old one until they're done.
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.version != self._cfg.version:
+            snapshot = self._snapshot = ProfileIndexSnapshot(
+                version=self._cfg.version,
+                profiles=tuple(self._cfg.iter_profiles()),
+                note_types={},
+            )
+        return snapshot
+
+    def profiles(self) -> Sequence[Profile]:
+        return self._current().profiles
+
+    def find(self, note_type: NotetypeDict, src_field: Optional[str] = None) -> Sequence[Profile]:
+        """
+        Return the profiles that apply to the note type.
+        If src_field is given, return only the profiles that take their source text from this field.
+        """
+        snapshot = self._current()
+        found = snapshot.note_types.get(note_type["id"])
+        if found is None or found.name != note_type["name"]:
+            # The note type is new, or it has been renamed.
+            found = snapshot.note_types[note_type["id"]] = NoteTypeProfiles.match(note_type, snapshot.profiles)
+        if src_field is None:
+            return found.profiles
+        return found.by_source.get(src_field, ())
@@ -9,16 +9,20 @@ HTML_AND_MEDIA_REGEX = re.compile(
     r"<[^<>]+>|\[sound:[^\[\]]+]",
     flags=RE_FLAGS,
 )
+# Reference: https://stackoverflow.com/questions/15033196/
+# Added arabic numbers.
+JP_CHARS = r"\u3000-\u303f\u3040-\u309f\u30a0-\u30ff\uff66-\uff9f\u4e00-\u9fff\u3400-\u4dbf０-９0-9"
+# Reference: https://wikiless.org/wiki/List_of_Japanese_typographic_symbols
+JP_SEP_CHARS = (
+    r"\r\n\t仝　 ・、※【】「」〒◎×〃゜『』《》～〜~〽,.。"
+    r"〄〇〈〉〓〔〕〖〗〘〙〚〛〝〞〟〠〡〢〣〥〦〧〨〭〮〯〫〬〶〷〸〹〺〻〼〾〿！？…ヽヾゞ〱〲〳〵〴（）［］｛｝｟｠゠＝‥•◦﹅﹆＊♪♫♬♩ⓍⓁⓎ"
+)
 RE_NON_JP = re.compile(
-    # Reference: https://stackoverflow.com/questions/15033196/
-    # Added arabic numbers.
-    r"[^\u3000-\u303f\u3040-\u309f\u30a0-\u30ff\uff66-\uff9f\u4e00-\u9fff\u3400-\u4dbf０-９0-9]+",
+    rf"[^{JP_CHARS}]+",
     flags=RE_FLAGS,
 )
 RE_JP_SEP = re.compile(
-    # Reference: https://wikiless.org/wiki/List_of_Japanese_typographic_symbols
-    r"[\r\n\t仝　 ・、※【】「」〒◎×〃゜『』《》～〜~〽,.。"
-    r"〄〇〈〉〓〔〕〖〗〘〙〚〛〝〞〟〠〡〢〣〥〦〧〨〭〮〯〫〬〶〷〸〹〺〻〼〾〿！？…ヽヾゞ〱〲〳〵〴（）［］｛｝｟｠゠＝‥•◦﹅﹆＊♪♫♬♩ⓍⓁⓎ]+",
+    rf"[{JP_SEP_CHARS}]+",
     flags=RE_FLAGS,
 )
 RE_COUNTERS = re.compile(
@@ -26,12 +30,15 @@ RE_COUNTERS = re.compile(
     r"([0-9０-９]+(?:万人|ヶ月|[つ月日人筋隻丁品番枚時回円万歳限]))",
     flags=RE_FLAGS,
 )
-RE_NON_JP_PARSED = re.compile(
-    r"<no-jp>(?P<token>.*?)</no-jp>",
-    flags=RE_FLAGS,
-)
-RE_NON_JP_PART = re.compile(
-    r"(<no-jp>.*?</no-jp>)",
+RE_TOKEN = re.compile(
+    # HTML tags and media files are taken whole, even if there's Japanese text inside.
+    rf"(?P<markup>{HTML_AND_MEDIA_REGEX.pattern})"
+    # Other text that isn't Japanese, up to the next tag.
+    rf"|(?P<non_jp>(?:(?!{HTML_AND_MEDIA_REGEX.pattern})[^{JP_CHARS}])+)"
+    # Japanese punctuation.
+    rf"|(?P<jp_sep>(?:(?=[{JP_CHARS}])[{JP_SEP_CHARS}])+)"
+    # Japanese text that can be parsed by mecab.
+    rf"|(?P<jp>(?:(?![{JP_SEP_CHARS}])[{JP_CHARS}])+)",
     flags=RE_FLAGS,
 )
 RE_ANKI_FURIGANA = re.compile(
@@ -70,17 +77,6 @@ def clean_furigana(expr: str) -> str:
     return re.sub(RE_ANKI_FURIGANA, r"\g<1>", expr)
 
 
-def mark_non_jp_token(m: re.Match) -> str:
-    return "<no-jp>" + m.group() + "</no-jp>"
-
-
-def split_with_regex(expr: str, pattern: re.Pattern) -> list[str]:
-    return re.split(
-        RE_NON_JP_PART,
-        string=re.sub(pattern, mark_non_jp_token, expr),
-    )
-
-
 def split_counters(text: str) -> Iterable[ParseableToken]:
     """Preemptively split text by words that mecab doesn't know how to parse."""
     for part in RE_COUNTERS.split(text):
@@ -88,29 +84,17 @@ def split_counters(text: str) -> Iterable[ParseableToken]:
             yield ParseableToken(part)
 
 
-SPLIT_REGEXES = (HTML_AND_MEDIA_REGEX, RE_NON_JP, RE_JP_SEP)
-
-
-def split_with_next_regex(expr: str, regex_idx: int) -> Iterable[Token]:
-    for part in split_with_regex(expr, SPLIT_REGEXES[regex_idx]):
-        if part:
-            if m := re.fullmatch(RE_NON_JP_PARSED, part):
-                yield Token(m.group("token"))
-            else:
-                yield from _tokenize(part, regex_idx=regex_idx + 1)
-
-
-def _tokenize(expr: str, *, regex_idx: int = 0) -> Iterable[Token]:
-    if regex_idx < len(SPLIT_REGEXES):
-        yield from split_with_next_regex(expr, regex_idx)
-    else:
-        yield from split_counters(expr.replace(" ", ""))
-
-
 def tokenize(expr: str) -> Iterable[Token]:
     """
     Splits expr to tokens.
     Each token can be either parseable with mecab or not.
     Furigana is removed from parseable tokens, if present.
     """
-    return _tokenize(expr=clean_furigana(expr))
+    if "[" in expr:
+        expr = clean_furigana(expr)
+    # Each character belongs to one of the groups, so the matches cover the whole text.
+    for m in RE_TOKEN.finditer(expr):
+        if m.lastgroup == "jp":
+            yield from split_counters(m.group())
+        else:
+            yield Token(m.group())
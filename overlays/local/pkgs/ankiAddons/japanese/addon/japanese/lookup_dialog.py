@@ -2,12 +2,14 @@
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
 import collections
 import io
-from collections.abc import Collection, Sequence
+import sqlite3
+from collections.abc import Callable, Collection, Sequence
 from gettext import gettext as _
-from typing import final
+from typing import Optional, final
 
 from aqt import gui_hooks, mw
 from aqt.browser import Browser
+from aqt.operations import QueryOp
 from aqt.qt import *
 from aqt.utils import tooltip
 from aqt.webview import AnkiWebView
@@ -20,11 +22,16 @@ from .database.sqlite3_buddy import Sqlite3Buddy
 from .helpers.consts import ADDON_NAME
 from .helpers.tokens import clean_furigana
 from .helpers.webview_utils import anki_addon_web_relpath
+from .pitch_accents.acc_dict_mgr_2 import SqliteAccDictReader
 from .pitch_accents.common import AccentDict, FormattedEntry, OrderedSet
 from .pitch_accents.styles import HTMLPitchPatternStyle
-from .reading import format_pronunciations, lookup, svg_graph_maker, update_html
+from .reading import format_pronunciations, lookup, make_svg_graph, update_html
 
 ACTION_NAME = "Pitch Accent lookup"
+# Number of headwords shown when searching by the beginning of words.
+PREFIX_SEARCH_LIMIT = 50
+# Search after the user stops typing for this long.
+SEARCH_DELAY_MS = 200
 
 
 def html_style() -> HTMLPitchPatternStyle:
@@ -42,7 +49,7 @@ def get_notation(entry: FormattedEntry, mode: LookupDialogPitchOutputFormat) ->
             f" {entry.pitch_number_html}"
         )
     elif mode == LookupDialogPitchOutputFormat.svg:
-        return f"{svg_graph_maker.make_graph(entry)} {entry.pitch_number_html}"
+        return f"{make_svg_graph(entry)} {entry.pitch_number_html}"
     raise RuntimeError("Unreachable.")
 
 
@@ -59,20 +66,34 @@ def lookup_pronunciations(search: str) -> AccentDict:
         return lookup.with_new_buddy(db).get_pronunciations(search, group_by_headword=True)
 
 
+def lookup_prefix(prefix: str, is_cancelled: Optional[Callable[[], bool]] = None) -> AccentDict:
+    with Sqlite3Buddy() as db:
+        return SqliteAccDictReader(db).look_up_prefix(prefix, PREFIX_SEARCH_LIMIT, is_cancelled)
+
+
 @final
 class ViewPitchAccentsDialog(AnkiSaveAndRestoreGeomDialog):
     name: str = "ajt__pitch_accent_lookup"
     _css_relpath: str = f"{anki_addon_web_relpath()}/ajt_webview.css"
     _pronunciations: AccentDict
     _web: AnkiWebView
+    _search_line: QLineEdit
+    _prefix_checkbox: QCheckBox
+    _search_timer: QTimer
+    # Incremented on each search. Searches that were started with an older id are stale.
+    _search_id: int = 0
 
-    def __init__(self, parent: QWidget, pronunciations: AccentDict) -> None:
+    def __init__(self, parent: QWidget, pronunciations: AccentDict, search_text: str = "") -> None:
         super().__init__(parent)
         self._web = AnkiWebView(parent=self, title=ACTION_NAME)
         self._web.setProperty("url", QUrl("about:blank"))
         self._web.setObjectName(self.name)
+        self._search_line = QLineEdit(search_text)
+        self._prefix_checkbox = QCheckBox("Match beginning")
+        self._search_timer = QTimer(self)
         self._pronunciations = pronunciations
         self._setup_ui()
+        self._setup_search()
         self._set_html_result()
         tweak_window(self)
 
@@ -81,9 +102,67 @@ class ViewPitchAccentsDialog(AnkiSaveAndRestoreGeomDialog):
         self.setWindowTitle(f"{ADDON_NAME} - {ACTION_NAME}")
         self.setMinimumSize(420, 240)
         self.setLayout(layout := QVBoxLayout())
+        layout.addLayout(self._make_search_bar())
         layout.addWidget(self._web)
         layout.addLayout(self._make_bottom_buttons())
 
+    def _make_search_bar(self) -> QLayout:
+        self._search_line.setPlaceholderText("Word to look up...")
+        self._prefix_checkbox.setToolTip(
+            "Show the most frequent words that start with the text as you type,\ninstead of looking up the text itself."
+        )
+        hbox = QHBoxLayout()
+        hbox.addWidget(self._search_line)
+        hbox.addWidget(self._prefix_checkbox)
+        return hbox
+
+    def _setup_search(self) -> None:
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(SEARCH_DELAY_MS)
+        qconnect(self._search_timer.timeout, self._start_search)
+        qconnect(self._search_line.textEdited, lambda _text: self._search_timer.start())
+        qconnect(self._prefix_checkbox.toggled, lambda _checked: self._start_search())
+
+    def _start_search(self) -> None:
+        """
+        Search in the background.
+        A search that is still running when a new one starts is cancelled, and its results are dropped.
+        """
+        self._search_timer.stop()
+        self._search_id += 1
+        search_id = self._search_id
+        if not (text := clean_furigana(self._search_line.text()).strip()):
+            return
+        prefix = self._prefix_checkbox.isChecked()
+
+        def is_stale() -> bool:
+            return search_id != self._search_id
+
+        QueryOp(
+            parent=self,
+            op=lambda _col: self._search(text, prefix, is_stale),
+            success=lambda result: self._on_search_done(search_id, result),
+        ).without_collection().run_in_background()
+
+    @staticmethod
+    def _search(text: str, prefix: bool, is_stale: Callable[[], bool]) -> Optional[AccentDict]:
+        if is_stale():
+            # The user has typed something else while this search was waiting to start.
+            return None
+        try:
+            return lookup_prefix(text, is_cancelled=is_stale) if prefix else lookup_pronunciations(text)
+        except sqlite3.OperationalError:
+            if is_stale():
+                # The query was interrupted.
+                return None
+            raise
+
+    def _on_search_done(self, search_id: int, result: Optional[AccentDict]) -> None:
+        if result is None or search_id != self._search_id:
+            return
+        self._pronunciations = result
+        self._set_html_result()
+
     def _make_bottom_buttons(self) -> QLayout:
         buttons = (
             ("Ok", self.accept),
@@ -146,6 +225,9 @@ class ViewPitchAccentsDialog(AnkiSaveAndRestoreGeomDialog):
     def done(self, result: int) -> None:
         # https://doc.qt.io/qt-6/qdialog.html#done
         print("closing AJT lookup window...")
+        # Cancel the running search, if any.
+        self._search_timer.stop()
+        self._search_id += 1
         return super().done(result)
 
 
@@ -158,7 +240,7 @@ def get_parent_widget(parent: QWidget) -> QWidget:
 def on_lookup_pronunciation(parent: QWidget, text: str) -> None:
     """Do a lookup on the selection"""
     if text := clean_furigana(text).strip():
-        ViewPitchAccentsDialog(parent, lookup_pronunciations(text)).show()
+        ViewPitchAccentsDialog(parent, lookup_pronunciations(text), search_text=text).show()
     else:
         tooltip(msg=_("Empty selection."), parent=get_parent_widget(parent))
 
@@ -3,4 +3,5 @@
 
 from .format import format_output
 from .kana_conv import is_kana_str, kana_to_moras, to_hiragana, to_katakana
+from .libmecab_controller import LibMecabController
 from .mecab_controller import BasicMecabController, MecabController
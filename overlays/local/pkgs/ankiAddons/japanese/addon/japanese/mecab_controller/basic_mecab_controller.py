@@ -3,7 +3,10 @@
 
 import functools
 import os
+import queue
 import subprocess
+import threading
+from collections.abc import Sequence
 from typing import Optional
 
 try:
@@ -13,6 +16,9 @@ except ImportError:
 
 INPUT_BUFFER_SIZE = str(819200)
 MECAB_RC_PATH = os.path.join(SUPPORT_DIR, "mecabrc")
+EOS_FORMAT_ARG = "--eos-format="
+DEFAULT_EOS = "EOS\n"
+READ_CHUNK_SIZE = 65536
 
 
 @functools.cache
@@ -58,14 +64,31 @@ def check_mecab_rc():
             f.write("")
 
 
+def to_one_line(expr: str) -> str:
+    # Mecab analyzes its input line by line.
+    # Exactly one answer is expected per request, so the expression must fit on one line.
+    return expr.replace("\r", " ").replace("\n", " ")
+
+
 def expr_to_bytes(expr: str) -> bytes:
-    return expr.encode("utf-8", "ignore") + b"\n"
+    return to_one_line(expr).encode("utf-8", "ignore") + b"\n"
 
 
 def mecab_output_to_str(outs: bytes) -> str:
     return outs.rstrip(b"\r\n").decode("utf-8", "replace")
 
 
+def find_eos_marker(mecab_cmd: list[str]) -> bytes:
+    """
+    Mecab prints the end-of-sentence marker after it has finished analyzing a line.
+    The marker is used to find where the answer to each request ends.
+    """
+    for arg in reversed(mecab_cmd):
+        if arg.startswith(EOS_FORMAT_ARG):
+            return arg[len(EOS_FORMAT_ARG) :].encode("utf-8")
+    return DEFAULT_EOS.encode("utf-8")
+
+
 def prepend_library_path() -> None:
     for library_path in ("DYLD_LIBRARY_PATH", "LD_LIBRARY_PATH"):
         try:
@@ -74,7 +97,42 @@ def prepend_library_path() -> None:
             os.environ[library_path] = SUPPORT_DIR
 
 
+class MecabNoAnswer(RuntimeError):
+    """
+    Mecab timed out or exited before it answered every expression.
+    Carries whatever mecab printed before that.
+    """
+
+    partial_output: str
+
+    def __init__(self, message: str, partial_output: str) -> None:
+        super().__init__(message)
+        self.partial_output = partial_output
+
+
+def read_pipe(pipe, output: "queue.Queue[bytes]") -> None:
+    """
+    Forward everything mecab prints to the queue.
+    An empty chunk means that mecab has exited.
+    """
+    fd = pipe.fileno()
+    while True:
+        try:
+            chunk = os.read(fd, READ_CHUNK_SIZE)
+        except OSError:
+            chunk = b""
+        output.put(chunk)
+        if not chunk:
+            break
+
+
 class BasicMecabController:
+    """
+    Keeps a long-lived mecab process and talks to it over stdin/stdout.
+    Each expression is sent as one line, and the answer is read until the end-of-sentence marker.
+    If mecab crashes or doesn't answer in time, the process is restarted on the next call.
+    """
+
     _mecab_cmd: list[str] = [
         find_executable("mecab"),
         "--dicdir=" + find_best_dic_dir(),
@@ -84,26 +142,44 @@ class BasicMecabController:
     ]
     _mecab_args: list[str] = []
     _verbose: bool
+    _timeout: float
+    _eos_marker: bytes
+    _proc: Optional[subprocess.Popen]
+    _output: "queue.Queue[bytes]"
+    _lock: threading.Lock
 
     def __init__(
         self,
         mecab_cmd: Optional[list[str]] = None,
         mecab_args: Optional[list[str]] = None,
         verbose: bool = False,
+        timeout: float = 5,
     ) -> None:
         super().__init__()
         check_mecab_rc()
         self._verbose = verbose
+        self._timeout = timeout
         self._mecab_cmd = normalize_for_platform((mecab_cmd or self._mecab_cmd) + (mecab_args or self._mecab_args))
+        self._eos_marker = find_eos_marker(self._mecab_cmd)
+        self._proc = None
+        self._output = queue.Queue()
+        self._lock = threading.Lock()
         prepend_library_path()
         if self._verbose:
             print("mecab cmd:", self._mecab_cmd)
 
-    def run(self, expr: str) -> str:
+    def command_line_args(self) -> list[str]:
+        """Arguments passed to mecab, without the path to the executable."""
+        return self._mecab_cmd[1:]
+
+    def is_running(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def _start(self) -> subprocess.Popen:
         try:
             proc = subprocess.Popen(
                 self._mecab_cmd,
-                bufsize=-1,
+                bufsize=0,
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
@@ -111,16 +187,88 @@ class BasicMecabController:
             )
         except OSError:
             raise Exception("Please ensure your Linux system has 64 bit binary support.")
+        # Each process gets its own queue, so that output left over from a dead process is never read.
+        self._output = queue.Queue()
+        threading.Thread(target=read_pipe, args=(proc.stdout, self._output), daemon=True).start()
+        if self._verbose:
+            print(f"started mecab process, pid: {proc.pid}")
+        return proc
 
+    def _stop(self) -> None:
+        if self._proc is None:
+            return
+        proc, self._proc = self._proc, None
         try:
-            outs, errs = proc.communicate(expr_to_bytes(expr), timeout=5)
+            proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            proc.wait(timeout=1)
         except subprocess.TimeoutExpired:
             proc.kill()
-            outs, errs = proc.communicate()
+            proc.wait()
+
+    def close(self) -> None:
+        """Terminate the mecab process. It will be started again if needed."""
+        with self._lock:
+            self._stop()
+
+    def _restart(self) -> None:
+        self._stop()
+        self._proc = self._start()
+
+    def _send(self, exprs: Sequence[str]) -> None:
+        data = b"".join(expr_to_bytes(expr) for expr in exprs)
+        for _attempt in range(2):
+            if not self.is_running():
+                self._restart()
+            try:
+                self._proc.stdin.write(data)
+                self._proc.stdin.flush()
+            except OSError:
+                # mecab has died since the last call. try once more with a new process.
+                continue
+            else:
+                return
+
+    def _receive(self, n_answers: int) -> tuple[bytes, bool]:
+        """
+        Read until mecab has answered every expression.
+        Return the output and whether all answers arrived before mecab timed out or exited.
+        """
+        outs = bytearray()
+        while not (outs.endswith(self._eos_marker) and outs.count(self._eos_marker) >= n_answers):
+            try:
+                chunk = self._output.get(timeout=self._timeout)
+            except queue.Empty:
+                print(f"mecab didn't respond in {self._timeout} seconds. restarting.")
+                self._proc.kill()
+                self._stop()
+                return bytes(outs), False
+            if not chunk:
+                # mecab exited. It will be restarted on the next call.
+                self._stop()
+                return bytes(outs), False
+            outs += chunk
+        return bytes(outs), True
+
+    def run(self, expr: str) -> str:
+        return self.run_many((expr,))
 
+    def run_many(self, exprs: Sequence[str]) -> str:
+        """
+        Analyze all expressions in one round-trip.
+        Answers follow each other in the output, each one ends with the end-of-sentence marker.
+        Raise MecabNoAnswer if mecab timed out or exited before it answered every expression.
+        """
+        with self._lock:
+            self._send(exprs)
+            outs, answered = self._receive(len(exprs))
         str_out = mecab_output_to_str(outs)
         if "tagger.cpp" in str_out and "no such file or directory" in str_out:
             raise RuntimeError("Please ensure your Windows user name contains only English characters.")
+        if not answered:
+            raise MecabNoAnswer(f"mecab didn't answer all {len(exprs)} expressions", partial_output=str_out)
         return str_out
 
 
@@ -142,6 +290,7 @@ def main():
 
     for expr in try_expressions:
         print(mecab.run(expr))
+    mecab.close()
 
 
 if __name__ == "__main__":
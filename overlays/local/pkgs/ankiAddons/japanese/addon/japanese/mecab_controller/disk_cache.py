@@ -0,0 +1,228 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+from collections.abc import Iterable, Sequence
+from typing import Optional
+
+try:
+    from .basic_types import Inflection, MecabParsedToken, PartOfSpeech
+except ImportError:
+    from basic_types import Inflection, MecabParsedToken, PartOfSpeech
+
+# Bump when the way mecab's output is parsed or corrected changes,
+# so that tokens stored by older versions are no longer used.
+CACHE_FORMAT_VERSION = 1
+DICTIONARY_ARGS = ("--dicdir=", "--userdic=")
+MECAB_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mecab_parse_cache(
+    fingerprint TEXT    NOT NULL,
+    expr        TEXT    NOT NULL,
+    tokens      TEXT    NOT NULL,
+    size        INTEGER NOT NULL,
+    last_used   INTEGER NOT NULL,
+    PRIMARY KEY (fingerprint, expr)
+);
+CREATE INDEX IF NOT EXISTS index_mecab_parse_cache_last_used ON mecab_parse_cache(last_used);
+"""
+
+
+def iter_dictionary_files(mecab_argv: Sequence[str]) -> Iterable[str]:
+    for arg in mecab_argv:
+        for prefix in DICTIONARY_ARGS:
+            if not arg.startswith(prefix):
+                continue
+            path = arg[len(prefix) :]
+            if os.path.isdir(path):
+                yield from sorted(entry.path for entry in os.scandir(path) if entry.is_file())
+            elif os.path.isfile(path):
+                yield path
+
+
+def mecab_fingerprint(mecab_argv: Sequence[str]) -> str:
+    """
+    Identify the mecab configuration that produced the cached tokens.
+    The fingerprint changes if the arguments or any of the dictionary files change.
+    The path to the executable is ignored because the bundled and system-wide mecab give the same output.
+    """
+    h = hashlib.sha1(f"v{CACHE_FORMAT_VERSION}".encode("utf-8"))
+    for arg in mecab_argv:
+        h.update(arg.encode("utf-8") + b"\0")
+    for path in iter_dictionary_files(mecab_argv):
+        stat = os.stat(path)
+        h.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}\0".encode("utf-8"))
+    return h.hexdigest()
+
+
+def serialize_tokens(tokens: Sequence[MecabParsedToken]) -> str:
+    return json.dumps(
+        [
+            [
+                token.word,
+                token.headword,
+                token.katakana_reading,
+                token.part_of_speech.value,
+                token.inflection_type.value,
+            ]
+            for token in tokens
+        ],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def deserialize_tokens(data: str) -> tuple[MecabParsedToken, ...]:
+    return tuple(
+        MecabParsedToken(
+            word=word,
+            headword=headword,
+            katakana_reading=katakana_reading,
+            part_of_speech=PartOfSpeech(part_of_speech),
+            inflection_type=Inflection(inflection_type),
+        )
+        for word, headword, katakana_reading, part_of_speech, inflection_type in json.loads(data)
+    )
+
+
+class MecabDiskCache:
+    """
+    Stores parsed tokens in an sqlite3 file, so that they survive restarts.
+    Rows are keyed by the escaped expression and the fingerprint of the mecab configuration.
+    When the stored tokens grow beyond max_size bytes, the least recently used rows are removed.
+    The cache is an optimization, so any database error disables it instead of breaking the lookup.
+    """
+
+    _db_path: pathlib.Path
+    _max_size: int
+    _fingerprint: str
+    _con: Optional[sqlite3.Connection]
+    _lock: threading.Lock
+    _total_size: int
+    _clock: int
+
+    def __init__(self, db_path: pathlib.Path, fingerprint: str, max_size: int) -> None:
+        self._db_path = db_path
+        self._fingerprint = fingerprint
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._con = None
+        self._total_size = 0
+        self._clock = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._con is None:
+            # The connection is shared by all threads and guarded by the lock.
+            con = sqlite3.connect(self._db_path, check_same_thread=False, timeout=1)
+            # Losing the last few writes on a power cut is fine for a cache.
+            con.execute("PRAGMA journal_mode = WAL")
+            con.execute("PRAGMA synchronous = NORMAL")
+            con.executescript(MECAB_CACHE_SCHEMA)
+            # Entries written with other mecab configurations can't be used anymore.
+            con.execute("DELETE FROM mecab_parse_cache WHERE fingerprint != ?", (self._fingerprint,))
+            con.commit()
+            self._total_size, self._clock = con.execute(
+                "SELECT coalesce(sum(size), 0), coalesce(max(last_used), 0) FROM mecab_parse_cache"
+            ).fetchone()
+            self._con = con
+        return self._con
+
+    def _disable(self, ex: Exception) -> None:
+        print(f"mecab disk cache is disabled: {ex}")
+        self._max_size = 0
+        self._close()
+
+    def is_enabled(self) -> bool:
+        return self._max_size > 0
+
+    def get_many(self, exprs: Iterable[str]) -> dict[str, tuple[MecabParsedToken, ...]]:
+        """Return stored tokens for each expression that is in the cache."""
+        exprs = list(dict.fromkeys(exprs))
+        if not exprs or not self.is_enabled():
+            return {}
+        with self._lock:
+            try:
+                con = self._connect()
+                found = {}
+                for expr in exprs:
+                    row = con.execute(
+                        "SELECT tokens FROM mecab_parse_cache WHERE fingerprint = ? AND expr = ?",
+                        (self._fingerprint, expr),
+                    ).fetchone()
+                    if row is not None:
+                        found[expr] = deserialize_tokens(row[0])
+                if found:
+                    self._clock += 1
+                    con.executemany(
+                        "UPDATE mecab_parse_cache SET last_used = ? WHERE fingerprint = ? AND expr = ?",
+                        ((self._clock, self._fingerprint, expr) for expr in found),
+                    )
+                    con.commit()
+                return found
+            except (sqlite3.Error, ValueError) as ex:
+                self._disable(ex)
+                return {}
+
+    def get(self, expr: str) -> Optional[tuple[MecabParsedToken, ...]]:
+        return self.get_many((expr,)).get(expr)
+
+    def put_many(self, items: dict[str, Sequence[MecabParsedToken]]) -> None:
+        if not items or not self.is_enabled():
+            return
+        with self._lock:
+            try:
+                con = self._connect()
+                self._clock += 1
+                for expr, tokens in items.items():
+                    data = serialize_tokens(tokens)
+                    size = len(expr.encode("utf-8")) + len(data.encode("utf-8"))
+                    old = con.execute(
+                        "SELECT size FROM mecab_parse_cache WHERE fingerprint = ? AND expr = ?",
+                        (self._fingerprint, expr),
+                    ).fetchone()
+                    con.execute(
+                        "INSERT OR REPLACE INTO mecab_parse_cache (fingerprint, expr, tokens, size, last_used) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (self._fingerprint, expr, data, size, self._clock),
+                    )
+                    self._total_size += size - (old[0] if old else 0)
+                self._evict(con)
+                con.commit()
+            except sqlite3.Error as ex:
+                self._disable(ex)
+
+    def put(self, expr: str, tokens: Sequence[MecabParsedToken]) -> None:
+        self.put_many({expr: tokens})
+
+    def _evict(self, con: sqlite3.Connection) -> None:
+        """Remove the least recently used rows until the cache takes up no more than 3/4 of its limit."""
+        if self._total_size <= self._max_size:
+            return
+        target = self._max_size * 3 // 4
+        rows = con.execute("SELECT expr, size FROM mecab_parse_cache ORDER BY last_used").fetchall()
+        to_remove = []
+        for expr, size in rows:
+            if self._total_size <= target:
+                break
+            to_remove.append((self._fingerprint, expr))
+            self._total_size -= size
+        con.executemany("DELETE FROM mecab_parse_cache WHERE fingerprint = ? AND expr = ?", to_remove)
+
+    def total_size(self) -> int:
+        return self._total_size
+
+    def _close(self) -> None:
+        if self._con is not None:
+            try:
+                self._con.close()
+            except sqlite3.Error:
+                pass
+            self._con = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
@@ -1,6 +1,7 @@
 # Copyright: Ren Tatsumoto <tatsu at autistici.org> and contributors
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
 
+import functools
 import re
 
 # Define characters
@@ -11,6 +12,21 @@ KATAKANA = "ァアィイゥウェエォオカガカ゚キギキ゚クグク゚
 KATAKANA_TO_HIRAGANA = str.maketrans(KATAKANA, HIRAGANA)
 HIRAGANA_TO_KATAKANA = str.maketrans(HIRAGANA, KATAKANA)
 
+# Same characters as above, as codepoint ranges. The long vowel mark (ー) is used in both scripts.
+HIRAGANA_RANGES = "\u3041-\u3096\u309a\u309d\u309e"
+KATAKANA_RANGES = "\u309a\u30a1-\u30f6\u30fd\u30fe"
+RE_HIRAGANA_STR = re.compile(f"[{HIRAGANA_RANGES}ー]+")
+RE_KATAKANA_STR = re.compile(f"[{KATAKANA_RANGES}ー]+")
+RE_KANA_STR = re.compile(f"[{HIRAGANA_RANGES}{KATAKANA_RANGES}ー]+")
+HIRAGANA_CHARS = frozenset(HIRAGANA + "ー")
+KATAKANA_CHARS = frozenset(KATAKANA + "ー")
+KANA_CHARS = HIRAGANA_CHARS | KATAKANA_CHARS
+
+# Most words are short, and the same words are converted and checked over and over again.
+# Longer strings (sentences, field contents) are rarely repeated and aren't cached.
+CACHED_STR_MAX_LEN = 16
+CACHE_SIZE = 8192
+
 RE_ONE_MORA = re.compile(r".゚?[ァィゥェォャュョぁぃぅぇぉゃゅょ]?")
 
 
@@ -18,48 +34,83 @@ def kana_to_moras(kana: str) -> list[str]:
     return re.findall(RE_ONE_MORA, kana)
 
 
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _to_hiragana_cached(kana: str) -> str:
+    return kana.translate(KATAKANA_TO_HIRAGANA)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _to_katakana_cached(kana: str) -> str:
+    return kana.translate(HIRAGANA_TO_KATAKANA)
+
+
 def to_hiragana(kana: str) -> str:
+    if len(kana) <= CACHED_STR_MAX_LEN:
+        return _to_hiragana_cached(kana)
     return kana.translate(KATAKANA_TO_HIRAGANA)
 
 
 def to_katakana(kana: str) -> str:
+    if len(kana) <= CACHED_STR_MAX_LEN:
+        return _to_katakana_cached(kana)
     return kana.translate(HIRAGANA_TO_KATAKANA)
 
 
 def is_hiragana_char(char: str) -> bool:
     if len(char) != 1:
         raise ValueError("string must contain one character")
-    return char in HIRAGANA or char == "ー"
+    return char in HIRAGANA_CHARS
 
 
 def is_katakana_char(char: str) -> bool:
     if len(char) != 1:
         raise ValueError("string must contain one character")
-    return char in KATAKANA or char == "ー"
+    return char in KATAKANA_CHARS
 
 
 def is_kana_char(char: str) -> bool:
     if len(char) != 1:
         raise ValueError("string must contain one character")
-    return char in HIRAGANA or char in KATAKANA or char == "ー"
+    return char in KANA_CHARS
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _is_hiragana_str_cached(word: str) -> bool:
+    return RE_HIRAGANA_STR.fullmatch(word) is not None
 
 
 def is_hiragana_str(word: str) -> bool:
     if not word:
         raise ValueError("string can't be empty")
-    return all(map(is_hiragana_char, word))
+    if len(word) <= CACHED_STR_MAX_LEN:
+        return _is_hiragana_str_cached(word)
+    return RE_HIRAGANA_STR.fullmatch(word) is not None
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _is_katakana_str_cached(word: str) -> bool:
+    return RE_KATAKANA_STR.fullmatch(word) is not None
 
 
 def is_katakana_str(word: str) -> bool:
     if not word:
         raise ValueError("string can't be empty")
-    return all(map(is_katakana_char, word))
+    if len(word) <= CACHED_STR_MAX_LEN:
+        return _is_katakana_str_cached(word)
+    return RE_KATAKANA_STR.fullmatch(word) is not None
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _is_kana_str_cached(word: str) -> bool:
+    return RE_KANA_STR.fullmatch(word) is not None
 
 
 def is_kana_str(word: str) -> bool:
     if not word:
         raise ValueError("string can't be empty")
-    return all(map(is_kana_char, word))
+    if len(word) <= CACHED_STR_MAX_LEN:
+        return _is_kana_str_cached(word)
+    return RE_KANA_STR.fullmatch(word) is not None
 
 
 def main():
@@ -73,6 +124,7 @@ def main():
     assert is_kana_str("ひらがなカタカナ") is True
     assert is_kana_str("ニュース") is True
     assert is_kana_str("故郷は") is False
+    assert all(map(is_hiragana_str, HIRAGANA)) and all(map(is_katakana_str, KATAKANA))
     print("Ok.")
 
 
@@ -0,0 +1,128 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import ctypes
+import functools
+import threading
+from collections.abc import Sequence
+from typing import Optional
+
+try:
+    from .basic_mecab_controller import (
+        BasicMecabController,
+        check_mecab_rc,
+        mecab_output_to_str,
+        normalize_for_platform,
+        to_one_line,
+    )
+    from .mecab_exe_finder import find_bundled_library
+except ImportError:
+    from basic_mecab_controller import (
+        BasicMecabController,
+        check_mecab_rc,
+        mecab_output_to_str,
+        normalize_for_platform,
+        to_one_line,
+    )
+    from mecab_exe_finder import find_bundled_library
+
+
+class LibMecabError(RuntimeError):
+    pass
+
+
+@functools.cache
+def load_libmecab() -> ctypes.CDLL:
+    """
+    Load the bundled libmecab and declare the functions of its C API that are used.
+    Raises OSError if the library is missing or can't be loaded.
+    """
+    if not (path := find_bundled_library()):
+        raise OSError("libmecab isn't bundled for this platform.")
+    lib = ctypes.CDLL(path)
+    lib.mecab_new.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_char_p)]
+    lib.mecab_new.restype = ctypes.c_void_p
+    lib.mecab_strerror.argtypes = [ctypes.c_void_p]
+    lib.mecab_strerror.restype = ctypes.c_char_p
+    lib.mecab_sparse_tostr2.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_size_t]
+    lib.mecab_sparse_tostr2.restype = ctypes.c_char_p
+    lib.mecab_destroy.argtypes = [ctypes.c_void_p]
+    lib.mecab_destroy.restype = None
+    return lib
+
+
+def is_libmecab_available() -> bool:
+    try:
+        load_libmecab()
+    except (OSError, AttributeError):
+        return False
+    return True
+
+
+class LibMecabController:
+    """
+    Calls mecab in-process through the bundled libmecab.
+    Accepts the same arguments and produces the same output as BasicMecabController,
+    without the pipe I/O and process management.
+    """
+
+    _mecab_argv: list[str] = BasicMecabController._mecab_cmd[1:]
+    _verbose: bool
+    _lib: ctypes.CDLL
+    _tagger: Optional[int]
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        mecab_args: Optional[list[str]] = None,
+        verbose: bool = False,
+    ) -> None:
+        super().__init__()
+        check_mecab_rc()
+        self._verbose = verbose
+        self._mecab_argv = normalize_for_platform(self._mecab_argv + (mecab_args or []))
+        self._lib = load_libmecab()
+        self._lock = threading.Lock()
+        # Create the tagger right away to fail early if the dictionary can't be loaded.
+        self._tagger = self._new_tagger()
+        if self._verbose:
+            print("libmecab args:", self._mecab_argv)
+
+    def command_line_args(self) -> list[str]:
+        """Arguments passed to mecab, same as with the executable."""
+        return list(self._mecab_argv)
+
+    def _new_tagger(self) -> int:
+        # The first element of argv is the program name, which mecab ignores.
+        argv = [arg.encode("utf-8") for arg in ("mecab", *self._mecab_argv)]
+        tagger = self._lib.mecab_new(len(argv), (ctypes.c_char_p * len(argv))(*argv))
+        if not tagger:
+            raise LibMecabError(f"couldn't create mecab tagger: {self._strerror(None)}")
+        return tagger
+
+    def _strerror(self, tagger: Optional[int]) -> str:
+        return (self._lib.mecab_strerror(tagger) or b"").decode("utf-8", "replace")
+
+    def _parse(self, expr: str) -> bytes:
+        data = to_one_line(expr).encode("utf-8", "ignore")
+        result = self._lib.mecab_sparse_tostr2(self._tagger, data, len(data))
+        if result is None:
+            raise LibMecabError(f"mecab failed to parse input: {self._strerror(self._tagger)}")
+        return result
+
+    def close(self) -> None:
+        """Free the tagger. It will be created again if needed."""
+        with self._lock:
+            if self._tagger:
+                self._lib.mecab_destroy(self._tagger)
+                self._tagger = None
+
+    def run(self, expr: str) -> str:
+        return self.run_many((expr,))
+
+    def run_many(self, exprs: Sequence[str]) -> str:
+        # The tagger keeps its lattice between calls, so it can't be used by two threads at once.
+        with self._lock:
+            if not self._tagger:
+                self._tagger = self._new_tagger()
+            return mecab_output_to_str(b"".join(self._parse(expr) for expr in exprs))
@@ -1,46 +1,206 @@
 # Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
 
+import dataclasses
+import enum
+import sys
+import threading
 from collections import OrderedDict
-from collections.abc import Hashable
-from typing import Generic, TypeVar
+from collections.abc import Callable, Hashable
+from typing import Generic, Optional, TypeVar
 
 K = TypeVar("K", bound=Hashable)
 V = TypeVar("V")
 
 
+def approx_sizeof(obj: object, _seen: Optional[set[int]] = None) -> int:
+    """
+    Estimate how much memory an object takes, including the objects it refers to.
+    Enum members are shared by everyone, so they aren't counted.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen or isinstance(obj, (enum.Enum, type)) or obj is None:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)):
+        return size
+    if isinstance(obj, dict):
+        return size + sum(approx_sizeof(k, _seen) + approx_sizeof(v, _seen) for k, v in obj.items())
+    if isinstance(obj, (tuple, list, set, frozenset)):
+        return size + sum(approx_sizeof(item, _seen) for item in obj)
+    if dataclasses.is_dataclass(obj):
+        return size + sum(approx_sizeof(getattr(obj, field.name), _seen) for field in dataclasses.fields(obj))
+    return size
+
+
+@dataclasses.dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size_bytes: int
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / (self.hits + self.misses) if (self.hits + self.misses) else 0.0
+
+
 class LRUCache(Generic[K, V]):
     """
     This class is used to cache results of calls to mecab.translate() instead of functools.lru_cache().
+    It is safe to use from several threads at once.
+    The cache is bounded by the number of entries (capacity) and, optionally, by their approximate size in bytes.
+    Zero means no limit.
     """
 
     _cache: OrderedDict[K, V]
+    _sizes: dict[K, int]
     _capacity: int
+    _max_bytes: int
+    _size_bytes: int
+    _lock: threading.RLock
+    _pending: dict[K, tuple[int, threading.Event]]
+    _hits: int
+    _misses: int
+    _evictions: int
 
-    def __init__(self, capacity: int = 0) -> None:
+    def __init__(self, capacity: int = 0, max_bytes: int = 0) -> None:
         self._capacity = capacity
+        self._max_bytes = max_bytes
         self._cache = OrderedDict()
+        self._sizes = {}
+        self._size_bytes = 0
+        self._lock = threading.RLock()
+        self._pending = {}
+        self._hits = self._misses = self._evictions = 0
 
     def __getitem__(self, key: K) -> V:
-        value = self._cache[key]
-        self._cache.move_to_end(key)
-        return value
+        with self._lock:
+            try:
+                value = self._cache[key]
+            except KeyError:
+                self._misses += 1
+                raise
+            self._cache.move_to_end(key)
+            self._hits += 1
+            return value
 
     def __setitem__(self, key: K, value: V) -> None:
+        with self._lock:
+            self._store(key, value)
+            self._clear_old_items()
+
+    def __contains__(self, key: K) -> bool:
+        with self._lock:
+            return key in self._cache
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cache)
+
+    def _store(self, key: K, value: V) -> None:
+        if self._max_bytes > 0:
+            size = approx_sizeof(key) + approx_sizeof(value)
+            self._size_bytes += size - self._sizes.get(key, 0)
+            self._sizes[key] = size
         self._cache[key] = value
         self._cache.move_to_end(key)
-        self._clear_old_items()
 
     def set_capacity(self, capacity: int) -> None:
-        self._capacity = capacity
-        self._clear_old_items()
+        with self._lock:
+            self._capacity = capacity
+            self._clear_old_items()
+
+    def set_max_bytes(self, max_bytes: int) -> None:
+        with self._lock:
+            if max_bytes > 0 and self._max_bytes <= 0:
+                # Sizes weren't tracked before.
+                self._sizes = {key: approx_sizeof(key) + approx_sizeof(value) for key, value in self._cache.items()}
+                self._size_bytes = sum(self._sizes.values())
+            elif max_bytes <= 0:
+                self._sizes.clear()
+                self._size_bytes = 0
+            self._max_bytes = max_bytes
+            self._clear_old_items()
+
+    def _is_over_limit(self) -> bool:
+        return (self._capacity > 0 and len(self._cache) > self._capacity) or (
+            self._max_bytes > 0 and self._size_bytes > self._max_bytes
+        )
 
     def _clear_old_items(self) -> None:
-        if self._capacity > 0:
-            while len(self._cache) > self._capacity:
-                self._cache.popitem(last=False)
+        while self._cache and self._is_over_limit():
+            key, _value = self._cache.popitem(last=False)
+            self._size_bytes -= self._sizes.pop(key, 0)
+            self._evictions += 1
 
     def setdefault(self, key: K, value: V) -> V:
-        value = self._cache.setdefault(key, value)
-        self._cache.move_to_end(key)
-        return value
+        with self._lock:
+            try:
+                value = self._cache[key]
+            except KeyError:
+                self._store(key, value)
+                self._clear_old_items()
+            else:
+                self._cache.move_to_end(key)
+            return value
+
+    def get_or_compute(self, key: K, compute: Callable[[], V]) -> V:
+        """
+        Return the cached value, or compute it and add it to the cache.
+        If several threads ask for the same missing key, only one of them calls compute(),
+        and the others wait for its result.
+        """
+        while True:
+            with self._lock:
+                try:
+                    return self[key]
+                except KeyError:
+                    pass
+                if key not in self._pending:
+                    self._pending[key] = (threading.get_ident(), event := threading.Event())
+                    break
+                owner, event = self._pending[key]
+            if owner == threading.get_ident():
+                # compute() asked for its own key. Waiting would never end.
+                return compute()
+            # Another thread is computing the value. Wait and look it up again.
+            # If that thread failed, this thread will try to compute the value on the next iteration.
+            event.wait()
+        try:
+            return self.setdefault(key, compute())
+        finally:
+            with self._lock:
+                del self._pending[key]
+            event.set()
+
+    def discard_if(self, predicate: Callable[[K, V], bool]) -> int:
+        """
+        Remove the entries for which predicate(key, value) is true.
+        Return the number of removed entries.
+        """
+        with self._lock:
+            to_remove = [key for key, value in self._cache.items() if predicate(key, value)]
+            for key in to_remove:
+                del self._cache[key]
+                self._size_bytes -= self._sizes.pop(key, 0)
+            return len(to_remove)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._sizes.clear()
+            self._size_bytes = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=len(self._cache),
+                size_bytes=self._size_bytes,
+            )
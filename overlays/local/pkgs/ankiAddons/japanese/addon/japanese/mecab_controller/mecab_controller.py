@@ -2,12 +2,13 @@
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
 import dataclasses
 import io
+import pathlib
 import re
 from collections.abc import Iterable, Sequence
-from typing import Optional
+from typing import Optional, Union
 
 try:
-    from .basic_mecab_controller import BasicMecabController
+    from .basic_mecab_controller import BasicMecabController, MecabNoAnswer
     from .basic_types import (
         COMPONENTS,
         Inflection,
@@ -15,12 +16,18 @@ try:
         PartOfSpeech,
         Separators,
     )
+    from .disk_cache import MecabDiskCache, mecab_fingerprint
     from .format import format_output
     from .kana_conv import is_kana_str, to_hiragana, to_katakana
-    from .lru_cache import LRUCache
+    from .libmecab_controller import (
+        LibMecabController,
+        LibMecabError,
+        is_libmecab_available,
+    )
+    from .lru_cache import CacheStats, LRUCache
     from .replace_mistakes import replace_mistakes
 except ImportError:
-    from basic_mecab_controller import BasicMecabController
+    from basic_mecab_controller import BasicMecabController, MecabNoAnswer
     from basic_types import (
         COMPONENTS,
         Inflection,
@@ -28,9 +35,15 @@ except ImportError:
         PartOfSpeech,
         Separators,
     )
+    from disk_cache import MecabDiskCache, mecab_fingerprint
     from format import format_output
     from kana_conv import is_kana_str, to_hiragana, to_katakana
-    from lru_cache import LRUCache
+    from libmecab_controller import (
+        LibMecabController,
+        LibMecabError,
+        is_libmecab_available,
+    )
+    from lru_cache import CacheStats, LRUCache
     from replace_mistakes import replace_mistakes
 
 
@@ -48,15 +61,40 @@ def escape_text(text: str) -> str:
     return text.strip()
 
 
+def drop_unfinished_node(mecab_output: str) -> str:
+    """Keep only the nodes that mecab finished printing before it was cut off."""
+    idx = mecab_output.rfind(Separators.node)
+    return mecab_output[: idx + len(Separators.node)] if idx >= 0 else ""
+
+
+def new_mecab_backend(
+    mecab_cmd: Optional[list[str]],
+    mecab_args: list[str],
+    verbose: bool,
+) -> Union[LibMecabController, BasicMecabController]:
+    """
+    Prefer calling the bundled libmecab in-process.
+    Fall back to running the mecab executable if the library can't be used
+    or if the caller asked for a specific mecab command.
+    """
+    if mecab_cmd is None and is_libmecab_available():
+        try:
+            return LibMecabController(mecab_args=mecab_args, verbose=verbose)
+        except LibMecabError as ex:
+            print(f"{ex}. Falling back to the mecab executable.")
+    return BasicMecabController(mecab_cmd=mecab_cmd, mecab_args=mecab_args, verbose=verbose)
+
+
 class MecabController:
     _mecab_args: list[str] = [
         "--node-format=" + Separators.component.join(component for component in COMPONENTS) + Separators.node,
         "--unk-format=" + COMPONENTS.word + Separators.node,
         "--eos-format=" + Separators.footer,
     ]
-    _mecab: BasicMecabController
+    _mecab: Union[LibMecabController, BasicMecabController]
     _verbose: bool
     _cache: LRUCache[str, Sequence[MecabParsedToken]] = LRUCache()
+    _disk_cache: Optional[MecabDiskCache]
 
     def __init__(
         self,
@@ -64,31 +102,101 @@ class MecabController:
         mecab_args: Optional[list[str]] = None,
         verbose: bool = False,
         cache_max_size: int = 1024,
+        cache_max_bytes: int = 0,
+        disk_cache_path: Optional[pathlib.Path] = None,
+        disk_cache_max_size: int = 0,
     ) -> None:
-        self._mecab = BasicMecabController(
+        self._mecab = new_mecab_backend(
             mecab_cmd=mecab_cmd,
             mecab_args=(mecab_args or self._mecab_args),
             verbose=verbose,
         )
         self._cache.set_capacity(cache_max_size)
+        self._cache.set_max_bytes(cache_max_bytes)
         self._verbose = verbose
+        self._disk_cache = None
+        if disk_cache_path and disk_cache_max_size > 0:
+            self._disk_cache = MecabDiskCache(
+                db_path=disk_cache_path,
+                fingerprint=mecab_fingerprint(self._mecab.command_line_args()),
+                max_size=disk_cache_max_size,
+            )
+
+    @classmethod
+    def cache_stats(cls) -> CacheStats:
+        return cls._cache.stats()
 
     def translate(self, expr: str) -> Sequence[MecabParsedToken]:
         try:
-            return self._cache[expr]
-        except KeyError:
-            return self._cache.setdefault(expr, tuple(self._translate(expr)))
+            return self._cache.get_or_compute(expr, lambda: self._translate_uncached(expr))
+        except MecabNoAnswer as ex:
+            # Not cached in memory or on disk, so that the expression is analyzed again next time.
+            return tuple(self._fix_mistakes(self._parse(drop_unfinished_node(ex.partial_output))))
+
+    def _translate_uncached(self, expr: str) -> tuple[MecabParsedToken, ...]:
+        if self._disk_cache and (tokens := self._disk_cache.get(escape_text(expr))) is not None:
+            return tokens
+        tokens = tuple(self._translate(expr))
+        if self._disk_cache:
+            self._disk_cache.put(escape_text(expr), tokens)
+        return tokens
+
+    def translate_many(self, exprs: Iterable[str]) -> list[Sequence[MecabParsedToken]]:
+        """
+        Same as translate(), but for many expressions at once.
+        Expressions that aren't cached yet are sent to mecab in one batch.
+        """
+        exprs = list(exprs)
+        results: dict[str, Sequence[MecabParsedToken]] = {}
+        for expr in exprs:
+            try:
+                results[expr] = self._cache[expr]
+            except KeyError:
+                pass
+        missing = {expr: escape_text(expr) for expr in exprs if expr not in results}
+        if missing and self._disk_cache:
+            stored = self._disk_cache.get_many(missing.values())
+            for expr, escaped in list(missing.items()):
+                if escaped in stored:
+                    results[expr] = self._cache.setdefault(expr, stored[escaped])
+                    del missing[expr]
+        if missing:
+            # Only the text before each footer is a complete answer.
+            # Whatever follows the last footer is the unfinished answer to the next expression, if any.
+            try:
+                output = self._mecab.run_many(list(missing.values()))
+            except MecabNoAnswer as ex:
+                output = ex.partial_output
+            answers = output.split(Separators.footer)[:-1]
+            parsed = {}
+            for (expr, escaped), answer in zip(missing.items(), answers):
+                parsed[escaped] = results[expr] = tuple(self._fix_mistakes(self._parse(answer)))
+            # If mecab was cut off, nothing from this run is cached, in case its output was damaged.
+            if len(answers) == len(missing):
+                for expr, escaped in missing.items():
+                    results[expr] = self._cache.setdefault(expr, parsed[escaped])
+                if self._disk_cache:
+                    self._disk_cache.put_many(parsed)
+        # Expressions that mecab didn't answer in time are analyzed one by one.
+        return [results[expr] if expr in results else self.translate(expr) for expr in exprs]
 
     def _translate(self, expr: str) -> Iterable[MecabParsedToken]:
         """Analyzes expr with mecab. Fixes mecab's mistakes. Returns a parsed token for each word in expr."""
-        for token in replace_mistakes(self._analyze(expr)):
+        return self._fix_mistakes(self._analyze(expr))
+
+    def _fix_mistakes(self, tokens: Iterable[MecabParsedToken]) -> Iterable[MecabParsedToken]:
+        for token in replace_mistakes(tokens):
             if self._verbose:
                 print(*dataclasses.astuple(token), sep="\t")
             yield token
 
     def _analyze(self, expr: str) -> Iterable[MecabParsedToken]:
         """Analyzes expr with mecab. Returns a parsed token for each word in expr."""
-        for section in self._mecab.run(escape_text(expr)).split(Separators.node):
+        return self._parse(self._mecab.run(escape_text(expr)))
+
+    def _parse(self, mecab_output: str) -> Iterable[MecabParsedToken]:
+        """Returns a parsed token for each word in mecab's output."""
+        for section in mecab_output.split(Separators.node):
             if not section:
                 # ignore empty sections (can be at the end of a node)
                 continue
@@ -5,6 +5,7 @@ import functools
 import os
 import shutil
 import sys
+from typing import Optional
 
 IS_MAC = sys.platform.startswith("darwin")
 IS_WIN = sys.platform.startswith("win32")
@@ -43,3 +44,24 @@ def find_executable(name: str) -> str:
     Otherwise, use the executable provided in the support directory.
     """
     return shutil.which(name) or get_bundled_executable(name)
+
+
+@functools.cache
+def support_lib_name() -> str:
+    """
+    The mecab library file in the "support" dir has a different name depending on the platform.
+    """
+    if IS_WIN:
+        return "libmecab.dll"
+    elif IS_MAC:
+        return "libmecab.2.dylib"
+    else:
+        return "libmecab.so.1"
+
+
+def find_bundled_library() -> Optional[str]:
+    """
+    Get path to the mecab library in the bundled "support" folder, if it's there.
+    """
+    path_to_lib = os.path.join(SUPPORT_DIR, support_lib_name())
+    return path_to_lib if os.path.isfile(path_to_lib) else None
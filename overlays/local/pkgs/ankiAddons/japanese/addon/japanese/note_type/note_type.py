@@ -18,7 +18,7 @@ from ..ajt_common.model_utils import (
 from ..config_view import config_view as cfg
 from ..helpers.consts import ADDON_NAME
 from ..helpers.profiles import ProfileFurigana
-from ..tasks import note_type_matches
+from ..tasks import profile_index
 from .bundled_files import BUNDLED_CSS_FILE, BundledCSSFile, get_file_version
 from .files_in_col_media import FileInCollection, find_ajt_scripts_in_collection
 from .imports import ensure_css_imported, ensure_js_imported
@@ -60,8 +60,8 @@ def is_relevant_model(model_dict: Optional[AnkiNoteTypeDict]) -> bool:
     assert model_dict, "model dict must not be None"
     all_field_names = field_names_from_model_dict(model_dict)
     return any(
-        note_type_matches(model_dict, profile) and profile.source in all_field_names
-        for profile in cfg.iter_profiles()
+        profile.source in all_field_names
+        for profile in profile_index.find(model_dict)
         if isinstance(profile, ProfileFurigana)
     )
 
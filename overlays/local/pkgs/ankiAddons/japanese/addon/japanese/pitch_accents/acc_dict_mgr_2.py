@@ -3,20 +3,23 @@
 import collections
 import os
 import pathlib
+import sqlite3
 import typing
 
 from aqt import mw
 from aqt.operations import QueryOp
 
+from ..database.bundled_pitch_db import build_bundled_pitch_db
+from ..database.pitch_buddy import to_reading_key
 from ..database.sqlite3_buddy import Sqlite3Buddy
 from ..helpers.file_ops import rm_file, touch
 from ..mecab_controller.kana_conv import to_katakana
-from ..mecab_controller.unify_readings import literal_pronunciation as pr
 from .common import (
     AccDictProvider,
     AccDictRawTSVEntry,
     AccentDict,
     FormattedEntry,
+    ProgressCallback,
     get_tsv_reader,
 )
 from .consts import (
@@ -25,6 +28,7 @@ from .consts import (
     RES_DIR_PATH,
     USER_DATA_CSV_PATH,
 )
+from .memory_index import PitchAccentMemoryIndex, pitch_memory_index
 from .user_accents import iter_user_formatted_rows
 
 
@@ -61,8 +65,20 @@ class SqliteAccDictWriter:
     def write_user_rows(self, rows: typing.Iterable[AccDictRawTSVEntry]) -> None:
         return self._db.insert_pitch_accent_data(rows, AccDictProvider.user)
 
-    def fill_bundled_data(self) -> None:
-        return self.write_rows(iter_formatted_rows(self._bundled_tsv_file))
+    def is_bundled_data_attached(self) -> bool:
+        return self._db.has_bundled_pitch_accents()
+
+    def fill_bundled_data(self, progress: typing.Optional[ProgressCallback] = None) -> None:
+        """
+        Build the read-only file with the bundled pitch accents and attach it.
+        Normally it is shipped with the add-on, so this is only needed if the shipped file is missing or outdated.
+        """
+        build_bundled_pitch_db(
+            self._bundled_tsv_file,
+            self._db.bundled_pitch_db_candidates()[-1],
+            progress,
+        )
+        self._db.reattach_bundled_pitch_accents()
 
     def clear_user_data(self) -> None:
         self._db.clear_pitch_accents(AccDictProvider.user)
@@ -70,6 +86,34 @@ class SqliteAccDictWriter:
     def fill_user_data(self) -> None:
         return self.write_user_rows(iter_user_formatted_rows(self._user_accents_file))
 
+    def update_user_data(self) -> frozenset[str]:
+        """
+        Bring the user's rows in the database in line with the user's file.
+        Only rows that were added or removed in the file are written.
+        Return the headwords and readings of the changed rows, i.e. the lookups whose results may have changed.
+        """
+        file_rows = collections.Counter(
+            (row["headword"], row["raw_headword"], row["katakana_reading"], row["html_notation"], row["pitch_number"])
+            + (int(row["frequency"]),)
+            for row in iter_user_formatted_rows(self._user_accents_file)
+        )
+        delete_rowids: list[int] = []
+        changed_rows = []
+        for db_row in self._db.get_pitch_accent_rows(AccDictProvider.user):
+            row = tuple(db_row[key] for key in self._db.PITCH_ROW_KEYS)
+            if file_rows[row] > 0:
+                # The row hasn't changed.
+                file_rows[row] -= 1
+            else:
+                delete_rowids.append(db_row["rowid"])
+                changed_rows.append(row)
+        insert_rows = list(file_rows.elements())
+        changed_rows.extend(insert_rows)
+        if changed_rows:
+            self._db.update_pitch_accent_rows(delete_rowids, insert_rows, AccDictProvider.user)
+        print(f"Updated user pitch accents: {len(delete_rowids)} removed, {len(insert_rows)} added.")
+        return frozenset(key for row in changed_rows for key in (row[0], row[2]))
+
     def clear_table(self) -> None:
         self._db.clear_pitch_accents_table()
         self.mark_table_old()
@@ -88,14 +132,15 @@ class SqliteAccDictWriter:
         print("Marked pitch accent data as up to date.")
 
     def is_db_ready(self) -> bool:
-        return self.is_table_filled() and self.is_table_up_to_date()
+        return self.is_bundled_data_attached() and self.is_table_filled() and self.is_table_up_to_date()
 
-    def ensure_sqlite_populated(self) -> None:
+    def ensure_sqlite_populated(self, progress: typing.Optional[ProgressCallback] = None) -> None:
         if self.is_db_ready():
             return
         print("The pitch accent table needs updating.")
         self.clear_table()
-        self.fill_bundled_data()
+        if not self.is_bundled_data_attached():
+            self.fill_bundled_data(progress)
         self.fill_user_data()
         self.mark_table_updated()
 
@@ -112,32 +157,79 @@ def iter_formatted_rows(tsv_file_path: pathlib.Path) -> typing.Iterable[AccDictR
         yield from get_tsv_reader(f)
 
 
-def filter_entries(entries: typing.Sequence[FormattedEntry], kana_reading: str) -> typing.Iterable[FormattedEntry]:
-    return (
-        entry
-        for entry in entries
-        # if there's furigana, and it doesn't match the entry, skip.
-        if not kana_reading or pr(entry.katakana_reading) == pr(kana_reading)
-    )
-
-
-def extend_acc_dict(
-    ret: AccentDict,
-    headword: str,
-    entries: typing.Sequence[FormattedEntry],
-    expr_reading: str,
-) -> None:
-    ret.setdefault(headword, []).extend(filter_entries(entries, expr_reading))
+# Search results keyed by the selected columns and the searched word.
+PrefetchedPitchAccents = dict[tuple[tuple[str, ...], str], typing.Sequence[sqlite3.Row]]
 
 
 class SqliteAccDictReader:
     _db: Sqlite3Buddy
+    _prefetched: typing.Optional[PrefetchedPitchAccents]
+
+    GROUPED_RETRIEVE_KEYS = ("headword", *Sqlite3Buddy.PITCH_RETRIEVE_KEYS)
 
-    def __init__(self, db: Sqlite3Buddy, group_by_headword: bool = False) -> None:
+    def __init__(
+        self,
+        db: Sqlite3Buddy,
+        group_by_headword: bool = False,
+        prefetched: typing.Optional[PrefetchedPitchAccents] = None,
+    ) -> None:
         self._db = db
         self._group_by_headword = group_by_headword
+        self._prefetched = prefetched
+
+    def _memory_index_for(self, word: str) -> typing.Optional[PitchAccentMemoryIndex]:
+        """
+        Return the in-memory index if it can answer the search for the word.
+        The index only contains the bundled pitch accents, so words that the user has overridden go to sqlite.
+        """
+        index = pitch_memory_index.get(self._db.attached_bundled_pitch_db())
+        if index is not None and word not in self._db.get_user_pitch_words():
+            return index
+        return None
+
+    def prefetch(self, exprs: typing.Iterable[str]) -> PrefetchedPitchAccents:
+        """
+        Search all expressions in one query.
+        Pass the result to the readers that will look them up later.
+        Words that can be found in the in-memory index are skipped.
+        """
+        select_keys = self.GROUPED_RETRIEVE_KEYS if self._group_by_headword else Sqlite3Buddy.PITCH_RETRIEVE_KEYS
+        words = (word for expr in exprs if not self._memory_index_for(word := to_katakana(expr)))
+        return {
+            (select_keys, word): rows
+            for word, rows in self._db.search_pitch_accents_many(
+                words,
+                prefer_provider_name=AccDictProvider.user,
+                select_keys=select_keys,
+            ).items()
+        }
+
+    def _search(
+        self, word: str, select_keys: typing.Sequence[str], reading_key: str = ""
+    ) -> typing.Sequence[sqlite3.Row]:
+        if self._prefetched is not None:
+            try:
+                rows = self._prefetched[(tuple(select_keys), word)]
+            except KeyError:
+                pass
+            else:
+                # Prefetched rows are the same for all readings. Compare the precomputed keys.
+                return [row for row in rows if row["reading_key"] == reading_key] if reading_key else rows
+        return self._db.search_pitch_accents(
+            word,
+            prefer_provider_name=AccDictProvider.user,
+            select_keys=select_keys,
+            reading_key=reading_key,
+        )
 
-    def look_up(self, expr: str) -> list[FormattedEntry]:
+    def look_up(self, expr: str, reading: str = "") -> list[FormattedEntry]:
+        """
+        Look up entries whose headword or reading is equal to expr.
+        If the reading is given, e.g. from furigana, skip entries whose reading sounds different.
+        """
+        word, key = to_katakana(expr), (to_reading_key(reading) if reading else "")
+        if index := self._memory_index_for(word):
+            return list(dict.fromkeys(entry for _headword, entry in index.search(word, key)))
         return [
             FormattedEntry(
                 raw_headword=row["raw_headword"],
@@ -145,16 +237,17 @@ class SqliteAccDictReader:
                 html_notation=row["html_notation"],
                 pitch_number=row["pitch_number"],
             )
-            for row in self._db.search_pitch_accents(to_katakana(expr), prefer_provider_name=AccDictProvider.user)
+            for row in self._search(word, Sqlite3Buddy.PITCH_RETRIEVE_KEYS, key)
         ]
 
-    def look_up_grouped(self, expr: str) -> AccentDict:
+    def look_up_grouped(self, expr: str, reading: str = "") -> AccentDict:
         headword_to_entries: collections.defaultdict[str, list[FormattedEntry]] = collections.defaultdict(list)
-        for row in self._db.search_pitch_accents(
-            to_katakana(expr),
-            prefer_provider_name=AccDictProvider.user,
-            select_keys=("headword", *Sqlite3Buddy.PITCH_RETRIEVE_KEYS),
-        ):
+        word, key = to_katakana(expr), (to_reading_key(reading) if reading else "")
+        if index := self._memory_index_for(word):
+            for headword, entry in dict.fromkeys(index.search(word, key)):
+                headword_to_entries[headword].append(entry)
+            return headword_to_entries
+        for row in self._search(word, self.GROUPED_RETRIEVE_KEYS, key):
             headword_to_entries[row["headword"]].append(
                 FormattedEntry(
                     raw_headword=row["raw_headword"],
@@ -165,6 +258,22 @@ class SqliteAccDictReader:
             )
         return headword_to_entries
 
+    def look_up_prefix(
+        self,
+        prefix: str,
+        limit: int,
+        is_cancelled: typing.Optional[typing.Callable[[], bool]] = None,
+    ) -> AccentDict:
+        """
+        Look up words whose headword or reading starts with the prefix, the most frequent first.
+        At most `limit` headwords are returned.
+        """
+        acc_dict: AccentDict = {}
+        for headword in self._db.search_pitch_accent_headwords(to_katakana(prefix), limit, is_cancelled):
+            if entries := self.look_up_grouped(headword).get(headword):
+                acc_dict[headword] = entries
+        return acc_dict
+
     def look_up_and_extend(self, acc_dict: AccentDict, expr: str, expr_reading: str = "") -> None:
         if self._group_by_headword:
             self._handle_grouped_lookup(acc_dict, expr, expr_reading)
@@ -172,13 +281,31 @@ class SqliteAccDictReader:
             self._handle_direct_lookup(acc_dict, expr, expr_reading)
 
     def _handle_grouped_lookup(self, acc_dict: AccentDict, expr: str, expr_reading: str) -> None:
-        if lookup_result := self.look_up_grouped(expr):
+        if lookup_result := self.look_up_grouped(expr, expr_reading):
             for headword, entries in lookup_result.items():
-                extend_acc_dict(acc_dict, headword, entries, expr_reading)
+                acc_dict.setdefault(headword, []).extend(entries)
+        elif expr_reading:
+            # The word may be known with other readings. Then it is added without entries,
+            # so that the caller doesn't go on to search other words.
+            for headword in self.look_up_grouped(expr):
+                acc_dict.setdefault(headword, [])
 
     def _handle_direct_lookup(self, acc_dict: AccentDict, expr: str, expr_reading: str) -> None:
-        if entries := self.look_up(expr):
-            extend_acc_dict(acc_dict, expr, entries, expr_reading)
+        if entries := self.look_up(expr, expr_reading):
+            acc_dict.setdefault(expr, []).extend(entries)
+        elif expr_reading and self.look_up(expr):
+            acc_dict.setdefault(expr, [])
+
+
+def report_reload_progress(done: int, total: int) -> None:
+    assert mw
+    mw.taskman.run_on_main(
+        lambda: mw.progress.update(
+            label=f"Reloading pitch accent dictionary... {done * 100 // max(total, 1)}%",
+            value=done,
+            max=total,
+        )
+    )
 
 
 class AccentDictManager2:
@@ -190,16 +317,19 @@ class AccentDictManager2:
     _db_path: typing.Optional[pathlib.Path] = None
     _upd_file: typing.Optional[pathlib.Path] = None
     _user_accents_file: typing.Optional[pathlib.Path] = None
+    _use_memory_index: bool = False
 
     def __init__(
         self,
         db_path: typing.Optional[pathlib.Path] = None,
         upd_file_path: typing.Optional[pathlib.Path] = None,
         user_accents_path: typing.Optional[pathlib.Path] = None,
+        use_memory_index: bool = False,
     ) -> None:
         self._db_path = db_path or self._db_path
         self._upd_file = upd_file_path or self._upd_file
         self._user_accents_file = user_accents_path or self._user_accents_file
+        self._use_memory_index = use_memory_index
 
     def mk_writer(self, db: Sqlite3Buddy):
         return SqliteAccDictWriter(db, upd_file=self._upd_file, user_accents_file=self._user_accents_file)
@@ -221,7 +351,10 @@ class AccentDictManager2:
     def _ensure_sqlite_populated_op(self) -> None:
         with Sqlite3Buddy(self._db_path) as db:
             writer = self.mk_writer(db)
-            writer.ensure_sqlite_populated()
+            writer.ensure_sqlite_populated(progress=(report_reload_progress if mw else None))
+            if self._use_memory_index:
+                # Lookups keep using sqlite until the index is ready.
+                pitch_memory_index.build_in_background(db.attached_bundled_pitch_db())
 
     def ensure_dict_ready(self) -> None:
         """
@@ -244,26 +377,30 @@ class AccentDictManager2:
         assert not mw
         self._ensure_sqlite_populated_op()
 
-    def _reload_user_accents_from_disk_op(self) -> None:
+    def _reload_user_accents_from_disk_op(self) -> frozenset[str]:
         """
-        Clear all user-defined pitch accent data, then read the rows from the updated CSV file.
+        Apply the changes made to the user's CSV file to the user-defined pitch accent data.
+        Return the headwords and readings whose pitch accents have changed.
         """
         with Sqlite3Buddy(self._db_path) as db:
             writer = self.mk_writer(db)
-            writer.clear_user_data()
-            writer.fill_user_data()
+            return writer.update_user_data()
 
-    def reload_user_accents_from_disk(self) -> None:
+    def reload_user_accents_from_disk(
+        self,
+        on_done: typing.Optional[typing.Callable[[frozenset[str]], None]] = None,
+    ) -> None:
         """
         If the user has edited the override table,
         the table needs to be re-read into the database.
+        on_done receives the headwords and readings that have changed, e.g. to drop cached lookups.
         """
         assert mw
 
         QueryOp(
             parent=mw,
             op=lambda collection: self._reload_user_accents_from_disk_op(),
-            success=lambda _: None,
+            success=lambda changed: on_done and on_done(changed),
         ).without_collection().with_progress(
             "Reloading pitch accent dictionary...",
         ).run_in_background()
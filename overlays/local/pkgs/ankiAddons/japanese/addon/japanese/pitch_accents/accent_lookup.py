@@ -1,7 +1,10 @@
 # Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import contextlib
+import threading
 import typing
 from collections import OrderedDict
+from collections.abc import Collection, Iterable, Sequence
 from typing import Optional
 
 from aqt import mw
@@ -10,9 +13,10 @@ from ..config_view import JapaneseConfig
 from ..database.sqlite3_buddy import Sqlite3Buddy
 from ..helpers.mingle_readings import split_possible_furigana
 from ..helpers.tokens import split_separators
-from ..mecab_controller import MecabController
-from ..mecab_controller.lru_cache import LRUCache
-from .acc_dict_mgr_2 import SqliteAccDictReader
+from ..mecab_controller import MecabController, to_katakana
+from ..mecab_controller.basic_types import MecabParsedToken
+from ..mecab_controller.lru_cache import CacheStats, LRUCache
+from .acc_dict_mgr_2 import PrefetchedPitchAccents, SqliteAccDictReader
 from .common import AccentDict
 
 
@@ -34,17 +38,56 @@ class LookupKeyTuple(typing.NamedTuple):
     group_by_headword: bool
 
 
+class CachedAccents(typing.NamedTuple):
+    accents: AccentDict
+    # Words that were searched in the database to produce the result (as katakana).
+    # The result may change if rows with these headwords or readings change.
+    lookup_words: frozenset[str]
+
+
 class AccentLookup:
     _cfg: JapaneseConfig
     _mecab: MecabController
     _db: Optional[Sqlite3Buddy]
-    _cache: LRUCache[LookupKeyTuple, AccentDict] = LRUCache()
+    _prefetched: PrefetchedPitchAccents
+    _cache: LRUCache[LookupKeyTuple, CachedAccents] = LRUCache()
+    # Each thread keeps a stack of sets that collect the words searched by the lookups being computed.
+    _lookup_words = threading.local()
 
     def __init__(self, cfg: JapaneseConfig, mecab: MecabController, db: Optional[Sqlite3Buddy] = None) -> None:
         self._db = db
         self._cfg = cfg
         self._mecab = mecab
+        self._prefetched = {}
         self._cache.set_capacity(cfg.cache_lookups)
+        self._cache.set_max_bytes(cfg.cache_lookups_mb * 1024 * 1024)
+
+    @classmethod
+    def cache_stats(cls) -> CacheStats:
+        return cls._cache.stats()
+
+    @classmethod
+    def invalidate(cls, words: Collection[str]) -> int:
+        """
+        Drop cached results that depend on any of the words (headwords or readings).
+        Return the number of dropped results.
+        """
+        words = frozenset(to_katakana(word) for word in words)
+        if not words:
+            return 0
+        return cls._cache.discard_if(lambda _key, cached: not cached.lookup_words.isdisjoint(words))
+
+    def _lookup_words_stack(self) -> list[set[str]]:
+        try:
+            return self._lookup_words.stack
+        except AttributeError:
+            stack = self._lookup_words.stack = []
+            return stack
+
+    def _note_lookup_words(self, words: Collection[str]) -> None:
+        """Record that the result being computed depends on the words."""
+        if stack := self._lookup_words_stack():
+            stack[-1].update(words)
 
     @property
     def mecab(self) -> MecabController:
@@ -72,20 +115,91 @@ class AccentLookup:
         use_mecab: bool = True,
         group_by_headword: bool = False,
     ) -> AccentDict:
-        key = LookupKeyTuple(expr, sanitize, recurse, use_mecab, group_by_headword)
-        try:
-            return self._cache[key]
-        except KeyError:
-            return self._cache.setdefault(
-                key,
-                self._get_pronunciations(
+        cached = self._cache.get_or_compute(
+            LookupKeyTuple(expr, sanitize, recurse, use_mecab, group_by_headword),
+            lambda: self._compute_pronunciations(
+                expr,
+                sanitize=sanitize,
+                recurse=recurse,
+                use_mecab=use_mecab,
+                group_by_headword=group_by_headword,
+            ),
+        )
+        # If this lookup is a part of a larger one, the larger one depends on the same words.
+        self._note_lookup_words(cached.lookup_words)
+        return cached.accents
+
+    def get_pronunciations_many(
+        self,
+        exprs: Iterable[str],
+        *,
+        sanitize: bool = True,
+        recurse: bool = True,
+        use_mecab: bool = True,
+        group_by_headword: bool = False,
+    ) -> list[AccentDict]:
+        """
+        Same as get_pronunciations() for each expression,
+        but the expressions that aren't cached are searched in the database with one query.
+        """
+        exprs = list(exprs)
+        uncached = [
+            expr
+            for expr in exprs
+            if LookupKeyTuple(expr, sanitize, recurse, use_mecab, group_by_headword) not in self._cache
+        ]
+        with self._prefetch(uncached, sanitize=sanitize, group_by_headword=group_by_headword):
+            return [
+                self.get_pronunciations(
                     expr,
                     sanitize=sanitize,
                     recurse=recurse,
                     use_mecab=use_mecab,
                     group_by_headword=group_by_headword,
-                ),
-            )
+                )
+                for expr in exprs
+            ]
+
+    def _searchable_expr(self, expr: str, sanitize: bool) -> str:
+        """Prepare the expression the same way _get_pronunciations() does before searching it."""
+        if sanitize:
+            expr = html_to_text_line(expr)
+        expr, _expr_reading = split_possible_furigana(expr, self._cfg.furigana.reading_separator)
+        if not expr or self._cfg.pitch_accent.is_blocklisted(expr):
+            return ""
+        return to_katakana(expr)
+
+    @contextlib.contextmanager
+    def _prefetch(self, exprs: Iterable[str], *, sanitize: bool, group_by_headword: bool):
+        """
+        Search the expressions in one query and let the lookups made inside the block use the results.
+        The results are discarded when the block ends, so they never get stale.
+        """
+        words = [word for expr in exprs if (word := self._searchable_expr(expr, sanitize))]
+        found = SqliteAccDictReader(self.db, group_by_headword=group_by_headword).prefetch(words) if words else {}
+        added = found.keys() - self._prefetched.keys()
+        self._prefetched.update((key, found[key]) for key in added)
+        try:
+            yield
+        finally:
+            for key in added:
+                del self._prefetched[key]
+
+    def _compute_pronunciations(self, expr: str, **kwargs) -> CachedAccents:
+        words: set[str] = set()
+        stack = self._lookup_words_stack()
+        stack.append(words)
+        try:
+            accents = self._get_pronunciations(expr, **kwargs)
+        finally:
+            stack.pop()
+        return CachedAccents(accents, frozenset(words))
+
+    def _look_up_and_extend(
+        self, reader: SqliteAccDictReader, ret: AccentDict, expr: str, expr_reading: str = ""
+    ) -> None:
+        self._note_lookup_words((to_katakana(expr),))
+        reader.look_up_and_extend(ret, expr, expr_reading)
 
     def _get_pronunciations(
         self,
@@ -116,10 +230,10 @@ class AccentLookup:
         if not expr or self._cfg.pitch_accent.is_blocklisted(expr):
             return ret
 
-        reader = SqliteAccDictReader(self.db, group_by_headword=group_by_headword)
+        reader = SqliteAccDictReader(self.db, group_by_headword=group_by_headword, prefetched=self._prefetched)
 
         # Look up the main expression.
-        reader.look_up_and_extend(ret, expr, expr_reading)
+        self._look_up_and_extend(reader, ret, expr, expr_reading)
 
         # If there's furigana, e.g. when using the VocabFurigana field as the source,
         # or if the kana reading of the full expression can be sourced from mecab,
@@ -127,41 +241,78 @@ class AccentLookup:
         if not ret and self._cfg.pitch_accent.kana_lookups:
             expr_reading = expr_reading or self.single_word_reading(expr)
             if expr_reading:
-                reader.look_up_and_extend(ret, expr_reading)
+                self._look_up_and_extend(reader, ret, expr_reading)
 
         # Try to split the expression in various ways (punctuation, whitespace, etc.),
         # and check if any of those brings results.
         if not ret and recurse:
-            for section in split_separators(expr):
-                ret.update(
-                    self._get_pronunciations_part(
-                        section,
-                        use_mecab=use_mecab,
-                        group_by_headword=group_by_headword,
-                    )
+            ret.update(
+                self._get_pronunciations_parts(
+                    split_separators(expr),
+                    use_mecab=use_mecab,
+                    group_by_headword=group_by_headword,
                 )
+            )
         return ret
 
-    def _get_pronunciations_part(self, expr_part: str, *, use_mecab: bool, group_by_headword: bool) -> AccentDict:
+    def _get_pronunciations_parts(
+        self, expr_parts: Sequence[str], *, use_mecab: bool, group_by_headword: bool
+    ) -> AccentDict:
         """
-        Search pitch accent info (pronunciations) for a part of expression.
-        The part must be already sanitized.
-        (If enabled and) if the part is not present in the accent dictionary, Mecab is used to split it further.
+        Search pitch accent info (pronunciations) for each part of expression.
+        The parts must be already sanitized.
+        (If enabled and) if a part is not present in the accent dictionary, Mecab is used to split it further.
+        All parts that need splitting are sent to Mecab at once.
         """
         ret: AccentDict = OrderedDict()
-        # Sanitize is always set to False because the part must be already sanitized.
-        ret.update(
-            self.get_pronunciations(
-                expr_part,
-                sanitize=False,
-                recurse=False,
-                group_by_headword=group_by_headword,
-            )
+        # Sanitize is always set to False because the parts must be already sanitized.
+        part_results = self.get_pronunciations_many(
+            expr_parts,
+            sanitize=False,
+            recurse=False,
+            group_by_headword=group_by_headword,
         )
 
         # Only if lookups were not successful, we try splitting with Mecab
-        if not ret and use_mecab is True:
-            for out in self._mecab.translate(expr_part):
+        unknown_parts = [part for part, result in zip(expr_parts, part_results) if part and not result]
+        parsed_parts = dict(zip(unknown_parts, self._mecab.translate_many(unknown_parts))) if use_mecab else {}
+
+        # Words of all parts are searched in one query.
+        with self._prefetch_tokens(
+            [out for tokens in parsed_parts.values() for out in tokens],
+            group_by_headword=group_by_headword,
+        ):
+            for expr_part, result in zip(expr_parts, part_results):
+                ret.update(result)
+                if expr_part in parsed_parts:
+                    ret.update(
+                        self._get_pronunciations_tokens(parsed_parts[expr_part], group_by_headword=group_by_headword)
+                    )
+        return ret
+
+    def _prefetch_tokens(self, tokens: Sequence[MecabParsedToken], *, group_by_headword: bool):
+        """Search the headwords and (if enabled) the readings of the tokens in one query."""
+        words = [out.headword for out in tokens]
+        if self._cfg.pitch_accent.kana_lookups is True:
+            words.extend(out.katakana_reading for out in tokens if out.katakana_reading)
+        return self._prefetch(
+            (
+                word
+                for word in dict.fromkeys(words)
+                if LookupKeyTuple(word, False, False, True, group_by_headword) not in self._cache
+            ),
+            sanitize=False,
+            group_by_headword=group_by_headword,
+        )
+
+    def _get_pronunciations_tokens(self, tokens: Sequence[MecabParsedToken], *, group_by_headword: bool) -> AccentDict:
+        """
+        Search pitch accent info (pronunciations) for each word parsed by Mecab.
+        """
+        ret: AccentDict = OrderedDict()
+        # Headwords and readings of all tokens are searched in one query.
+        with self._prefetch_tokens(tokens, group_by_headword=group_by_headword):
+            for out in tokens:
                 # Avoid infinite recursion by saying that we should not try
                 # Mecab again if we do not find any matches for this sub-expression.
                 ret.update(
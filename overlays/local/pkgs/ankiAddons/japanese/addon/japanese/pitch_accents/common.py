@@ -12,6 +12,8 @@ from typing import NamedTuple
 from .consts import NO_ACCENT
 
 Stored = typing.TypeVar("Stored")
+ProgressCallback = typing.Callable[[int, int], None]
+PROGRESS_EVERY_N_ROWS = 10_000
 
 RE_PITCH_NUM = re.compile(r"\d+|\?")
 RE_PITCH_TAG = re.compile(r"(<[^<>]+>)")
@@ -106,3 +108,32 @@ def get_tsv_reader(f: typing.Iterable[str]) -> csv.DictReader:
         delimiter="\t",
         quoting=csv.QUOTE_NONE,
     )
+
+
+def iter_formatted_tuples(
+    tsv_file_path: pathlib.Path,
+    progress: typing.Optional[ProgressCallback] = None,
+) -> typing.Iterable[typing.Sequence[str]]:
+    """
+    Read the formatted pitch accents file row by row, without building a dict for each row.
+    Yields values in the order of AccDictRawTSVEntry.
+    Calls progress(bytes_read, file_size) every PROGRESS_EVERY_N_ROWS rows.
+    """
+    file_size = os.path.getsize(tsv_file_path)
+    bytes_read = 0
+    with open(tsv_file_path, "rb") as f:
+        header = f.readline()
+        bytes_read += len(header)
+        columns = header.decode("utf-8").rstrip("\r\n").split("\t")
+        order = [columns.index(key) for key in AccDictRawTSVEntry.__annotations__]
+        # The bundled file has its columns in the expected order, so the values don't need to be rearranged.
+        reorder = order != list(range(len(order)))
+        for idx, line in enumerate(f, start=1):
+            bytes_read += len(line)
+            if text := line.decode("utf-8").rstrip("\r\n"):
+                values = text.split("\t")
+                yield tuple(values[col] for col in order) if reorder else values
+            if progress and idx % PROGRESS_EVERY_N_ROWS == 0:
+                progress(bytes_read, file_size)
+    if progress:
+        progress(file_size, file_size)
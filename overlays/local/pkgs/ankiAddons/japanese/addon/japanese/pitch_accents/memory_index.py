@@ -0,0 +1,180 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import array
+import pathlib
+import sqlite3
+import sys
+import threading
+from collections.abc import Iterable
+from typing import Optional
+
+from ..database.connection_pool import sqlite3_uri
+from ..database.pitch_buddy import PITCH_SORT_COLUMNS
+from .common import FormattedEntry
+
+# Columns of a record, each stored as an index into the table of strings.
+RECORD_COLUMNS = ("headword", "raw_headword", "katakana_reading", "html_notation", "pitch_number", "reading_key")
+RECORD_WIDTH = len(RECORD_COLUMNS)
+make_entry = FormattedEntry._make
+
+
+class PitchAccentMemoryIndex:
+    """
+    Read-only copy of the bundled pitch accents, kept in memory in a compact form.
+    Each distinct string is stored once. Records are rows of string ids in one flat array.
+    Each headword and reading maps to a range of record ids, in the order in which sqlite would return them.
+    """
+
+    __slots__ = ("source", "_strings", "_records", "_word_slots", "_offsets", "_postings")
+
+    source: pathlib.Path
+    _strings: tuple[str, ...]
+    _records: array.array
+    _word_slots: dict[str, int]
+    _offsets: array.array
+    _postings: array.array
+
+    def __init__(
+        self,
+        source: pathlib.Path,
+        strings: tuple[str, ...],
+        records: array.array,
+        word_slots: dict[str, int],
+        offsets: array.array,
+        postings: array.array,
+    ) -> None:
+        self.source = source
+        self._strings = strings
+        self._records = records
+        self._word_slots = word_slots
+        self._offsets = offsets
+        self._postings = postings
+
+    @classmethod
+    def from_db(cls, bundled_db_path: pathlib.Path) -> "PitchAccentMemoryIndex":
+        """
+        Read the pitch accents from the read-only file with the bundled pitch accents.
+        """
+        con = sqlite3.connect(sqlite3_uri(bundled_db_path, mode="ro", immutable="1"), uri=True)
+        try:
+            # Same order as in search_pitch_accents().
+            rows = con.execute(f"""
+            SELECT {', '.join(RECORD_COLUMNS)} FROM pitch_accents_formatted
+            ORDER BY {', '.join(PITCH_SORT_COLUMNS)};
+            """)
+            return cls.from_rows(bundled_db_path, rows)
+        finally:
+            con.close()
+
+    @classmethod
+    def from_rows(cls, source: pathlib.Path, rows: Iterable[tuple[str, ...]]) -> "PitchAccentMemoryIndex":
+        """
+        Build the index from rows that are already sorted.
+        """
+        string_ids: dict[str, int] = {}
+        records = array.array("I")
+        word_to_records: dict[str, list[int]] = {}
+        for record_id, row in enumerate(rows):
+            for value in row:
+                records.append(string_ids.setdefault(value, len(string_ids)))
+            headword, _raw_headword, katakana_reading = row[:3]
+            word_to_records.setdefault(headword, []).append(record_id)
+            if katakana_reading != headword:
+                word_to_records.setdefault(katakana_reading, []).append(record_id)
+        strings = tuple(sys.intern(value) for value in string_ids)
+        word_slots: dict[str, int] = {}
+        offsets = array.array("I", [0])
+        postings = array.array("I")
+        for word, record_ids in word_to_records.items():
+            word_slots[strings[string_ids[word]]] = len(word_slots)
+            postings.extend(record_ids)
+            offsets.append(len(postings))
+        return cls(source, strings, records, word_slots, offsets, postings)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._word_slots
+
+    def __len__(self) -> int:
+        return len(self._records) // RECORD_WIDTH
+
+    def search(self, word: str, reading_key: str = "") -> list[tuple[str, FormattedEntry]]:
+        """
+        Return the headword and the entry of each record whose headword or reading is equal to word.
+        If a reading key is given, skip records whose reading has a different key.
+        Records are sorted by frequency like in sqlite, but duplicates aren't removed.
+        """
+        try:
+            slot = self._word_slots[word]
+        except KeyError:
+            return []
+        strings, records = self._strings, self._records
+        found = []
+        for record_id in self._postings[self._offsets[slot] : self._offsets[slot + 1]]:
+            start = record_id * RECORD_WIDTH
+            headword, raw_headword, katakana_reading, html_notation, pitch_number, record_key = records[
+                start : start + RECORD_WIDTH
+            ]
+            if reading_key and strings[record_key] != reading_key:
+                continue
+            # FormattedEntry(...) with keywords is noticeably slower, and this is the hot path.
+            found.append((
+                strings[headword],
+                make_entry(
+                    (strings[raw_headword], strings[katakana_reading], strings[html_notation], strings[pitch_number])
+                ),
+            ))
+        return found
+
+
+class PitchAccentMemoryIndexHolder:
+    """
+    Holds the in-memory index of the bundled pitch accents.
+    The index is built in a background thread and swapped in at once when it is ready.
+    Until then, lookups go to sqlite.
+    """
+
+    _index: Optional[PitchAccentMemoryIndex]
+    _building: Optional[pathlib.Path]
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        self._index = None
+        self._building = None
+        self._lock = threading.Lock()
+
+    def get(self, bundled_db_path: Optional[pathlib.Path]) -> Optional[PitchAccentMemoryIndex]:
+        """
+        Return the index if it was built from the file that is attached to the database.
+        """
+        index = self._index
+        if index is not None and bundled_db_path is not None and index.source == bundled_db_path:
+            return index
+        return None
+
+    def build(self, bundled_db_path: pathlib.Path) -> None:
+        with self._lock:
+            if self.get(bundled_db_path) or self._building == bundled_db_path:
+                return
+            self._building = bundled_db_path
+        try:
+            index = PitchAccentMemoryIndex.from_db(bundled_db_path)
+        except sqlite3.Error as ex:
+            print(f"Couldn't build the in-memory pitch accent index: {ex}")
+            return
+        finally:
+            with self._lock:
+                self._building = None
+        # Replacing the reference is atomic. Readers see either the old index or the new one.
+        self._index = index
+        print(f"Built the in-memory pitch accent index: {len(index)} records.")
+
+    def build_in_background(self, bundled_db_path: Optional[pathlib.Path]) -> None:
+        if bundled_db_path is None or self.get(bundled_db_path):
+            return
+        threading.Thread(target=self.build, args=(bundled_db_path,), daemon=True).start()
+
+    def clear(self) -> None:
+        self._index = None
+
+
+pitch_memory_index = PitchAccentMemoryIndexHolder()
@@ -0,0 +1,47 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import enum
+from collections.abc import Callable, Hashable
+
+from ..mecab_controller.lru_cache import CacheStats, LRUCache
+from .common import FormattedEntry
+
+RENDER_CACHE_CAPACITY = 10_000
+RENDER_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+
+class PitchRenderCache:
+    """
+    Remembers the HTML and SVG notation of pitch accent entries.
+    The style options are part of the key, so a change in the config makes older results unreachable,
+    and they are evicted eventually.
+    """
+
+    _cache: LRUCache[tuple[FormattedEntry, enum.Enum, Hashable], str]
+
+    def __init__(self, capacity: int = RENDER_CACHE_CAPACITY, max_bytes: int = RENDER_CACHE_MAX_BYTES) -> None:
+        self._cache = LRUCache(capacity=capacity, max_bytes=max_bytes)
+
+    def get_or_render(
+        self,
+        entry: FormattedEntry,
+        output_format: enum.Enum,
+        style: Hashable,
+        render: Callable[[], str],
+    ) -> str:
+        key = (entry, output_format, style)
+        try:
+            return self._cache[key]
+        except KeyError:
+            # Rendering is cheap and has no side effects.
+            # If two threads render the same entry at once, both results are equal.
+            return self._cache.setdefault(key, render())
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> CacheStats:
+        return self._cache.stats()
+
+    def __len__(self) -> int:
+        return len(self._cache)
@@ -153,6 +153,12 @@ class SvgPitchGraphMaker:
     def __init__(self, options: SvgPitchGraphOptionsConfigView) -> None:
         self._opts = options
 
+    def options_key(self) -> tuple:
+        """
+        A snapshot of the current options. Graphs made with equal snapshots are equal.
+        """
+        return tuple(self._opts.config.items())
+
     def make_circle(self, pos: Point, is_trailing: bool = False) -> str:
         """
         Create a circle that is positioned where two lines touch.
@@ -8,7 +8,9 @@ from aqt import gui_hooks
 
 from .config_view import config_view as cfg
 from .database.sqlite3_buddy import Sqlite3Buddy
+from .database.sqlite_schema import MECAB_CACHE_DB
 from .furigana.gen_furigana import FuriganaGen
+from .helpers.file_ops import user_files_dir
 from .helpers.profiles import ColorCodePitchFormat, PitchOutputFormat
 from .mecab_controller.kana_conv import to_hiragana
 from .mecab_controller.mecab_controller import MecabController
@@ -20,6 +22,7 @@ from .pitch_accents.basic_types import (
     pitch_type_from_pitch_num,
 )
 from .pitch_accents.common import AccentDict, FormattedEntry
+from .pitch_accents.render_cache import PitchRenderCache
 from .pitch_accents.styles import (
     PITCH_COLOR_PLACEHOLDER,
     STYLE_MAP,
@@ -47,17 +50,36 @@ def pitch_color_from_entry(entry: FormattedEntry) -> str:
         return PitchColor.unknown.value
 
 
-def update_html(entry: FormattedEntry, pitch_accent_style: HTMLPitchPatternStyle) -> str:
+def render_html(entry: FormattedEntry, pitch_accent_style: HTMLPitchPatternStyle, output_hiragana: bool) -> str:
     html_notation = convert_to_inline_style(
         entry.html_notation,
         pitch_color=pitch_color_from_entry(entry),
         pitch_accent_style=pitch_accent_style,
     )
-    if cfg.pitch_accent.output_hiragana:
+    if output_hiragana:
         html_notation = to_hiragana(html_notation)
     return html_notation
 
 
+def update_html(entry: FormattedEntry, pitch_accent_style: HTMLPitchPatternStyle) -> str:
+    output_hiragana = cfg.pitch_accent.output_hiragana
+    return render_cache.get_or_render(
+        entry,
+        PitchOutputFormat.html,
+        (pitch_accent_style, output_hiragana),
+        lambda: render_html(entry, pitch_accent_style, output_hiragana),
+    )
+
+
+def make_svg_graph(entry: FormattedEntry) -> str:
+    return render_cache.get_or_render(
+        entry,
+        PitchOutputFormat.svg,
+        svg_graph_maker.options_key(),
+        lambda: svg_graph_maker.make_graph(entry),
+    )
+
+
 def get_notation(entry: FormattedEntry, mode: PitchOutputFormat) -> str:
     if mode == PitchOutputFormat.html:
         return update_html(entry, pitch_accent_style=cfg.pitch_accent.html_style)
@@ -66,7 +88,7 @@ def get_notation(entry: FormattedEntry, mode: PitchOutputFormat) -> str:
     elif mode == PitchOutputFormat.html_and_number:
         return f"{update_html(entry, pitch_accent_style=cfg.pitch_accent.html_style)} {entry.pitch_number_html}"
     elif mode == PitchOutputFormat.svg:
-        return svg_graph_maker.make_graph(entry)
+        return make_svg_graph(entry)
     raise RuntimeError("Unreachable.")
 
 
@@ -128,9 +150,17 @@ def generate_furigana(
 # Entry point
 ##########################################################################
 
-mecab = MecabController(verbose=True, cache_max_size=cfg.cache_lookups)
+MECAB_CACHE_DB.remove_deprecated_files()
+mecab = MecabController(
+    verbose=True,
+    cache_max_size=cfg.cache_lookups,
+    cache_max_bytes=cfg.cache_lookups_mb * 1024 * 1024,
+    disk_cache_path=user_files_dir() / MECAB_CACHE_DB.name,
+    disk_cache_max_size=cfg.mecab_disk_cache_size_mb * 1024 * 1024,
+)
 svg_graph_maker = SvgPitchGraphMaker(options=cfg.svg_graphs)
-acc_dict = AccentDictManager2()
+render_cache = PitchRenderCache()
+acc_dict = AccentDictManager2(use_memory_index=cfg.pitch_memory_index)
 lookup = AccentLookup(cfg, mecab)
 gui_hooks.main_window_did_init.append(acc_dict.ensure_dict_ready)
 fgen = FuriganaGen(cfg, lookup, mecab)
@@ -9,13 +9,12 @@ from typing import Optional
 import anki.collection
 from anki import hooks
 from anki.decks import DeckId
-from anki.models import NotetypeDict
 from anki.notes import Note
 from anki.utils import strip_html_media
 from aqt import mw
 from aqt.utils import tooltip
 
-from .audio import aud_src_mgr, format_audio_tags
+from .audio import aud_src_mgr, audio_file_cache, format_audio_tags
 from .audio_manager.download_results import (
     FileSaveResults,
     calc_tooltip_offset,
@@ -24,6 +23,7 @@ from .audio_manager.download_results import (
 from .config_view import config_view as cfg
 from .database.sqlite3_buddy import Sqlite3Buddy
 from .furigana.gen_furigana import FuriganaGen
+from .helpers.profile_index import ProfileIndex
 from .helpers.profiles import (
     PitchOutputFormat,
     Profile,
@@ -35,17 +35,13 @@ from .helpers.profiles import (
 from .pitch_accents.accent_lookup import AccentLookup
 from .reading import fgen, format_pronunciations, lookup
 
-
-def note_type_matches(note_type: NotetypeDict, profile: Profile) -> bool:
-    return profile.note_type.lower() in note_type["name"].lower()
+profile_index = ProfileIndex(cfg)
 
 
 def iter_tasks(note: Note, src_field: Optional[str] = None) -> Iterable[Profile]:
     note_type = note.note_type()
     assert note_type
-    for profile in cfg.iter_profiles():
-        if note_type_matches(note_type, profile) and (src_field is None or profile.source == src_field):
-            yield profile
+    return profile_index.find(note_type, src_field)
 
 
 class DoTask:
@@ -135,8 +131,10 @@ class AddAudio(DoTask, task_type=ProfileAudio):
         """
         if not self._caller.cfg.audio_download_report:
             return
-        if txt := format_report_results_msg(r):
-            return tooltip(txt, period=7000, y_offset=calc_tooltip_offset(len(r.successes) + len(r.fails)))
+        with_cache_msg = audio_file_cache.is_enabled()
+        if txt := format_report_results_msg(r, with_cache_msg=with_cache_msg):
+            n_lines = len(r.successes) + len(r.fails) + int(with_cache_msg)
+            return tooltip(txt, period=7000, y_offset=calc_tooltip_offset(n_lines))
 
 
 def html_to_media_line(txt: str) -> str:
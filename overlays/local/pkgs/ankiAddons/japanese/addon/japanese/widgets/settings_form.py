@@ -271,6 +271,9 @@ class AudioSettingsForm(MultiColumnSettingsForm):
         self._widgets.attempts = NarrowSpinBox(initial_value=self._config.attempts)
         self._widgets.maximum_results = NarrowSpinBox(initial_value=self._config.maximum_results)
         self._widgets.tag_separator = NarrowLineEdit(self._config.tag_separator)
+        self._widgets.file_cache_size_mb = NarrowSpinBox(
+            initial_value=self._config.file_cache_size_mb, allowed_range=(0, 99_999)
+        )
 
     def _add_tooltips(self) -> None:
         super()._add_tooltips()
@@ -294,6 +297,11 @@ class AudioSettingsForm(MultiColumnSettingsForm):
         self._widgets.tag_separator.setToolTip(
             "Separate [sound:filename.ogg] tags with this string\nwhen adding audio files to cards."
         )
+        self._widgets.file_cache_size_mb.setToolTip(
+            "Keep downloaded audio files on disk, up to this many megabytes,\n"
+            "so that they can be added again without downloading them.\n"
+            "Set to 0 to disable."
+        )
 
 
 class ForvoSettingsForm(SettingsForm):
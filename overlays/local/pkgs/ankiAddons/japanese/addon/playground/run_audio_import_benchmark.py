@@ -0,0 +1,63 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import io
+import json
+import pathlib
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from collections.abc import Callable
+
+from japanese.database.sqlite3_buddy import Sqlite3Buddy
+from japanese.helpers.json_stream import JsonObjectStream
+from tests.test_audio_manager import make_source_index
+
+N_WORDS = 300_000
+
+
+def read_whole(db: Sqlite3Buddy, zip_path: pathlib.Path) -> None:
+    # The way audio sources were imported before.
+    with zipfile.ZipFile(zip_path) as zip_in:
+        db.insert_data("benchmark", json.loads(zip_in.read("index.json")))
+
+
+def read_streaming(db: Sqlite3Buddy, zip_path: pathlib.Path) -> None:
+    with zipfile.ZipFile(zip_path) as zip_in, io.TextIOWrapper(zip_in.open("index.json"), encoding="utf-8") as f:
+        db.insert_sections("benchmark", JsonObjectStream(f).sections())
+
+
+def run_once(fn: Callable[[Sqlite3Buddy, pathlib.Path], None], zip_path: pathlib.Path) -> float:
+    with tempfile.TemporaryDirectory() as tmp_dir, Sqlite3Buddy(pathlib.Path(tmp_dir) / "benchmark.sqlite3") as db:
+        start = time.perf_counter()
+        fn(db, zip_path)
+        return time.perf_counter() - start
+
+
+def measure(name: str, fn: Callable[[Sqlite3Buddy, pathlib.Path], None], zip_path: pathlib.Path) -> None:
+    # tracemalloc slows down every allocation, so time and memory are measured in separate runs.
+    elapsed = run_once(fn, zip_path)
+    tracemalloc.start()
+    run_once(fn, zip_path)
+    _size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name}: {elapsed:.1f} s, peak {peak / 2**20:.1f} MiB")
+
+
+def main() -> None:
+    """
+    Compare the peak memory used by importing an audio source index at once and by streaming it.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        zip_path = pathlib.Path(tmp_dir) / "index.zip"
+        text = json.dumps(make_source_index(N_WORDS), ensure_ascii=False)
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zip_out:
+            zip_out.writestr("index.json", text)
+        print(f"index.json: {len(text.encode()) / 2**20:.1f} MiB, index.zip: {zip_path.stat().st_size / 2**20:.1f} MiB")
+        del text
+        measure("json.loads", read_whole, zip_path)
+        measure("streaming", read_streaming, zip_path)
+
+
+if __name__ == "__main__":
+    main()
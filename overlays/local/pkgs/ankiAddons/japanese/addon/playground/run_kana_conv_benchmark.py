@@ -0,0 +1,58 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import pathlib
+import re
+import time
+from collections.abc import Sequence
+
+from japanese.mecab_controller import MecabController
+from japanese.mecab_controller.kana_conv import (
+    is_hiragana_str,
+    is_kana_str,
+    to_hiragana,
+    to_katakana,
+)
+
+CORPUS_FILE = pathlib.Path(__file__).parent.parent / "tests" / "test_accent_lookup.py"
+N_ROUNDS = 200
+
+
+def token_stream() -> Sequence[tuple[str, str, str]]:
+    """
+    Word, headword and reading of each token that mecab makes from the sentences of the lookup tests.
+    """
+    sentences = list(dict.fromkeys(re.findall(r'"([^"\x00-\x7f][^"]*)"', CORPUS_FILE.read_text(encoding="utf-8"))))
+    mecab = MecabController(verbose=False)
+    return [
+        (token.word, token.headword, token.katakana_reading or token.word)
+        for tokens in mecab.translate_many(sentences)
+        for token in tokens
+    ]
+
+
+def process(tokens: Sequence[tuple[str, str, str]]) -> None:
+    # The same calls that are made for each token when mecab's output is parsed and furigana is generated.
+    for word, headword, reading in tokens:
+        if is_kana_str(word) or to_katakana(word) == to_katakana(reading):
+            continue
+        is_hiragana_str(word)
+        to_hiragana(reading)
+        to_katakana(headword)
+
+
+def main() -> None:
+    """
+    Measure kana classification and conversion over a realistic stream of tokens.
+    """
+    tokens = token_stream()
+    start = time.perf_counter()
+    for _round in range(N_ROUNDS):
+        process(tokens)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{len(tokens)} tokens, {N_ROUNDS} rounds: {elapsed / N_ROUNDS / len(tokens) * 1_000_000_000:.0f} ns per token"
+    )
+
+
+if __name__ == "__main__":
+    main()
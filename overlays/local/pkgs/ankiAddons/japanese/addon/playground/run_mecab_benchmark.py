@@ -0,0 +1,60 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import time
+from collections.abc import Callable, Sequence
+
+from japanese.mecab_controller.basic_mecab_controller import BasicMecabController
+from japanese.mecab_controller.libmecab_controller import (
+    LibMecabController,
+    is_libmecab_available,
+)
+from japanese.mecab_controller.mecab_controller import MecabController
+
+EXPRESSIONS = (
+    "カリン、自分でまいた種は自分で刈り取れ",
+    "昨日、林檎を2個買った。",
+    "彼二千三百六十円も使った。",
+    "昨日すき焼きを食べました",
+    "詳細はお気軽にお問い合わせ下さい。",
+    "随分思い切ったなぁとか思ってたけど",
+    "三色チーズ牛丼の特盛に温玉付きをお願いします",
+    "僕はそれに立ち会ったにすぎません",
+)
+N_ROUNDS = 25
+
+
+def measure(fn: Callable[[str], str], expressions: Sequence[str]) -> float:
+    """Return mean latency of one call in milliseconds."""
+    start = time.perf_counter()
+    for _round in range(N_ROUNDS):
+        for expr in expressions:
+            fn(expr)
+    return (time.perf_counter() - start) * 1000 / (N_ROUNDS * len(expressions))
+
+
+def run_in_new_process(expr: str) -> str:
+    """
+    Start mecab, analyze one expression, then exit.
+    This is what every call used to cost before the mecab process was kept alive.
+    """
+    mecab = BasicMecabController(mecab_args=MecabController._mecab_args)
+    try:
+        return mecab.run(expr)
+    finally:
+        mecab.close()
+
+
+def main() -> None:
+    persistent = BasicMecabController(mecab_args=MecabController._mecab_args)
+    persistent.run("")  # start the process and load the dictionary before measuring.
+    print(f"process per call: {measure(run_in_new_process, EXPRESSIONS):.3f} ms/call")
+    print(f"persistent worker: {measure(persistent.run, EXPRESSIONS):.3f} ms/call")
+    persistent.close()
+    if is_libmecab_available():
+        in_process = LibMecabController(mecab_args=MecabController._mecab_args)
+        print(f"libmecab in-process: {measure(in_process.run, EXPRESSIONS):.3f} ms/call")
+        in_process.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import pathlib
+import re
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Sequence
+
+from japanese.database.sqlite3_buddy import Sqlite3Buddy
+from japanese.mecab_controller import MecabController, to_katakana
+from japanese.pitch_accents.acc_dict_mgr_2 import (
+    AccentDictManager2,
+    SqliteAccDictReader,
+)
+from japanese.pitch_accents.memory_index import (
+    PitchAccentMemoryIndex,
+    pitch_memory_index,
+)
+from tests import DATA_DIR
+
+CORPUS_FILE = pathlib.Path(__file__).parent.parent / "tests" / "test_accent_lookup.py"
+N_ROUNDS = 50
+
+
+def corpus_words() -> Sequence[str]:
+    """
+    Words that are looked up when the sentences from the lookup tests are processed:
+    the sentences themselves and the headwords and readings of their mecab tokens.
+    """
+    sentences = dict.fromkeys(re.findall(r'"([^"\x00-\x7f][^"]*)"', CORPUS_FILE.read_text(encoding="utf-8")))
+    mecab = MecabController(verbose=False)
+    words = dict.fromkeys(to_katakana(sentence) for sentence in sentences)
+    for tokens in mecab.translate_many(list(sentences)):
+        for token in tokens:
+            words[to_katakana(token.headword)] = None
+            if token.katakana_reading:
+                words[token.katakana_reading] = None
+    return list(words)
+
+
+def measure(reader: SqliteAccDictReader, words: Sequence[str]) -> str:
+    """Return the median and the mean time of one lookup in microseconds."""
+    timings = []
+    for word in words:
+        start = time.perf_counter()
+        for _round in range(N_ROUNDS):
+            reader.look_up(word)
+        timings.append((time.perf_counter() - start) / N_ROUNDS * 1_000_000)
+    return f"median {statistics.median(timings):.2f} us, mean {statistics.mean(timings):.2f} us per lookup"
+
+
+def main() -> None:
+    """
+    Compare lookups through sqlite with lookups through the in-memory index.
+    """
+    tmp_dir = tempfile.TemporaryDirectory()
+    db_path = pathlib.Path(tmp_dir.name) / "benchmark.sqlite3"
+    acc_dict = AccentDictManager2(
+        db_path, pathlib.Path(tmp_dir.name) / "benchmark.updated", DATA_DIR / "test_user_accents.tsv"
+    )
+    acc_dict.ensure_dict_ready_on_main()
+    words = corpus_words()
+    with Sqlite3Buddy(db_path) as db:
+        reader = SqliteAccDictReader(db)
+        print(f"{len(words)} words, {N_ROUNDS} rounds")
+        print(f"sqlite: {measure(reader, words)}")
+
+        start = time.perf_counter()
+        tracemalloc.start()
+        index = PitchAccentMemoryIndex.from_db(db.attached_bundled_pitch_db())
+        size, _peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"index: {len(index)} records, built in {time.perf_counter() - start:.2f} s, {size / 2**20:.1f} MiB")
+
+        pitch_memory_index.build(db.attached_bundled_pitch_db())
+        print(f"in-memory index: {measure(reader, words)}")
+        pitch_memory_index.clear()
+    tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import pathlib
+import statistics
+import tempfile
+import threading
+import time
+from collections.abc import Sequence
+
+from japanese.database import connection_pool as pool_module
+from japanese.database.sqlite3_buddy import Sqlite3Buddy
+from japanese.pitch_accents.acc_dict_mgr_2 import (
+    SqliteAccDictReader,
+    SqliteAccDictWriter,
+)
+from japanese.pitch_accents.common import AccDictProvider, iter_formatted_tuples
+from japanese.pitch_accents.consts import FORMATTED_ACCENTS_TSV
+
+WORDS = ("僕", "私", "猫", "犬", "今日", "明日", "昨日", "学校", "先生", "電車")
+N_READERS = 4
+
+
+def rebuild_pitch_table(db_path: pathlib.Path, upd_file: pathlib.Path, stop: threading.Event) -> None:
+    # The bundled pitch accents are attached read-only, so rewrite them as a (very large) user table instead.
+    while not stop.is_set():
+        with Sqlite3Buddy(db_path) as db:
+            SqliteAccDictWriter(db, upd_file=upd_file).clear_table()
+            with db.bulk_load_pitch_accents():
+                db.bulk_insert_pitch_accent_data(iter_formatted_tuples(FORMATTED_ACCENTS_TSV), AccDictProvider.user)
+
+
+def read_pitch_accents(db_path: pathlib.Path, stop: threading.Event, latencies: list[float]) -> None:
+    while not stop.is_set():
+        for word in WORDS:
+            start = time.perf_counter()
+            with Sqlite3Buddy(db_path) as db:
+                SqliteAccDictReader(db).look_up(word)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+
+def measure(seconds: float) -> Sequence[float]:
+    # The database file must not exist beforehand, so that the tables are created from scratch.
+    tmp_dir = tempfile.TemporaryDirectory()
+    db_path = pathlib.Path(tmp_dir.name) / "benchmark.sqlite3"
+    upd_file = pathlib.Path(tmp_dir.name) / "benchmark.updated"
+    with Sqlite3Buddy(db_path) as db:
+        SqliteAccDictWriter(db, upd_file=upd_file).fill_bundled_data()
+    stop = threading.Event()
+    latencies: list[float] = []
+    threads = [threading.Thread(target=rebuild_pitch_table, args=(db_path, upd_file, stop))]
+    threads.extend(
+        threading.Thread(target=read_pitch_accents, args=(db_path, stop, latencies)) for _idx in range(N_READERS)
+    )
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    pool_module.connection_pool.close_idle()
+    tmp_dir.cleanup()
+    return sorted(latencies)
+
+
+def report(name: str, latencies: Sequence[float]) -> None:
+    print(
+        f"{name}: {len(latencies)} reads, "
+        f"median {statistics.median(latencies):.2f} ms, "
+        f"p99 {latencies[int(len(latencies) * 0.99)]:.2f} ms, "
+        f"max {latencies[-1]:.2f} ms"
+    )
+
+
+def main() -> None:
+    """
+    Measure how long lookups take while the pitch accent table is being rebuilt in another thread.
+    """
+    pragmas = pool_module.CONNECTION_PRAGMAS
+    try:
+        # Rollback journal, as before.
+        pool_module.CONNECTION_PRAGMAS = ("PRAGMA busy_timeout = 60000",)
+        report("default journal", measure(seconds=5))
+    finally:
+        pool_module.CONNECTION_PRAGMAS = pragmas
+    report("wal + read pragmas", measure(seconds=5))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import statistics
+import time
+
+from japanese.helpers.tokens import tokenize
+
+# Field contents of the kind that are passed to tokenize() when notes are filled in bulk.
+SENTENCES = (
+    "彼女は１２月のある寒い夜に亡くなった。" * 20,
+    "<div>私達は昨日ロンドンに着いた。<br>おはよう。[sound:ohayou.mp3]</div>" * 20,
+    "情報処理[じょうほうしょり]の 技術[ぎじゅつ]は 日々[ひび] 進化[しんか]している。" * 20,
+    "<b>Lorem ipsum</b> dolor sit amet, 東京都は３日間、雨が降り続いた。" * 20,
+)
+N_ROUNDS = 2000
+
+
+def main() -> None:
+    """
+    Measure how long it takes to split long sentences to tokens.
+    """
+    for sentence in SENTENCES:
+        timings = []
+        for _round in range(N_ROUNDS):
+            start = time.perf_counter()
+            list(tokenize(sentence))
+            timings.append((time.perf_counter() - start) * 1_000_000)
+        print(
+            f"{len(sentence)} chars, {sum(1 for _token in tokenize(sentence))} tokens: "
+            f"median {statistics.median(timings):.1f} us, mean {statistics.mean(timings):.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+"""
+Build japanese/pitch_accents/res/pitch_accents_bundled.sqlite3 from the bundled pitch accents file.
+Runs without Anki, so that the file can be built when the add-on is packaged.
+"""
+
+import importlib
+import pathlib
+import sys
+import types
+
+ADDON_PACKAGE_DIR = pathlib.Path(__file__).resolve().parent.parent / "japanese"
+
+
+def import_builder() -> types.ModuleType:
+    # japanese/__init__.py starts the add-on and needs Anki.
+    # Register the package without running it. The modules used to build the file don't need Anki.
+    package = types.ModuleType("japanese")
+    package.__path__ = [str(ADDON_PACKAGE_DIR)]
+    sys.modules["japanese"] = package
+    return importlib.import_module("japanese.database.bundled_pitch_db")
+
+
+if __name__ == "__main__":
+    import_builder().main()
@@ -0,0 +1,11 @@
+#!/bin/bash
+
+# Build japanese/pitch_accents/res/pitch_accents_bundled.sqlite3 from the bundled pitch accents file.
+# Run before packaging the add-on. Otherwise the file is built on the user's machine on first start.
+# Anki isn't needed, see build_pitch_db.py.
+
+set -euo pipefail
+
+# The add-on may be vendored into a larger repository, so paths are resolved relative to this script.
+cd -- "$(dirname -- "$0")/.."
+python3 scripts/build_pitch_db.py
@@ -1,15 +1,39 @@
 # Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import os
 import pathlib
+import sqlite3
+import subprocess
+import sys
 
 import pytest
 
+from japanese.database.bundled_pitch_db import (
+    BUNDLED_PITCH_DB_NAME,
+    build_bundled_pitch_db,
+    is_bundled_pitch_db_valid,
+)
+from japanese.database.connection_pool import connection_pool
+from japanese.database.pitch_buddy import (
+    PITCH_TABLE_INDEXES,
+    PITCH_TABLES_SCHEMA_NAME,
+    PITCH_TABLES_SCHEMA_VERSION,
+    SEARCH_PITCH_ACCENTS_QUERY,
+)
 from japanese.database.sqlite3_buddy import Sqlite3Buddy
 from japanese.pitch_accents.acc_dict_mgr_2 import (
     SqliteAccDictReader,
     SqliteAccDictWriter,
+    iter_formatted_rows,
+)
+from japanese.pitch_accents.common import (
+    AccDictRawTSVEntry,
+    FormattedEntry,
+    iter_formatted_tuples,
 )
-from japanese.pitch_accents.common import FormattedEntry
+from japanese.pitch_accents.consts import FORMATTED_ACCENTS_TSV
+from japanese.pitch_accents.memory_index import pitch_memory_index
+from japanese.pitch_accents.user_accents import iter_user_formatted_rows
 from tests.conftest import tmp_db_connection, tmp_upd_file, tmp_user_accents_file
 
 
@@ -175,10 +199,224 @@ class TestAccDictManager:
             ),
         ]
 
+    @pytest.mark.parametrize("select_keys", [Sqlite3Buddy.PITCH_RETRIEVE_KEYS, ("headword", "pitch_number")])
+    def test_search_many(self, tmp_db_connection: Sqlite3Buddy, select_keys: tuple[str, ...]) -> None:
+        """
+        Searching several words at once should give the same results as searching them one by one.
+        """
+        db = tmp_db_connection
+        words = ["僕", "アクビ", "欠伸", "言葉", "ソゴ", "×××", "ナイナイ"]
+        results = db.search_pitch_accents_many(words, prefer_provider_name="user", select_keys=select_keys)
+        assert list(results) == words
+        assert results["ナイナイ"] == []
+        for word in words:
+            expected = db.search_pitch_accents(word, prefer_provider_name="user", select_keys=select_keys)
+            assert [[row[key] for key in select_keys] for row in results[word]] == [
+                [row[key] for key in select_keys] for row in expected
+            ]
+
+    def test_search_query_plan(self, tmp_db_connection: Sqlite3Buddy) -> None:
+        """
+        Searches should be answered from the covering indexes, without sorting the rows in a temporary b-tree.
+        """
+        db = tmp_db_connection
+        assert db.has_bundled_pitch_accents() is True
+        plan = [
+            row["detail"]
+            for row in db.con.execute(
+                "EXPLAIN QUERY PLAN " + SEARCH_PITCH_ACCENTS_QUERY,
+                {"word": "僕", "reading_key": "ボク", "provider": "user"},
+            )
+        ]
+        assert not any("TEMP B-TREE" in detail for detail in plan)
+        searches = [detail for detail in plan if detail.startswith("SEARCH")]
+        assert len(searches) == 4
+        assert all("USING COVERING INDEX" in detail for detail in searches)
+
+    def test_pitch_lookup_with_reading(self, faux_reader: SqliteAccDictReader) -> None:
+        """
+        Entries whose reading sounds different from the given reading are skipped.
+        """
+        r = faux_reader
+        all_entries = r.look_up("僕")
+        assert {"ボク", "シモベ"} <= {entry.katakana_reading for entry in all_entries}
+        assert r.look_up("僕", "ぼく") == [entry for entry in all_entries if entry.katakana_reading == "ボク"]
+        assert list(r.look_up_grouped("僕", "しもべ")) == ["僕"]
+        # The word is known, but not with this reading.
+        acc_dict: AccentDict = {}
+        r.look_up_and_extend(acc_dict, "僕", "ぼっく")
+        assert acc_dict == {"僕": []}
+
+    def test_search_headwords_by_prefix(
+        self, tmp_db_connection: Sqlite3Buddy, faux_reader: SqliteAccDictReader
+    ) -> None:
+        db, r = tmp_db_connection, faux_reader
+        assert db.search_pitch_accent_headwords("", limit=10) == []
+        assert db.search_pitch_accent_headwords("ボク", limit=10) == ["僕"]
+        headwords = db.search_pitch_accent_headwords("ア", limit=20)
+        assert 0 < len(headwords) <= 20
+        for headword in headwords:
+            # The headword or one of its readings starts with the prefix.
+            rows = db.search_pitch_accents(
+                headword, prefer_provider_name="user", select_keys=("headword", "katakana_reading")
+            )
+            assert any(row["headword"].startswith("ア") or row["katakana_reading"].startswith("ア") for row in rows)
+        assert list(r.look_up_prefix("ぼく", limit=10)) == ["僕"]
+        assert r.look_up_prefix("ぼく", limit=10)["僕"] == r.look_up_grouped("僕")["僕"]
+
+    def test_search_headwords_by_prefix_cancelled(self, tmp_db_connection: Sqlite3Buddy) -> None:
+        db = tmp_db_connection
+        with pytest.raises(sqlite3.OperationalError):
+            db.search_pitch_accent_headwords("ア", limit=20, is_cancelled=lambda: True)
+        # The connection can be used as before.
+        assert db.search_pitch_accent_headwords("ボク", limit=10) == ["僕"]
+
+    def test_memory_index(self, tmp_db_connection: Sqlite3Buddy, faux_reader: SqliteAccDictReader) -> None:
+        """
+        The in-memory index should give the same results as sqlite.
+        """
+        db, r = tmp_db_connection, faux_reader
+        words = ["僕", "アクビ", "欠伸", "言葉", "×××", "ナイナイ"]
+        expected = [(r.look_up(word), r.look_up_grouped(word), r.look_up(word, "しもべ")) for word in words]
+        pitch_memory_index.build(db.attached_bundled_pitch_db())
+        try:
+            assert pitch_memory_index.get(db.attached_bundled_pitch_db()) is not None
+            assert [(r.look_up(word), r.look_up_grouped(word), r.look_up(word, "しもべ")) for word in words] == expected
+            # Words overridden by the user are still searched in sqlite.
+            assert {"言葉", "×××"} <= db.get_user_pitch_words()
+        finally:
+            pitch_memory_index.clear()
+
     def test_table_clear(self, faux_writer: SqliteAccDictWriter) -> None:
         w = faux_writer
         assert w.is_table_filled() is True
         assert w.is_table_up_to_date() is True
         w.clear_table()
-        assert w.is_table_filled() is False
+        # The bundled pitch accents are read-only and stay attached.
+        assert w.is_bundled_data_attached() is True
+        assert w.is_table_filled() is True
         assert w.is_table_up_to_date() is False
+
+    def test_user_data_cleared(self, faux_reader: SqliteAccDictReader) -> None:
+        r = faux_reader
+        assert r.look_up("×××") == []
+        assert all(entry.katakana_reading != "ソウシツ" for entry in r.look_up("言葉"))
+
+
+def test_iter_formatted_tuples(tmp_path: pathlib.Path) -> None:
+    tsv_file = tmp_path / "accents.csv"
+    # Columns are in a different order than in the bundled file.
+    tsv_file.write_text(
+        "frequency\theadword\traw_headword\tkatakana_reading\thtml_notation\tpitch_number\n"
+        "42\tボク\t僕\tボク\t<low_rise>ボ</low_rise><high>ク</high>\t0\n"
+        "\n",
+        encoding="utf-8",
+    )
+    reported = []
+    rows = list(iter_formatted_tuples(tsv_file, progress=lambda done, total: reported.append((done, total))))
+    assert rows == [("ボク", "僕", "ボク", "<low_rise>ボ</low_rise><high>ク</high>", "0", "42")]
+    assert reported[-1][0] == reported[-1][1] == tsv_file.stat().st_size
+
+
+def test_iter_formatted_tuples_matches_csv_reader() -> None:
+    keys = tuple(AccDictRawTSVEntry.__annotations__)
+    expected = [[row[key] for key in keys] for row in iter_formatted_rows(FORMATTED_ACCENTS_TSV)]
+    assert [list(row) for row in iter_formatted_tuples(FORMATTED_ACCENTS_TSV)] == expected
+
+
+def test_bulk_load_restores_indexes(tmp_path: pathlib.Path) -> None:
+    def index_names(db: Sqlite3Buddy) -> set[str]:
+        return {row[0] for row in db.con.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+    with Sqlite3Buddy(tmp_path / "bulk.sqlite3") as db:
+        with pytest.raises(ValueError):
+            with db.bulk_load_pitch_accents():
+                assert not index_names(db) & set(PITCH_TABLE_INDEXES)
+                db.bulk_insert_pitch_accent_data([("ボク", "僕", "ボク", "ボク", "0", "not a number")], "bundled")
+        assert set(PITCH_TABLE_INDEXES) <= index_names(db)
+        assert db.get_pitch_accents_headword_count() == 0
+
+
+def test_migrate_from_version_3(tmp_path: pathlib.Path) -> None:
+    db_path = tmp_path / "old.sqlite3"
+    with Sqlite3Buddy(db_path):
+        pass
+    connection_pool.forget(db_path)
+    # Make the table look like it did in version 3.
+    con = sqlite3.connect(db_path)
+    con.executescript(f"""
+    DROP INDEX index_pitch_accents_headword_sorted;
+    DROP INDEX index_pitch_accents_reading_sorted;
+    ALTER TABLE pitch_accents_formatted DROP COLUMN reading_key;
+    CREATE INDEX index_pitch_accents_headword ON pitch_accents_formatted(headword);
+    INSERT INTO pitch_accents_formatted VALUES('学校', '学校', 'ガッコウ', 'ガッコウ', '0', 1, 'user');
+    UPDATE version SET number = 3 WHERE schema_name = '{PITCH_TABLES_SCHEMA_NAME}';
+    """)
+    con.close()
+    # Prepare the tables again, as if the add-on was started after an update.
+    with Sqlite3Buddy(db_path) as db:
+        assert db.get_db_version(PITCH_TABLES_SCHEMA_NAME) == PITCH_TABLES_SCHEMA_VERSION
+        index_names = {row[0] for row in db.con.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert "index_pitch_accents_headword" not in index_names
+        assert set(PITCH_TABLE_INDEXES) <= index_names
+        assert [row["reading_key"] for row in db.search_pitch_accents("学校", "user", reading_key="ガッコー")] == [
+            "ガッコー"
+        ]
+
+
+def test_bundled_pitch_db_is_attached_read_only(tmp_path: pathlib.Path) -> None:
+    with Sqlite3Buddy(tmp_path / "db.sqlite3") as db:
+        assert db.has_bundled_pitch_accents() is False
+        SqliteAccDictWriter(db, upd_file=tmp_path / "db.updated").fill_bundled_data()
+        assert db.has_bundled_pitch_accents() is True
+        assert db.con.execute("SELECT COUNT(*) FROM main.pitch_accents_formatted").fetchone()[0] == 0
+        assert db.get_pitch_accents_headword_count() > 0
+        with pytest.raises(sqlite3.OperationalError):
+            db.con.execute("DELETE FROM bundled.pitch_accents_formatted")
+    assert is_bundled_pitch_db_valid(tmp_path / BUNDLED_PITCH_DB_NAME, FORMATTED_ACCENTS_TSV)
+    # New sessions find the file without rebuilding it.
+    with Sqlite3Buddy(tmp_path / "db.sqlite3") as db:
+        assert db.has_bundled_pitch_accents() is True
+
+
+def test_outdated_bundled_pitch_db_is_ignored(tmp_path: pathlib.Path) -> None:
+    tsv_file = tmp_path / "accents.csv"
+    tsv_file.write_text(
+        "headword\tkatakana_reading\thtml_notation\tpitch_number\tfrequency\traw_headword\n"
+        "ボク\tボク\t<low_rise>ボ</low_rise><high>ク</high>\t0\t42\t僕\n",
+        encoding="utf-8",
+    )
+    db_path = tmp_path / BUNDLED_PITCH_DB_NAME
+    build_bundled_pitch_db(tsv_file, db_path)
+    assert is_bundled_pitch_db_valid(db_path, tsv_file) is True
+    assert is_bundled_pitch_db_valid(db_path, FORMATTED_ACCENTS_TSV) is False
+    assert is_bundled_pitch_db_valid(tmp_path / "missing.sqlite3", tsv_file) is False
+
+
+def test_update_user_data(tmp_path: pathlib.Path) -> None:
+    user_file = tmp_path / "user_accents.tsv"
+    user_file.write_text("言葉\tソウシツ\t0\n言葉\tソゴ\t0\n×××\tデタラメ\t0\n", encoding="utf-8")
+    with Sqlite3Buddy(tmp_path / "db.sqlite3") as db:
+        w = SqliteAccDictWriter(db, upd_file=tmp_path / "db.updated", user_accents_file=user_file)
+        w.fill_user_data()
+        kept_rowid = db.get_pitch_accent_rows("user")[0]["rowid"]
+        assert w.update_user_data() == frozenset()
+        # Change one line and add another.
+        user_file.write_text("言葉\tソウシツ\t0\n言葉\tソゴ\t1\n×××\tデタラメ\t0\n猫\tネコ\t1\n", encoding="utf-8")
+        assert "ネコ" not in db.get_user_pitch_words()
+        assert w.update_user_data() == frozenset(("言葉", "ソゴ", "猫", "ネコ"))
+        assert "ネコ" in db.get_user_pitch_words()
+        rows = db.get_pitch_accent_rows("user")
+        assert kept_rowid in [row["rowid"] for row in rows]
+        expected = sorted(tuple(row.values()) for row in iter_user_formatted_rows(user_file))
+        assert sorted(tuple(str(row[key]) for key in db.PITCH_ROW_KEYS) for row in rows) == expected
+
+
+def test_bundled_pitch_db_builder_runs_without_anki() -> None:
+    # The prebuilt file is built when the add-on is packaged, where Anki isn't installed.
+    code = (
+        "import sys; sys.modules['aqt'] = sys.modules['anki'] = None; "
+        "sys.path.insert(0, 'scripts'); import build_pitch_db; build_pitch_db.import_builder()"
+    )
+    env = {key: value for key, value in os.environ.items() if key not in ("ANKI_JAPANESE_DIR", "PYTHONPATH")}
+    subprocess.run([sys.executable, "-c", code], cwd=pathlib.Path(__file__).parent.parent, env=env, check=True)
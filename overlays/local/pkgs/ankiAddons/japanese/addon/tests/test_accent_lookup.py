@@ -95,6 +95,20 @@ class TestAccDictLookup:
         for item in expected:
             assert item in result
 
+    def test_invalidate(
+        self, acc_dict_mgr: AccentDictManager2, tmp_db_connection: Sqlite3Buddy, lookup: AccentLookup
+    ) -> None:
+        assert acc_dict_mgr.is_ready()
+        lookup = lookup.with_new_buddy(tmp_db_connection)
+        assert "僕" in lookup.get_pronunciations("僕、猫")
+        key = ("僕、猫", True, True, True, False)
+        assert key in AccentLookup._cache
+        # The sentence depends on the words found in its parts, but not on unrelated words.
+        AccentLookup.invalidate(["経緯", "ボク"])
+        assert key in AccentLookup._cache
+        assert AccentLookup.invalidate(["僕"]) > 0
+        assert key not in AccentLookup._cache
+
     @pytest.mark.parametrize(
         "sentence, expected",
         [
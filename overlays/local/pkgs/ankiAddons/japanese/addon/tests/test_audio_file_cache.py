@@ -0,0 +1,163 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import hashlib
+import os
+import pathlib
+
+from japanese.audio_manager.basic_types import AudioManagerException, FileUrlData
+from japanese.audio_manager.download_results import (
+    DownloadedData,
+    FileSaveResults,
+    format_report_results_msg,
+)
+from japanese.audio_manager.file_cache import AudioFileCache
+from japanese.audio_manager.source_manager import AudioSourceManager
+from japanese.database.sqlite3_buddy import Sqlite3Buddy
+from japanese.helpers.basic_types import AudioManagerHttpClientABC
+from playground.utils import NoAnkiConfigView
+from tests.no_anki_config import no_anki_config
+
+
+def test_audio_file_cache(tmp_path: pathlib.Path) -> None:
+    cache = AudioFileCache(tmp_path, max_size=1000)
+    assert cache.get("NHK", "https://example.com/a.ogg") is None
+    cache.put("NHK", "https://example.com/a.ogg", b"a" * 100)
+    # Files with equal content are stored once.
+    cache.put("TAAS", "https://example.com/b.ogg", b"a" * 100)
+    assert cache.get("NHK", "https://example.com/a.ogg") == b"a" * 100
+    assert cache.get("TAAS", "https://example.com/b.ogg") == b"a" * 100
+    assert cache.get("TAAS", "https://example.com/a.ogg") is None
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries, stats.size_bytes) == (2, 2, 1, 100)
+    cache.close()
+
+    # The cache survives restarts.
+    cache = AudioFileCache(tmp_path, max_size=1000)
+    assert cache.get("NHK", "https://example.com/a.ogg") == b"a" * 100
+
+    # Damaged files are dropped.
+    sha256 = hashlib.sha256(b"a" * 100).hexdigest()
+    (tmp_path / sha256[:2] / sha256).write_bytes(b"damaged")
+    assert cache.get("NHK", "https://example.com/a.ogg") is None
+    assert cache.get("TAAS", "https://example.com/b.ogg") is None
+    assert cache.total_size() == 0
+
+
+def test_audio_file_cache_eviction(tmp_path: pathlib.Path) -> None:
+    cache = AudioFileCache(tmp_path, max_size=1000)
+    for idx in range(5):
+        cache.put("NHK", f"{idx}.ogg", bytes([idx]) * 300)
+        # The first file stays in use.
+        assert cache.get("NHK", "0.ogg") == bytes([0]) * 300
+    assert cache.total_size() <= 1000
+    assert cache.get("NHK", "0.ogg") is not None
+    assert cache.get("NHK", "4.ogg") is not None
+    assert cache.get("NHK", "1.ogg") is None
+    assert cache.stats().evictions > 0
+    assert sum(1 for path in tmp_path.rglob("*") if path.is_file() and len(path.name) == 64) == cache.stats().entries
+    # Files larger than the cache are not stored.
+    cache.put("NHK", "big.ogg", b"b" * 1001)
+    assert cache.get("NHK", "big.ogg") is None
+
+
+def test_disabled_audio_file_cache(tmp_path: pathlib.Path) -> None:
+    cache = AudioFileCache(tmp_path / "cache", max_size=0)
+    cache.put("NHK", "a.ogg", b"a")
+    assert cache.get("NHK", "a.ogg") is None
+    assert not (tmp_path / "cache").exists()
+
+
+def test_change_audio_file_cache_size(tmp_path: pathlib.Path) -> None:
+    cache = AudioFileCache(tmp_path, max_size=1000)
+    for idx in range(3):
+        cache.put("NHK", f"{idx}.ogg", bytes([idx]) * 300)
+    assert cache.total_size() == 900
+    # Lowering the limit removes the least recently used files right away.
+    cache.set_max_size(600)
+    assert cache.total_size() <= 600
+    assert cache.get("NHK", "0.ogg") is None
+    assert cache.get("NHK", "2.ogg") is not None
+    # A limit of 0 disables the cache.
+    cache.set_max_size(0)
+    assert not cache.is_enabled()
+    assert cache.get("NHK", "2.ogg") is None
+    cache.put("NHK", "3.ogg", b"c")
+    # Raising the limit enables it again, with the files stored before.
+    cache.set_max_size(1000)
+    assert cache.get("NHK", "2.ogg") == bytes([2]) * 300
+    assert cache.get("NHK", "3.ogg") is None
+    # Enabling the cache with a limit below the size of the stored files removes files right away.
+    cache.put("NHK", "4.ogg", bytes([4]) * 300)
+    cache.set_max_size(0)
+    cache.set_max_size(400)
+    assert cache.total_size() <= 400
+    assert cache.get("NHK", "4.ogg") is not None
+
+
+def test_audio_file_cache_disables_itself(tmp_path: pathlib.Path, monkeypatch) -> None:
+    cache = AudioFileCache(tmp_path, max_size=1000)
+    cache.put("NHK", "a.ogg", b"a" * 100)
+    sha256 = hashlib.sha256(b"a" * 100).hexdigest()
+    (tmp_path / sha256[:2] / sha256).write_bytes(b"damaged")
+
+    def unlink(_path):
+        raise PermissionError("can't remove the file")
+
+    # Removing the damaged file fails. The lookup is a miss instead of an error.
+    monkeypatch.setattr(os, "unlink", unlink)
+    assert cache.get("NHK", "a.ogg") is None
+    assert not cache.is_enabled()
+
+
+def test_report_cache_hit_rate(tmp_path: pathlib.Path) -> None:
+    file = FileUrlData(url="https://example.com/c.ogg", desired_filename="c.ogg", word="c", source_name="NHK")
+    local_file = tmp_path / "d.ogg"
+    local_file.write_bytes(b"d")
+    local = FileUrlData(url=str(local_file), desired_filename="d.ogg", word="d", source_name="local")
+    results = FileSaveResults(
+        successes=[
+            DownloadedData("a.ogg", b"a", from_cache=True, cache_consulted=True),
+            DownloadedData("b.ogg", b"b", cache_consulted=True),
+            # Files of local audio sources bypass the cache and don't count.
+            DownloadedData("d.ogg", b"d"),
+        ],
+        fails=[
+            AudioManagerException(file, "download failed", exception=OSError()),
+            AudioManagerException(local, "copy failed", exception=OSError()),
+        ],
+    )
+    assert "1 of 3 files found on disk (33% hit rate)" in format_report_results_msg(results, with_cache_msg=True)
+    # The cache isn't mentioned when it is disabled.
+    assert "Audio cache" not in format_report_results_msg(results)
+
+
+def test_source_manager_uses_file_cache(tmp_path: pathlib.Path, no_anki_config: NoAnkiConfigView) -> None:
+    class HttpClient(AudioManagerHttpClientABC):
+        downloads: list[str] = []
+
+        def download(self, file):
+            self.downloads.append(file.url)
+            return b"remote data"
+
+        def download_to_file(self, source, dest, validators=None):
+            raise NotImplementedError()
+
+    client = HttpClient()
+    remote = FileUrlData(url="https://example.com/a.ogg", desired_filename="a.ogg", word="a", source_name="NHK")
+    local_path = tmp_path / "local.ogg"
+    local_path.write_bytes(b"local data")
+    local = FileUrlData(url=str(local_path), desired_filename="local.ogg", word="l", source_name="local")
+    with Sqlite3Buddy(tmp_path / "db.sqlite3") as db:
+        session = AudioSourceManager(
+            config=no_anki_config,
+            http_client=client,
+            db=db,
+            file_cache=AudioFileCache(tmp_path / "cache", max_size=1000),
+        )
+        assert session._get_cached_file(remote) is None
+        assert session._get_file(remote) == b"remote data"
+        assert session._get_cached_file(remote) == b"remote data"
+        assert client.downloads == [remote.url]
+        # Local files are read directly.
+        assert session._get_file(local) == b"local data"
+        assert session._get_cached_file(local) is None
@@ -1,16 +1,29 @@
 # Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import io
 import json
 import pathlib
 import sqlite3
+import threading
+import time
+import zipfile
 
 import pytest
 
-from japanese.audio_manager.basic_types import NameUrl, NameUrlSet, TotalAudioStats
+from japanese.audio_manager.audio_source import AudioSource
+from japanese.audio_manager.basic_types import (
+    AudioSourceConfig,
+    DownloadValidators,
+    NameUrl,
+    NameUrlSet,
+    TotalAudioStats,
+)
+from japanese.audio_manager.source_feed import SourceFeed
 from japanese.audio_manager.source_manager import AudioSourceManager
 from japanese.database.basic_types import InvalidSourceIndex
 from japanese.database.sqlite3_buddy import Sqlite3Buddy
 from japanese.helpers.audio_json_schema import SourceIndex
+from japanese.helpers.json_stream import JsonObjectStream
 from playground.run_audio_manager import NoAnkiAudioSourceManagerFactory
 from playground.utils import NoAnkiConfigView
 from tests import DATA_DIR
@@ -85,3 +98,177 @@ def test_insert_bad_source(init_factory: NoAnkiAudioSourceManagerFactory) -> Non
         del taas_data["files"]  # type: ignore
         with Sqlite3Buddy(init_factory.db_path) as db:
             db.insert_data("fake-source", taas_data)
+
+
+def make_source_index(n_words: int) -> SourceIndex:
+    return {
+        "meta": {"name": "Test source", "year": 2024, "version": 3, "media_dir": "media"},
+        "headwords": {f"言葉{idx}": [f"{idx}.ogg", f"{idx}_2.ogg"] for idx in range(n_words)},
+        "files": {
+            f"{idx}{suffix}.ogg": {"kana_reading": f"ことば{idx}", "pitch_number": str(idx % 4)}
+            for idx in range(n_words)
+            for suffix in ("", "_2")
+        },
+    }
+
+
+@pytest.mark.parametrize("file_name", ["index.json", "index.zip"])
+def test_read_local_source(tmp_path: pathlib.Path, no_anki_config: NoAnkiConfigView, file_name: str) -> None:
+    data = make_source_index(n_words=25_000)
+    index_path = tmp_path / file_name
+    if index_path.suffix == ".zip":
+        with zipfile.ZipFile(index_path, "w", compression=zipfile.ZIP_DEFLATED) as zip_out:
+            zip_out.writestr("index.json", json.dumps(data, ensure_ascii=False))
+    else:
+        index_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+    with Sqlite3Buddy(tmp_path / "db.sqlite3") as db:
+        session = AudioSourceManager(config=no_anki_config, http_client=None, db=db)
+        source = AudioSource.from_cfg(AudioSourceConfig(enabled=True, name="stream", url=str(index_path)), db)
+        session.read_pronunciation_data(source)
+        stats = db.get_stats_by_name(NameUrl("stream", str(index_path)))
+        assert stats.num_headwords == 25_000
+        assert stats.num_files == 50_000
+        assert [file.file_name for file in db.search_files_in_source("stream", "言葉24999")] == [
+            "24999.ogg",
+            "24999_2.ogg",
+        ]
+        assert db.get_file_info("stream", "7_2.ogg") == {
+            "kana_reading": "ことば7",
+            "pitch_pattern": None,
+            "pitch_number": "3",
+        }
+
+
+def test_insert_truncated_source(tmp_path: pathlib.Path) -> None:
+    text = json.dumps(make_source_index(n_words=1000), ensure_ascii=False)
+    with Sqlite3Buddy(tmp_path / "db.sqlite3") as db:
+        with pytest.raises(json.JSONDecodeError):
+            db.insert_sections("truncated", JsonObjectStream(io.StringIO(text[: len(text) // 2])).sections())
+        # Nothing is left behind from the failed import.
+        assert db.is_source_cached("truncated") is False
+        assert list(db.search_files_in_source("truncated", "言葉1")) == []
+
+
+def test_get_sources_in_parallel(tmp_path: pathlib.Path, no_anki_config: NoAnkiConfigView, monkeypatch) -> None:
+    sources = [
+        AudioSourceConfig(enabled=True, name=f"source-{idx}", url=str(tmp_path / f"{idx}.zip")) for idx in range(6)
+    ]
+    for idx, source in enumerate(sources):
+        with zipfile.ZipFile(source.url, "w", compression=zipfile.ZIP_DEFLATED) as zip_out:
+            zip_out.writestr("index.json", json.dumps(make_source_index(n_words=1000 * (idx + 1)), ensure_ascii=False))
+    # A truncated index and a missing file.
+    with zipfile.ZipFile(tmp_path / "broken.zip", "w") as zip_out:
+        zip_out.writestr("index.json", json.dumps(make_source_index(n_words=100))[:1000])
+    sources.insert(2, AudioSourceConfig(enabled=True, name="broken", url=str(tmp_path / "broken.zip")))
+    sources.append(AudioSourceConfig(enabled=True, name="missing", url=str(tmp_path / "missing.json")))
+    monkeypatch.setattr(NoAnkiConfigView, "iter_audio_sources", lambda _self: iter(sources))
+
+    with Sqlite3Buddy(tmp_path / "db.sqlite3") as db:
+        session = AudioSourceManager(config=no_anki_config, http_client=None, db=db)
+        result = session.get_sources()
+        assert [source.name for source in result.sources] == [f"source-{idx}" for idx in range(6)]
+        assert sorted(error.file.name for error in result.errors) == ["broken", "missing"]
+        for idx in range(6):
+            stats = db.get_stats_by_name(NameUrl(f"source-{idx}", sources[idx if idx < 2 else idx + 1].url))
+            assert stats.num_headwords == 1000 * (idx + 1)
+        assert db.is_source_cached("broken") is False
+        # Cached sources aren't read again.
+        assert session.requires_init_operation() == {NameUrl(s.name, s.url) for s in sources[2::5]}
+        result = session.get_sources()
+        assert len(result.sources) == 6
+        assert len(result.errors) == 2
+
+
+def test_get_sources_sharing_url(tmp_path: pathlib.Path, no_anki_config: NoAnkiConfigView, monkeypatch) -> None:
+    url = "https://example.com/shared/index.json"
+    sources = [AudioSourceConfig(enabled=True, name=f"shared-{idx}", url=url) for idx in range(3)]
+    sources.append(AudioSourceConfig(enabled=True, name="other", url="https://example.com/other/index.json"))
+    monkeypatch.setattr(NoAnkiConfigView, "iter_audio_sources", lambda _self: iter(sources))
+    body = json.dumps(make_source_index(n_words=1000), ensure_ascii=False).encode("utf-8")
+
+    class HttpClient:
+        downloads: list[str] = []
+        active: set[pathlib.Path] = set()
+
+        def download_to_file(self, source, dest: pathlib.Path, validators):
+            # Downloads to the same path must not overlap.
+            assert dest not in self.active
+            self.active.add(dest)
+            self.downloads.append(source.url)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            dest.write_bytes(body)
+            time.sleep(0.1)
+            self.active.remove(dest)
+            return DownloadValidators(etag='"v1"', file_size=len(body))
+
+    with Sqlite3Buddy(tmp_path / "db.sqlite3") as db:
+        session = AudioSourceManager(config=no_anki_config, http_client=HttpClient(), db=db)
+        result = session.get_sources()
+        assert result.errors == []
+        assert [source.name for source in result.sources] == [source.name for source in sources]
+        assert sorted(HttpClient.downloads) == sorted({source.url for source in sources})
+        for source in sources:
+            assert db.get_stats_by_name(NameUrl(source.name, source.url)).num_headwords == 1000
+        assert db.get_download_validators(url) == DownloadValidators(etag='"v1"', file_size=len(body))
+
+
+def test_source_feed_stops_reader() -> None:
+    data = make_source_index(n_words=1000)
+    feed = SourceFeed(
+        AudioSource.from_cfg(AudioSourceConfig(enabled=True, name="feed", url=""), None), max_chunks=1, chunk_size=10
+    )
+    reader = threading.Thread(target=feed.produce, args=(((key, value.items()) for key, value in data.items()),))
+    reader.start()
+    with feed:
+        sections = feed.sections()
+        key, items = next(sections)
+        assert (key, dict(items)) == ("meta", data["meta"])
+        key, items = next(sections)
+        assert key == "headwords"
+        assert next(iter(items)) == ("言葉0", ["0.ogg", "0_2.ogg"])
+    # The writer has stopped early. The reader must not stay blocked on the full queue.
+    reader.join(timeout=5)
+    assert not reader.is_alive()
+
+
+def test_search_words(tmp_path: pathlib.Path, no_anki_config: NoAnkiConfigView, monkeypatch) -> None:
+    sources = [AudioSourceConfig(enabled=True, name=name, url=str(tmp_path / f"{name}.json")) for name in ("A", "B")]
+    for source in sources:
+        data = make_source_index(n_words=100)
+        data["headwords"]["ことば"] = [f"{source.name}_kotoba.ogg"]
+        data["files"][f"{source.name}_kotoba.ogg"] = {"kana_reading": "ことば", "pitch_number": "3"}
+        pathlib.Path(source.url).write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    # The last source in the config has the highest priority.
+    monkeypatch.setattr(NoAnkiConfigView, "iter_audio_sources", lambda _self: iter(sources[::-1]))
+
+    with Sqlite3Buddy(tmp_path / "db.sqlite3") as db:
+        session = AudioSourceManager(config=no_anki_config, http_client=None, db=db)
+        assert not session.get_sources().errors
+
+        def count_queries(words: list[str]) -> int:
+            queries = []
+            db.con.set_trace_callback(queries.append)
+            try:
+                session.search_words(words)
+            finally:
+                db.con.set_trace_callback(None)
+            return len(queries)
+
+        # The number of queries doesn't depend on the number of words.
+        assert count_queries(["言葉1"]) == count_queries([f"言葉{idx}" for idx in range(100)] + ["ことば", "?"])
+
+        hits = session.search_words(["ことば", "言葉7", "not found"])
+        assert [(hit.source_name, hit.url) for hit in hits["ことば"]] == [
+            ("B", str(tmp_path / "media" / "B_kotoba.ogg")),
+            ("A", str(tmp_path / "media" / "A_kotoba.ogg")),
+        ]
+        assert hits["ことば"][0].desired_filename == "ことば_コトバ_3_B.ogg"
+        assert [(hit.source_name, hit.word, hit.reading) for hit in hits["言葉7"]] == [
+            ("B", "言葉7", "ことば7"),
+            ("B", "言葉7", "ことば7"),
+            ("A", "言葉7", "ことば7"),
+            ("A", "言葉7", "ことば7"),
+        ]
+        assert hits["not found"] == []
+        assert list(session.search_word("ことば")) == hits["ことば"]
@@ -0,0 +1,26 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+from playground.utils import NoAnkiConfigView
+
+
+def test_word_lists_follow_config_version() -> None:
+    config = NoAnkiConfigView()
+    assert config.pitch_accent.is_blocklisted("わ")
+    assert config.pitch_accent.is_blocklisted("ワ"), "words are compared in katakana"
+    assert config.pitch_accent.is_blocklisted("１２")
+    assert not config.pitch_accent.is_blocklisted("猫")
+    assert not config.furigana.can_lookup_in_db("僕")
+
+    # The lists are compiled once per config version.
+    config.pitch_accent["blocklisted_words"] = "猫"
+    config.pitch_accent["skip_numbers"] = False
+    config.furigana["mecab_only"] = ""
+    assert config.pitch_accent.is_blocklisted("わ")
+    version = config.version
+    config.update({})
+    assert config.version == config.pitch_accent.version == version + 1
+
+    assert not config.pitch_accent.is_blocklisted("わ")
+    assert not config.pitch_accent.is_blocklisted("１２")
+    assert config.pitch_accent.is_blocklisted("猫")
+    assert config.furigana.can_lookup_in_db("僕")
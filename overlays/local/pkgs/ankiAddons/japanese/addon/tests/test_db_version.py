@@ -4,6 +4,7 @@ from japanese.database.audio_buddy import (
     AUDIO_TABLES_SCHEMA_NAME,
     AUDIO_TABLES_SCHEMA_VERSION,
 )
+from japanese.database.connection_pool import connection_pool
 from japanese.database.pitch_buddy import (
     PITCH_TABLES_SCHEMA_NAME,
     PITCH_TABLES_SCHEMA_VERSION,
@@ -31,3 +32,28 @@ class TestDbVersion:
 
         con.set_db_version("test_schema_1", 42)
         assert con.get_db_version("test_schema_1") == 42
+
+
+def test_connection_is_reused(tmp_path) -> None:
+    db_path = tmp_path / "reuse.sqlite3"
+    with Sqlite3Buddy(db_path) as db:
+        first = db.con
+        with Sqlite3Buddy(db_path) as nested:
+            # Nested sessions never share a connection.
+            assert nested.con is not first
+    with Sqlite3Buddy(db_path) as db:
+        assert db.con is first
+        assert db.get_db_version(PITCH_TABLES_SCHEMA_NAME) == PITCH_TABLES_SCHEMA_VERSION
+    assert connection_pool.idle_count() >= 2
+    connection_pool.close_idle()
+    assert connection_pool.idle_count() == 0
+    with Sqlite3Buddy(db_path) as db:
+        assert db.con is not first
+        assert db.get_db_version(AUDIO_TABLES_SCHEMA_NAME) == AUDIO_TABLES_SCHEMA_VERSION
+
+
+def test_connection_pragmas(tmp_db_connection: Sqlite3Buddy) -> None:
+    con = tmp_db_connection.con
+    assert con.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert con.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    assert con.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
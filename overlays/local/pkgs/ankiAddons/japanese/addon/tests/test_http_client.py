@@ -1,9 +1,21 @@
 # Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import hashlib
+import http.server
+import os
+import pathlib
+import threading
+from typing import Optional
+
 import pytest
 
 from japanese.audio_manager.abstract import AudioSettingsConfigViewABC
-from japanese.audio_manager.basic_types import AudioManagerException, FileUrlData
+from japanese.audio_manager.basic_types import (
+    AudioManagerException,
+    AudioSourceConfig,
+    DownloadValidators,
+    FileUrlData,
+)
 from japanese.helpers.http_client import AudioManagerHttpClient
 
 
@@ -17,3 +29,103 @@ def test_client_download() -> None:
 
     with pytest.raises(AudioManagerException):
         client.download(FileUrlData(url="x", word="x", desired_filename="x", source_name="x"))
+
+
+class AudioSettings(AudioSettingsConfigViewABC):
+    dictionary_download_timeout = 10
+    audio_download_timeout = 10
+    attempts = 2
+
+
+class IndexRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves one file with an ETag. Supports conditional and range requests.
+    """
+
+    body: bytes = b""
+    etag: str = '"v1"'
+    # Close the connection after sending this many bytes of the body.
+    cut_after: Optional[int] = None
+    requests: list[dict[str, str]] = []
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        cls = type(self)
+        cls.requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == cls.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        start = 0
+        if (range_header := self.headers.get("Range")) and self.headers.get("If-Range") == cls.etag:
+            start = int(range_header.removeprefix("bytes=").removesuffix("-"))
+        body = cls.body[start:]
+        self.send_response(206 if start else 200)
+        self.send_header("ETag", cls.etag)
+        self.send_header("Content-Length", str(len(body)))
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{len(cls.body) - 1}/{len(cls.body)}")
+        self.end_headers()
+        if cls.cut_after is not None:
+            self.wfile.write(body[: cls.cut_after])
+            self.close_connection = True
+            cls.cut_after = None
+        else:
+            self.wfile.write(body)
+
+
+@pytest.fixture()
+def index_server():
+    handler = type("Handler", (IndexRequestHandler,), {"requests": []})
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server, handler
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_download_to_file(index_server, tmp_path: pathlib.Path) -> None:
+    server, handler = index_server
+    handler.body = os.urandom(300_000)
+    source = AudioSourceConfig(enabled=True, name="remote", url=f"http://127.0.0.1:{server.server_port}/index.zip")
+    dest = tmp_path / "index"
+    client = AudioManagerHttpClient(audio_settings=AudioSettings())
+
+    # The connection breaks in the middle. The partial file is kept.
+    handler.cut_after = 100_000
+    with pytest.raises(AudioManagerException):
+        client.download_to_file(source, dest)
+    assert not dest.exists()
+
+    # The download continues where it stopped.
+    validators = client.download_to_file(source, dest)
+    # Only whole chunks that were received before the connection broke are kept.
+    assert handler.requests[-1]["Range"] in (f"bytes={size}-" for size in range(1, 100_001))
+    assert dest.read_bytes() == handler.body
+    assert validators == DownloadValidators(
+        etag='"v1"',
+        last_modified=None,
+        file_size=len(handler.body),
+        sha256=hashlib.sha256(handler.body).hexdigest(),
+    )
+    assert list(tmp_path.iterdir()) == [dest]
+
+    # The file hasn't changed on the server.
+    assert client.download_to_file(source, dest, validators) == validators
+    assert handler.requests[-1]["If-None-Match"] == '"v1"'
+
+    # The file on disk is damaged. It is downloaded again.
+    dest.write_bytes(b"damaged")
+    assert client.download_to_file(source, dest, validators) == validators
+    assert dest.read_bytes() == handler.body
+
+    # The file has changed on the server.
+    handler.body, handler.etag = handler.body[::-1], '"v2"'
+    new_validators = client.download_to_file(source, dest, validators)
+    assert new_validators.etag == '"v2"'
+    assert dest.read_bytes() == handler.body
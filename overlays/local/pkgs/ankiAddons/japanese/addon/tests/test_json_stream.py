@@ -0,0 +1,47 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import io
+import json
+
+import pytest
+
+from japanese.helpers.json_stream import JsonObjectStream
+
+DOCUMENT = {
+    "meta": {"name": "テスト", "year": 2024, "version": 3, "media_dir": "media"},
+    "comment": "not an object",
+    "headwords": {"ひらがな": ["a.ogg", "b.ogg"], "平仮名": ["a.ogg"], "空": []},
+    "files": {
+        "a.ogg": {"kana_reading": "ひらがな", "pitch_number": "0", "pitch_pattern": None},
+        "b.ogg": {"kana_reading": "ひらがな", "pitch_number": "1.5e3"},
+    },
+    "numbers": {"int": 12345, "float": -1.5e-3, "list": [1, 22, 333]},
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1000])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_read_sections(chunk_size: int, indent: int) -> None:
+    text = json.dumps(DOCUMENT, ensure_ascii=False, indent=indent)
+    stream = JsonObjectStream(io.StringIO(text), chunk_size=chunk_size)
+    sections = {key: dict(items) for key, items in stream.sections()}
+    assert sections == {key: value for key, value in DOCUMENT.items() if isinstance(value, dict)}
+
+
+def test_skip_unread_items() -> None:
+    stream = JsonObjectStream(io.StringIO(json.dumps(DOCUMENT)), chunk_size=5)
+    keys = []
+    for key, items in stream.sections():
+        keys.append(key)
+        next(items)
+    assert keys == ["meta", "headwords", "files", "numbers"]
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["", "[]", '{"a": {"b": 1}', '{"a": {"b": 1}} {}', '{"a" {"b": 1}}', '{"a": {"b": }}', '{"a": {b: 1}}'],
+)
+def test_invalid_json(text: str) -> None:
+    with pytest.raises(json.JSONDecodeError):
+        for _key, items in JsonObjectStream(io.StringIO(text), chunk_size=3).sections():
+            list(items)
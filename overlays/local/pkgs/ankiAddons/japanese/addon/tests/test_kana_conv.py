@@ -0,0 +1,36 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import pytest
+
+from japanese.mecab_controller.kana_conv import (
+    HIRAGANA,
+    KATAKANA,
+    is_hiragana_char,
+    is_hiragana_str,
+    is_kana_char,
+    is_kana_str,
+    is_katakana_char,
+    is_katakana_str,
+)
+
+
+def test_ranges_match_characters() -> None:
+    # Strings are checked with codepoint ranges, and single characters are checked against the lists of kana.
+    for codepoint in range(0x3000, 0x3100):
+        char = chr(codepoint)
+        assert is_hiragana_str(char) is is_hiragana_char(char) is (char in HIRAGANA or char == "ー")
+        assert is_katakana_str(char) is is_katakana_char(char) is (char in KATAKANA or char == "ー")
+        assert is_kana_str(char) is is_kana_char(char)
+
+
+@pytest.mark.parametrize("length", [1, 4, 100])
+def test_kana_str(length: int) -> None:
+    # Short strings are cached, long strings aren't.
+    assert is_hiragana_str("ひらがなー" * length) is True
+    assert is_hiragana_str("ひらがなカ" * length) is False
+    assert is_katakana_str("カタカナー" * length) is True
+    assert is_katakana_str("カタカナひ" * length) is False
+    assert is_kana_str("ひらカタ" * length) is True
+    assert is_kana_str("ひらカタ漢" * length) is False
+    with pytest.raises(ValueError):
+        is_kana_str("")
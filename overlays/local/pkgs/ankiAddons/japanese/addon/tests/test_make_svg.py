@@ -4,7 +4,9 @@
 import pytest
 
 from japanese.config_view import SvgPitchGraphOptionsConfigView
+from japanese.helpers.profiles import PitchOutputFormat
 from japanese.pitch_accents.common import FormattedEntry
+from japanese.pitch_accents.render_cache import PitchRenderCache
 from japanese.pitch_accents.svg_graphs import SvgPitchGraphMaker
 from playground.utils import NoAnkiConfigView
 from tests import DATA_DIR
@@ -78,3 +80,33 @@ def test_make_svg(no_anki_config: NoAnkiConfigView, formatted_entry: FormattedEn
 
     with open(DATA_DIR / svg_file_name, encoding="utf-8") as f:
         assert f.read().strip() == maker.make_graph(formatted_entry).strip(), "generated content must match"
+
+
+def test_render_cache(no_anki_config: NoAnkiConfigView) -> None:
+    svg_config = SvgPitchGraphOptionsConfigView(no_anki_config)
+    maker = SvgPitchGraphMaker(options=svg_config)
+    cache = PitchRenderCache()
+    entry = TEST_ENTRIES[0]
+
+    def make_graph() -> str:
+        return cache.get_or_render(entry, PitchOutputFormat.svg, maker.options_key(), lambda: maker.make_graph(entry))
+
+    graph = make_graph()
+    assert graph == maker.make_graph(entry)
+    assert make_graph() is graph, "the second call must return the cached graph"
+    assert cache.stats().hits == 1
+
+    # Changing the options must not return the old graph.
+    old_font_size = svg_config["font_size"]
+    svg_config["font_size"] = old_font_size * 2
+    try:
+        assert make_graph() == maker.make_graph(entry) != graph
+    finally:
+        svg_config["font_size"] = old_font_size
+    assert make_graph() is graph
+    assert len(cache) == 2
+
+    # Other formats and styles of the same entry are stored separately.
+    assert cache.get_or_render(entry, PitchOutputFormat.html, "style", lambda: "html") == "html"
+    assert cache.get_or_render(entry, PitchOutputFormat.html, "other style", lambda: "other html") == "other html"
+    assert len(cache) == 4
@@ -0,0 +1,239 @@
+# Copyright: Ajatt-Tools and contributors; https://github.com/Ajatt-Tools
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+import concurrent.futures
+import pathlib
+import sys
+import threading
+import time
+
+import pytest
+
+from japanese.mecab_controller import (
+    BasicMecabController,
+    LibMecabController,
+    MecabController,
+)
+from japanese.mecab_controller.basic_mecab_controller import (
+    MecabNoAnswer,
+    find_eos_marker,
+)
+from japanese.mecab_controller.basic_types import Separators
+from japanese.mecab_controller.disk_cache import (
+    MecabDiskCache,
+    deserialize_tokens,
+    serialize_tokens,
+)
+from japanese.mecab_controller.libmecab_controller import is_libmecab_available
+from japanese.mecab_controller.lru_cache import LRUCache
+
+
+def test_eos_marker() -> None:
+    assert find_eos_marker(["mecab"]) == b"EOS\n"
+    assert find_eos_marker(["mecab", "--eos-format=<footer>"]) == b"<footer>"
+
+
+def test_process_is_reused() -> None:
+    worker = BasicMecabController(mecab_args=MecabController._mecab_args)
+    assert worker.is_running() is False
+    first = worker.run("昨日すき焼きを食べました")
+    pid = worker._proc.pid
+    assert worker.run("昨日すき焼きを食べました") == first
+    assert worker._proc.pid == pid
+    worker.close()
+    assert worker.is_running() is False
+
+
+def test_restart_after_crash() -> None:
+    worker = BasicMecabController(mecab_args=MecabController._mecab_args)
+    expected = worker.run("二人の美人")
+    worker._proc.kill()
+    worker._proc.wait()
+    assert worker.run("二人の美人") == expected
+    worker.close()
+
+
+def test_multiline_input_is_one_request() -> None:
+    worker = BasicMecabController(mecab_args=MecabController._mecab_args)
+    assert worker.run("猫\n犬") == worker.run("猫 犬")
+    assert worker.run("千葉") != worker.run("猫 犬")
+    worker.close()
+
+
+def test_concurrent_calls() -> None:
+    expressions = ["千葉", "二人の美人", "昨日すき焼きを食べました", "詳細はお気軽にお問い合わせ下さい。"]
+    worker = BasicMecabController(mecab_args=MecabController._mecab_args)
+    expected = [worker.run(expr) for expr in expressions]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(worker.run, expressions * 50))
+    assert results == expected * 50
+    worker.close()
+
+
+def test_translate_many() -> None:
+    expressions = ["放っておけない", "", "二人の美人", "放っておけない", "<b>千葉</b>"]
+    batch_mecab = MecabController(verbose=False)
+    batch_mecab._cache = LRUCache()
+    single_mecab = MecabController(verbose=False)
+    single_mecab._cache = LRUCache()
+    assert batch_mecab.translate_many(expressions) == [single_mecab.translate(expr) for expr in expressions]
+    assert batch_mecab.translate_many([]) == []
+
+
+@pytest.mark.skipif(not is_libmecab_available(), reason="libmecab isn't bundled for this platform")
+def test_libmecab_matches_executable() -> None:
+    expressions = ["昨日すき焼きを食べました", "", "Lorem ipsum", "猫\n犬", "彼２０００万も使った。"]
+    worker = BasicMecabController(mecab_args=MecabController._mecab_args)
+    in_process = LibMecabController(mecab_args=MecabController._mecab_args)
+    for expr in expressions:
+        assert in_process.run(expr) == worker.run(expr)
+    assert in_process.run_many(expressions) == worker.run_many(expressions)
+    in_process.close()
+    assert in_process.run("千葉") == worker.run("千葉")
+    in_process.close()
+    worker.close()
+
+
+def test_custom_command_uses_executable() -> None:
+    mecab = MecabController(mecab_cmd=BasicMecabController._mecab_cmd, verbose=False)
+    assert isinstance(mecab._mecab, BasicMecabController)
+
+
+def test_disk_cache_survives_restart(tmp_path: pathlib.Path) -> None:
+    db_path = tmp_path / "mecab_cache.sqlite3"
+    expressions = ["放っておけない", "<b>千葉</b>", "二人の美人"]
+    mecab = MecabController(verbose=False, disk_cache_path=db_path, disk_cache_max_size=1024 * 1024)
+    mecab._cache = LRUCache()
+    expected = mecab.translate_many(expressions)
+    assert serialize_tokens(expected[0]) and deserialize_tokens(serialize_tokens(expected[0])) == expected[0]
+    mecab._disk_cache.close()
+
+    # A new session starts with an empty in-memory cache and doesn't need to call mecab.
+    mecab = MecabController(verbose=False, disk_cache_path=db_path, disk_cache_max_size=1024 * 1024)
+    mecab._cache = LRUCache()
+    mecab._mecab = None
+    assert mecab.translate_many(expressions) == expected
+    assert mecab.translate("千葉") == expected[1]
+    mecab._disk_cache.close()
+
+
+class CutOffMecab:
+    """
+    Answers single expressions, but stops in the middle of the second answer of a batch,
+    as if mecab had timed out.
+    """
+
+    def __init__(self, mecab: MecabController) -> None:
+        self._real = mecab._mecab
+
+    def run(self, expr: str) -> str:
+        return self._real.run(expr)
+
+    def run_many(self, exprs: list[str]) -> str:
+        out = self._real.run_many(exprs)
+        if len(exprs) < 2:
+            return out
+        first_end = out.index(Separators.footer) + len(Separators.footer)
+        return out[: first_end + len("犬<ajt__com")]
+
+
+def test_translate_many_cut_off(tmp_path: pathlib.Path) -> None:
+    expressions = ["猫", "犬", "鳥"]
+    expected = [MecabController(verbose=False).translate(expr) for expr in expressions]
+    mecab = MecabController(verbose=False, disk_cache_path=tmp_path / "cache.sqlite3", disk_cache_max_size=1024 * 1024)
+    mecab._cache = LRUCache()
+    mecab._mecab = CutOffMecab(mecab)
+    assert mecab.translate_many(expressions) == expected
+    # The answers of the cut-off batch aren't kept.
+    # The expressions left without an answer were analyzed again one by one.
+    assert "猫" not in mecab._cache and mecab._disk_cache.get("猫") is None
+    assert mecab._cache["犬"] == expected[1] and mecab._disk_cache.get("犬") == expected[1]
+    mecab._disk_cache.close()
+
+
+# Reads one request, prints part of an answer and exits, like mecab crashing in the middle of a word.
+CRASHING_MECAB_CMD = [
+    sys.executable,
+    "-c",
+    "import sys; sys.stdin.readline(); sys.stdout.write('猫<ajt__node_separator>犬<ajt__com'); sys.stdout.flush()",
+]
+
+
+def test_unanswered_parse_is_not_cached(tmp_path: pathlib.Path) -> None:
+    worker = BasicMecabController(mecab_cmd=CRASHING_MECAB_CMD, mecab_args=MecabController._mecab_args)
+    with pytest.raises(MecabNoAnswer) as ex:
+        worker.run("猫犬")
+    assert ex.value.partial_output == "猫<ajt__node_separator>犬<ajt__com"
+    worker.close()
+
+    mecab = MecabController(
+        mecab_cmd=CRASHING_MECAB_CMD, disk_cache_path=tmp_path / "cache.sqlite3", disk_cache_max_size=1024 * 1024
+    )
+    mecab._cache = LRUCache()
+    # The unfinished word is dropped.
+    assert [token.word for token in mecab.translate("猫犬")] == ["猫"]
+    assert [[token.word for token in tokens] for tokens in mecab.translate_many(["猫犬", "鳥"])] == [["猫"], ["猫"]]
+    assert len(mecab._cache) == 0
+    assert mecab._disk_cache.get("猫犬") is None and mecab._disk_cache.get("鳥") is None
+    mecab._disk_cache.close()
+    mecab._mecab.close()
+
+
+def test_disk_cache_fingerprint_and_eviction(tmp_path: pathlib.Path) -> None:
+    db_path = tmp_path / "mecab_cache.sqlite3"
+    tokens = MecabController(verbose=False).translate("二人の美人")
+    cache = MecabDiskCache(db_path, fingerprint="a", max_size=1000)
+    for idx in range(20):
+        cache.put(f"expr{idx}", tokens)
+    assert 0 < cache.total_size() <= 1000
+    assert cache.get("expr0") is None
+    assert cache.get("expr19") == tokens
+    cache.close()
+    # Entries stored with a different mecab configuration are dropped.
+    cache = MecabDiskCache(db_path, fingerprint="b", max_size=1000)
+    assert cache.get("expr19") is None
+    assert cache.total_size() == 0
+    cache.close()
+
+
+def test_lru_cache_limits_and_stats() -> None:
+    cache: LRUCache[str, str] = LRUCache(capacity=3)
+    for idx in range(5):
+        cache[f"key{idx}"] = "value"
+    assert len(cache) == 3 and "key0" not in cache and "key4" in cache
+    assert cache["key4"] == "value"
+    with pytest.raises(KeyError):
+        cache["key0"]
+    assert (cache.stats().hits, cache.stats().misses, cache.stats().evictions) == (1, 1, 2)
+
+    cache = LRUCache(max_bytes=2000)
+    for idx in range(100):
+        cache[f"key{idx}"] = "x" * 100
+    assert 0 < cache.stats().size_bytes <= 2000
+    assert "key99" in cache and "key0" not in cache
+    cache.set_max_bytes(0)
+    cache.set_capacity(2)
+    assert len(cache) == 2 and cache.stats().size_bytes == 0
+
+
+def test_lru_cache_computes_each_key_once() -> None:
+    cache: LRUCache[int, int] = LRUCache()
+    calls: list[int] = []
+    barrier = threading.Barrier(8)
+
+    def compute(key: int) -> int:
+        calls.append(key)
+        time.sleep(0.05)
+        return key * 2
+
+    def worker(key: int) -> int:
+        barrier.wait()
+        return cache.get_or_compute(key, lambda: compute(key))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(worker, [1, 1, 1, 1, 2, 2, 2, 2]))
+    assert results == [2, 2, 2, 2, 4, 4, 4, 4]
+    assert sorted(calls) == [1, 2]
+    # A failed computation doesn't leave the key locked.
+    with pytest.raises(ValueError):
+        cache.get_or_compute(3, lambda: int("not a number"))
+    assert cache.get_or_compute(3, lambda: 6) == 6
@@ -3,6 +3,7 @@
 
 import pytest
 
+from japanese.helpers.profile_index import ProfileIndex
 from japanese.helpers.profiles import (
     ColorCodePitchFormat,
     Profile,
@@ -14,6 +15,7 @@ from japanese.helpers.profiles import (
     flag_as_comma_separated_list,
     flag_from_comma_separated_list,
 )
+from playground.utils import NoAnkiConfigView
 from tests.no_anki_config import no_anki_config
 
 
@@ -121,3 +123,25 @@ def test_task_callers() -> None:
     assert tc.all_enabled() == tc.focus_lost | tc.toolbar_button | tc.note_added | tc.bulk_add
     assert tc.bulk_add.cfg == TaskCallerOpts(audio_download_report=False)
     assert tc.focus_lost.cfg == TaskCallerOpts(audio_download_report=True)
+
+
+def test_profile_index() -> None:
+    config = NoAnkiConfigView()
+    index = ProfileIndex(config)
+    note_type = {"id": 1, "name": "Japanese sentences"}
+    assert [profile.name for profile in index.find(note_type)] == [profile.name for profile in config.iter_profiles()]
+    assert [profile.mode for profile in index.find(note_type, "VocabKanji")] == ["furigana", "pitch", "audio"]
+    assert [profile.mode for profile in index.find(note_type, "SentKanji")] == ["furigana"]
+    assert index.find(note_type, "VocabDef") == ()
+    assert index.find({"id": 2, "name": "Basic"}) == ()
+    # Profiles are parsed once per config version.
+    assert index.profiles() is index.profiles()
+
+    # Renamed note types are matched again.
+    assert index.find({"id": 1, "name": "Basic"}) == ()
+
+    # Profiles are reloaded when the config is written or replaced.
+    config["profiles"] = config["profiles"][:1]
+    assert len(index.find(note_type)) == 4
+    config.update({})
+    assert [profile.source for profile in index.find(note_type)] == ["SentKanji"]
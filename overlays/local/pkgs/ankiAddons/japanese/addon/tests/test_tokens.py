@@ -67,5 +67,19 @@ def test_counter_tokenize() -> None:
     assert _describe_result(tokenize(expr)) == expected
 
 
+def test_multiline_tokenize() -> None:
+    expr = "<div\nclass='a'>日本\n語</div>\nabc\ndef 猫"
+    expected = [
+        "Token(<div\nclass='a'>)",
+        "ParseableToken(日本)",
+        "Token(\n)",
+        "ParseableToken(語)",
+        "Token(</div>)",
+        "Token(\nabc\ndef )",
+        "ParseableToken(猫)",
+    ]
+    assert _describe_result(tokenize(expr)) == expected
+
+
 def test_empty_tokenize() -> None:
     assert list(tokenize("")) == list()
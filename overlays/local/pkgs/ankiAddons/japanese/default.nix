@@ -5,4 +5,12 @@ pkgs.anki-utils.buildAnkiAddon (finalAttrs: {
   version = "v25.5.15.0";
   src = pkgs.lib.cleanSource ./addon;
   sourceRoot = "${finalAttrs.src.name}/japanese";
+
+  nativeBuildInputs = [ pkgs.python3 ];
+
+  # Ship the prebuilt pitch accents database, so the add-on doesn't build it in user_files on first start.
+  # The build doesn't need Anki. The working directory is sourceRoot, the add-on's package.
+  preInstall = ''
+    python3 -B ../scripts/build_pitch_db.py
+  '';
 })